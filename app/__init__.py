@@ -38,8 +38,29 @@ def create_app(config_name):
     from .content_management import cm as cm_blueprint
     app.register_blueprint(cm_blueprint, url_prefix='/content_management')
 
+    #start background document uploads
+    from .content_management.lib.jobs import upload_jobs
+    upload_jobs.init_app(app)
+
+    #cache pages laid out for other line sizes and page limits
+    from .content_management.lib.reflow import reflow_layouts
+    reflow_layouts.init_app(app)
+
+    #keep connections to the dictionary services alive between requests
+    from dictionaries.connections import transport
+    transport.init_app(app)
+
+    #cache translations of frequently looked up words
+    from dictionaries.translation_cache import translation_cache
+    translation_cache.init_app(app)
+
     #add document viewer
     from .document_viewer import document_viewer as document_viewer_blueprint
     app.register_blueprint(document_viewer_blueprint, url_prefix='/document_viewer')
 
+    #load shared state before a pre-forking server starts its workers
+    if int(app.config["PRELOAD"]):
+        from .preload import preload
+        preload(app)
+
     return app
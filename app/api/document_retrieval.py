@@ -1,13 +1,251 @@
+import hashlib
+import json
+
 from http import HTTPStatus
+from itertools import chain
 
-from flask import current_app, g, jsonify, request
+from flask import Response, current_app, g, jsonify, request
 
 from . import api
 from .errors import bad_request, resource_not_found
-from ..models import Page
+from ..content_management.lib.encoding import get_stored_content
+from ..content_management.lib.reflow import (MAX_LINE_SIZE, MAX_PAGE_LIMIT, MIN_LINE_SIZE,
+                                              MIN_PAGE_LIMIT, reflow_layouts)
+from ..content_management.lib.token_stream import find_token_stream
+from ..models import CatalogEntry, Page
 from .validation import check_request_params
 
-@api.route('/document_retrieval/page', methods=['POST'])
+def get_catalog_entry(email, title, author):
+    """
+    Finds the version of a document that readers should see and
+    how many times it has been changed in place.
+
+    Parameters
+    ----------
+    email : str
+        The email of the document's owner
+    title : str
+        The title of the document
+    author : str
+        The author of the document
+
+    Returns
+    -------
+    CatalogEntry
+        The catalog entry with only its version and revision, or None
+        for documents saved before pages were versioned
+    """
+    return CatalogEntry.objects(email=email, title=title, author=author).only('version', 'revision').first()
+
+def get_published_version(email, title, author):
+    """
+    Finds the version of a document that readers should see.
+
+    Parameters
+    ----------
+    email : str
+        The email of the document's owner
+    title : str
+        The title of the document
+    author : str
+        The author of the document
+
+    Returns
+    -------
+    str
+        The published version, or None for documents saved before
+        pages were versioned
+    """
+    entry = get_catalog_entry(email, title, author)
+    if not entry:
+        return None
+    return entry.version
+
+def get_layout(req_data):
+    """
+    Reads the line size and page limit that a request asks the
+    pages to be laid out with.
+
+    Parameters
+    ----------
+    req_data : dict
+        The body of the request
+
+    Returns
+    -------
+    tuple
+        The line size, page limit and early cutoff, or None when the
+        request asks for neither, followed by an error message, or
+        None if the layout is valid
+    """
+    if "line_size" not in req_data and "page_limit" not in req_data:
+        return None, None
+
+    upload_config = current_app.config["DOCUMENT_UPLOAD"]
+    try:
+        line_size = int(req_data.get("line_size", upload_config["LINE_SIZE"]))
+        page_limit = int(req_data.get("page_limit", upload_config["PAGE_LIMIT"]))
+    except (TypeError, ValueError):
+        msg = "line_size and page_limit must be integers"
+        return None, msg
+
+    if not (MIN_LINE_SIZE <= line_size <= MAX_LINE_SIZE):
+        msg = "line_size must be between {} and {}".format(MIN_LINE_SIZE, MAX_LINE_SIZE)
+        return None, msg
+    if not (MIN_PAGE_LIMIT <= page_limit <= MAX_PAGE_LIMIT):
+        msg = "page_limit must be between {} and {}".format(MIN_PAGE_LIMIT, MAX_PAGE_LIMIT)
+        return None, msg
+
+    early_cutoff = int(upload_config["EARLY_CUTOFF"])
+    return (line_size, page_limit, early_cutoff), None
+
+def get_token_stream(email, title, author):
+    """
+    Finds the token stream of the published version of a document.
+
+    Parameters
+    ----------
+    email : str
+        The email of the document's owner
+    title : str
+        The title of the document
+    author : str
+        The author of the document
+
+    Returns
+    -------
+    TokenStream
+        The token stream, or None if the document
+        wasn't saved with one
+    """
+    version = get_published_version(email, title, author)
+    return find_token_stream(email, title, author, version)
+
+def is_not_modified(etag):
+    """
+    Checks if the client already holds the response identified
+    by an entity tag.
+
+    Parameters
+    ----------
+    etag : str
+        The entity tag of the response, or None if it has none
+
+    Returns
+    -------
+    bool
+        True if the request's If-None-Match header matches
+        the entity tag, False otherwise
+    """
+    return etag is not None and request.if_none_match.contains_weak(etag)
+
+def make_etag(parts):
+    """
+    Builds an entity tag from the stored fingerprints that
+    a response is built from.
+
+    Parameters
+    ----------
+    parts : list
+        The fingerprints and request parameters identifying the response
+
+    Returns
+    -------
+    str
+        The entity tag
+    """
+    return hashlib.sha1("/".join(parts).encode('utf-8')).hexdigest()
+
+def not_modified(etag):
+    """
+    Tells the client that the response it holds is still current.
+    A matching If-None-Match on a request other than GET or HEAD
+    is a failed precondition instead.
+
+    Parameters
+    ----------
+    etag : str
+        The entity tag of the response
+
+    Returns
+    -------
+    Response
+        An empty response with status 304, or 412 for requests
+        other than GET and HEAD
+    """
+    status = HTTPStatus.NOT_MODIFIED
+    if request.method not in ("GET", "HEAD"):
+        status = HTTPStatus.PRECONDITION_FAILED
+    response = Response(status=status.value)
+    return set_cache_headers(response, etag)
+
+def get_request_data():
+    """
+    Reads the parameters of a request, which GET requests send in
+    the query string and POST requests in a JSON body.
+
+    Returns
+    -------
+    dict
+        The parameters of the request
+    """
+    if request.method == "GET":
+        return request.args.to_dict()
+    return request.json
+
+def set_cache_headers(response, etag):
+    """
+    Adds the headers that let clients cache and revalidate a response.
+
+    Parameters
+    ----------
+    response : Response
+        The response to be sent
+    etag : str
+        The entity tag of the response, or None if it has none
+
+    Returns
+    -------
+    Response
+        The response with its caching headers
+    """
+    if etag is not None:
+        response.set_etag(etag)
+    response.headers["Cache-Control"] = current_app.config["DOCUMENT_CACHE_CONTROL"]
+    return response
+
+def stream_page_range(title, author, start, pages):
+    """
+    Encodes the response to a page range request one page at a
+    time, so that only one page is held in memory at once.
+
+    Parameters
+    ----------
+    title : str
+        The title of the document
+    author : str
+        The author of the document
+    start : int
+        The number of the first page requested
+    pages : iterable
+        The pages in the range, in page order, as returned by the driver
+
+    Returns
+    -------
+    generator
+        The encoded pieces of the response
+    """
+    head = json.dumps({"author": author, "startPage": start, "title": title}, ensure_ascii=False)
+    yield (head[:-1] + ',"content":[').encode('utf-8')
+
+    separator = b""
+    for page in pages:
+        lines = get_stored_content(page.get("content") or {}, page["resource"]["page_number"])
+        yield separator + json.dumps(lines, ensure_ascii=False).encode('utf-8')
+        separator = b","
+    yield b"]}"
+
+@api.route('/document_retrieval/page', methods=['GET', 'POST'])
 def page():
     """
     Gets a specified page from a user resource.
@@ -19,7 +257,7 @@ def page():
     """
     user = g.current_user
     email = user.email
-    req_data = request.json
+    req_data = get_request_data()
 
     #Check for document information
     params = ["title", "author", "page"]
@@ -28,37 +266,78 @@ def page():
         response = bad_request(msg)
         return response
     
+    layout, msg = get_layout(req_data)
+    if msg:
+        response = bad_request(msg)
+        return response
+    
     title = req_data["title"]
     author = req_data["author"]
     page_num = int(req_data["page"])
 
+    #Lay the page out for the requested line size and page limit
+    if layout:
+        stream = get_token_stream(email, title, author)
+        pages = []
+        if stream:
+            etag = make_etag([str(stream.file_id)] + [str(value) for value in layout] + [str(page_num)])
+            if is_not_modified(etag):
+                return not_modified(etag)
+            pages = reflow_layouts.get_layout(stream, layout).get_pages(page_num, page_num)
+
+        if not pages:
+            msg = "Couldn't retrieve requested page"
+            response = resource_not_found(msg)
+            return response
+
+        response = {}
+        response["title"] = title
+        response["author"] = author
+        response["page"] = page_num
+        response["content"] = pages[0][1]
+
+        response = set_cache_headers(jsonify(response), etag)
+        return response, HTTPStatus.OK.value
+
+    version = get_published_version(email, title, author)
+
     #Search for the requested page
-    page = Page.objects(
-                        email=email,
-                        resource__title=title,
-                        resource__author=author,
-                        resource__page_number=page_num
-                        ).first()
-    
-    if not page:
+    pages = Page.objects(
+                         email=email,
+                         resource__title=title,
+                         resource__author=author,
+                         resource__page_number=page_num,
+                         version=version
+                        )
+
+    #Fetch the page in one query, whether or not it was stored with its response body
+    stored = pages.only('payload', 'content', 'content_hash').as_pymongo().first()
+    if not stored:
         msg = "Couldn't retrieve requested page"
         response = resource_not_found(msg)
         return response
 
-    #Build response
+    etag = stored.get("content_hash")
+    if is_not_modified(etag):
+        return not_modified(etag)
+
+    #Send the response body stored with the page as it is
+    if stored.get("payload"):
+        response = Response(stored["payload"], mimetype="application/json")
+        response = set_cache_headers(response, etag)
+        return response, HTTPStatus.OK.value
+
+    #Pages uploaded without a response body are built from their content
     response = {}
     response["title"] = title
     response["author"] = author
     response["page"] = page_num
-    response["content"] = {
-        "words": page.content.words,
-        "breaks": page.content.breaks
-    }
+    response["content"] = get_stored_content(stored.get("content") or {}, page_num)
     
-    response = jsonify(response)
+    response = set_cache_headers(jsonify(response), etag)
     return response, HTTPStatus.OK.value
 
-@api.route('/document_retrieval/page_range', methods=['POST'])
+@api.route('/document_retrieval/page_range', methods=['GET', 'POST'])
 def page_range():
     """
     Fetches all pages within a user-specified range.
@@ -70,7 +349,7 @@ def page_range():
     """
     user = g.current_user
     email = user.email
-    req_data = request.json
+    req_data = get_request_data()
 
     #Check for required page range information
     params = ["title", "author", "start"]
@@ -79,49 +358,87 @@ def page_range():
         response = bad_request(msg)
         return response
     
+    layout, msg = get_layout(req_data)
+    if msg:
+        response = bad_request(msg)
+        return response
+    
     title = req_data["title"]
     author = req_data["author"]
     start = int(req_data["start"])
 
-    end = start + current_app.config["PAGE_RANGE_DEFAULT_SIZE"]
+    end = start + int(current_app.config["PAGE_RANGE_DEFAULT_SIZE"])
     if "end" in req_data:
         end = int(req_data["end"])
+
+    #Lay the pages out for the requested line size and page limit
+    if layout:
+        stream = get_token_stream(email, title, author)
+        pages = []
+        if stream:
+            etag = make_etag([str(stream.file_id)] + [str(value) for value in layout] + [str(start), str(end)])
+            if is_not_modified(etag):
+                return not_modified(etag)
+            pages = reflow_layouts.get_layout(stream, layout).get_pages(start, end)
+
+        if not pages:
+            msg = "Couldn't find requested pages"
+            response = resource_not_found(msg)
+            return response
+
+        response = jsonify({
+            "title": title,
+            "author": author,
+            "content": [lines for page_num, lines in pages],
+            "startPage": start
+        })
+        response = set_cache_headers(response, etag)
+        return response, HTTPStatus.OK.value
+
+    #Fingerprint the range from the version and the changes made to it in place
+    entry = get_catalog_entry(email, title, author)
+    version = None
+    etag = None
+    if entry:
+        version = entry.version
+        etag = make_etag([str(version), str(entry.revision or 0), str(start), str(end)])
+        if is_not_modified(etag):
+            return not_modified(etag)
+    batch_size = int(current_app.config["PAGE_RANGE_BATCH_SIZE"])
     
     #Search for requested page range
     pages = Page.objects(
+                         email=email,
                          resource__title=title,
                          resource__author=author,
                          resource__page_number__gte=start,
-                         resource__page_number__lte=end
+                         resource__page_number__lte=end,
+                         version=version
                         )
-    pages.order_by('resource__page_number')
+    pages = pages.order_by('resource__page_number')
+
+    #Fetch only what the response needs
+    pages = pages.only('content', 'resource.page_number').as_pymongo()
+    pages = iter(pages.batch_size(batch_size))
 
-    if not pages:
+    first = next(pages, None)
+    if first is None:
         msg = "Couldn't find requested pages"
         response = resource_not_found(msg)
         return response
     
-    #Collect pages into response
-    content = []
-    for page in pages:
-        lines = {
-            "words": page.content.words,
-            "breaks": page.content.breaks
-        }
-        content.append(lines)
-    
-    response = jsonify({
-        "title": title,
-        "author": author,
-        "content": content,
-        "startPage": start
-    })
+    #Stream pages into response as they arrive from the database
+    content = stream_page_range(title, author, start, chain([first], pages))
+    response = set_cache_headers(Response(content, mimetype="application/json"), etag)
     return response, HTTPStatus.OK.value
 
 @api.route('/document_retrieval/doc_list')
 def doc_list():
     """
     Lists the documents/resources that a user has previously uploaded.
+    The documents are read from the user's catalog, a page of them at
+    a time when a page is requested. Libraries that aren't in the
+    catalog yet are listed without their sizes and upload times.
 
     Returns
     -------
@@ -131,24 +448,47 @@ def doc_list():
     user = g.current_user
     email = user.email
 
-    #Find all the user's documents
-    docs = Page.objects(email=email, resource__page_number=1)
-    docs = docs.order_by('resource__title','resource__author')
-    
-    if not docs:
-        msg = "Couldn't find user's documents"
-        response = resource_not_found(msg)
-        return response
+    #Find all the user's documents, from their first pages if
+    #the library was saved before the catalog and isn't in it yet
+    if CatalogEntry.objects(email=email).only('id').first():
+        docs = CatalogEntry.objects(email=email).order_by('title', 'author')
+        docs = docs.only('title', 'author', 'language', 'page_count', 'byte_size', 'upload_time')
+    else:
+        docs = Page.objects(email=email, resource__page_number=1).order_by('resource__title', 'resource__author')
+        docs = docs.only('resource.title', 'resource.author', 'resource.language')
+    docs = docs.as_pymongo()
+
+    page = request.args.get("page", type=int)
+    if page is not None:
+        per_page = request.args.get("per_page", int(current_app.config["DOC_LIST_PAGE_SIZE"]), type=int)
+        if page < 1 or per_page < 1:
+            msg = "page and per_page must be positive integers"
+            response = bad_request(msg)
+            return response
+        docs = docs.skip((page - 1) * per_page).limit(per_page)
     
     #Collect document names into a response
     works = []
     for doc in docs:
+        doc = doc.get("resource", doc)
+        upload_time = doc.get("upload_time")
         work = {
-            "title": doc.resource.title,
-            "author": doc.resource.author,
-            "language": doc.resource.language
+            "title": doc.get("title"),
+            "author": doc.get("author"),
+            "language": doc.get("language"),
+            "page_count": doc.get("page_count"),
+            "byte_size": doc.get("byte_size"),
+            "upload_time": upload_time.isoformat() if upload_time else None
         }
         works.append(work)
     
-    response = jsonify({"works": works})
-    return response, HTTPStatus.OK.value
\ No newline at end of file
+    if not works:
+        msg = "Couldn't find user's documents"
+        response = resource_not_found(msg)
+        return response
+    
+    response = {"works": works}
+    if page is not None:
+        response["page"] = page
+    response = jsonify(response)
+    return response, HTTPStatus.OK.value
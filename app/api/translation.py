@@ -1,15 +1,64 @@
+import json
+
 from http import HTTPStatus
 
-from flask import current_app, g, request
+from flask import current_app, g, jsonify, request
+
+from dictionaries.connections import transport
+from dictionaries.translation_cache import normalize_query, translation_cache
 
 from . import api
+from .document_retrieval import get_published_version
 from .errors import bad_request
 from .validation import check_request_params
+from ..content_management.lib.translation_table import find_translations
+
+def get_document_translations(req_data, language, translator, queries, page, size):
+    """
+    Looks up queries in the translation table of the document they
+    come from, if the request names one. Only the first page of
+    translations is kept in the table, and only while the dictionary
+    hasn't been rebuilt since the table was written.
+
+    Parameters
+    ----------
+    req_data : dict
+        The translation request, which may hold the
+        title and author of the document
+    language : str
+        The language to translate from
+    translator : ForeignLanguageDictionary
+        The dictionary of the language
+    queries : list
+        The normalized pieces of text to be translated
+    page : int
+        The number of the results page
+        in the pagination scheme
+    size : int
+        The number of results per page
+
+    Returns
+    -------
+    dict
+        The JSON response and HTTP status code of each
+        query found in the document's translation table
+    """
+    if page != 1 or "title" not in req_data or "author" not in req_data:
+        return {}
+
+    email = g.current_user.email
+    title = req_data["title"]
+    author = req_data["author"]
+    version = get_published_version(email, title, author)
+    dictionary_version = translation_cache.get_index_version(language, translator)
+    return find_translations(email, title, author, version, queries, size, dictionary_version)
 
 @api.route('translation/<string:language>', methods=['POST'])
 def translation(language):
     """
-    Translates a user-specified piece of text.
+    Translates a user-specified piece of text. When the request
+    names the document the text comes from, the translation is
+    taken from the document's translation table if it has one.
 
     Parameters
     ----------
@@ -45,5 +94,125 @@ def translation(language):
     #Get the translation
     size = int(current_app.config["TRANSLATIONS_PAGE_SIZE"])
     translator = dict_manager.get_dictionary(language)
-    response = translator.get_translation(query, page, size)
-    return response[0], response[1]
\ No newline at end of file
+    table = get_document_translations(req_data, language, translator, [normalize_query(query)], page, size)
+    if table:
+        response = table.popitem()[1]
+        return response[0], response[1]
+
+    response = translation_cache.get_translation(language, translator, query, page, size)
+    return response[0], response[1]
+
+@api.route('translation/<string:language>/batch', methods=['POST'])
+def batch_translation(language):
+    """
+    Translates many user-specified pieces of text at once,
+    such as every distinct word on a page. When the request names
+    the document the text comes from, translations are taken from
+    the document's translation table where it has them.
+
+    Parameters
+    ----------
+    language : str
+        The language to translate from
+
+    Returns
+    -------
+    json
+        The translations of each piece of text, which are
+        empty for text that has no translations, and the
+        text whose lookup failed
+    int
+        An HTTP status code
+    """
+    req_data = request.json
+
+    #Check that the translation queries are valid
+    params = ["queries"]
+    msg = check_request_params(req_data, params)
+    if msg:
+        response = bad_request(msg)
+        return response
+
+    queries = req_data["queries"]
+    if type(queries) is not list or not all(type(query) is str for query in queries):
+        msg = "queries must be a list of strings"
+        response = bad_request(msg)
+        return response
+
+    limit = int(current_app.config["TRANSLATION_BATCH_LIMIT"])
+    if len(queries) > limit:
+        msg = "At most " + str(limit) + " queries may be translated at once"
+        response = bad_request(msg)
+        return response
+
+    try:
+        page = int(req_data.get("page", 1))
+    except (TypeError, ValueError):
+        msg = "page must be an integer"
+        response = bad_request(msg)
+        return response
+
+    #Check that the language to be translated from is supported
+    dict_manager = current_app.config["DICTIONARY_MANAGER"]
+    if not dict_manager.has_dictionary(language):
+        msg = language + " is not a supported language"
+        response = bad_request(msg)
+        return response
+
+    #Get the translations
+    size = int(current_app.config["TRANSLATIONS_PAGE_SIZE"])
+    terms = list(dict.fromkeys(normalize_query(query) for query in queries))
+    translator = dict_manager.get_dictionary(language)
+    results = get_document_translations(req_data, language, translator, terms, page, size)
+    missing = [term for term in terms if term not in results]
+    if missing:
+        results.update(translation_cache.get_translations(language, translator, missing, page, size))
+
+    #Text the dictionary couldn't be asked about is reported apart from text without translations
+    translations = {}
+    failed = []
+    for query in queries:
+        body, status = results[normalize_query(query)]
+        if status == HTTPStatus.OK.value:
+            translations[query] = json.loads(body)["translations"]
+        elif status == HTTPStatus.NOT_FOUND.value:
+            translations[query] = []
+        else:
+            failed.append(query)
+
+    response = jsonify(translations=translations, failed=failed)
+    return response, HTTPStatus.OK.value
+
+@api.route('translation/cache', methods=['GET'])
+def translation_cache_stats():
+    """
+    Reports how well the translation cache of the process
+    serving the request is working.
+
+    Returns
+    -------
+    json
+        The cache's hit, miss, eviction, expiration and
+        invalidation counts and its number of entries
+    int
+        An HTTP status code
+    """
+    response = jsonify(translation_cache.get_stats())
+    return response, HTTPStatus.OK.value
+
+@api.route('translation/transport', methods=['GET'])
+def translation_transport_stats():
+    """
+    Reports how the process serving the request is using its
+    connections to the dictionary services.
+
+    Returns
+    -------
+    json
+        The transport's request, error and retry counts, the
+        connections it opened and reused and its request latency
+    int
+        An HTTP status code
+    """
+    response = jsonify(transport.get_stats())
+    return response, HTTPStatus.OK.value
\ No newline at end of file
@@ -1,10 +1,24 @@
 from flask import current_app
 from flask_wtf import FlaskForm
-from wtforms import FileField, SelectField, StringField, SubmitField
+from wtforms import BooleanField, FileField, SelectField, StringField, SubmitField
 from wtforms.validators import DataRequired, Length
 
 from app import languages
 
+class BulkImportForm(FlaskForm):
+    """
+    Assists a user in importing an archive of documents.
+    """
+    #Zip or tar archive of documents along with their manifest
+    archive = FileField('Archive of documents', validators=[DataRequired()])
+
+    #Language of documents whose manifest entry doesn't name one
+    lang_options = languages
+    language = SelectField('Default language', choices=lang_options)
+
+    #Submit Form
+    submit = SubmitField("Import")
+
 class SourceTextForm(FlaskForm):
     """
     Assists a user in uploading a document.
@@ -24,5 +38,8 @@ class SourceTextForm(FlaskForm):
     #Document Text
     filename = FileField('Document to upload')
 
+    #Revision of a previously uploaded document
+    incremental = BooleanField('Only save pages that changed since the last upload')
+
     #Submit Form
     submit = SubmitField("Submit")
\ No newline at end of file
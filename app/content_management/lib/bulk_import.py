@@ -0,0 +1,332 @@
+import os
+import posixpath
+import shutil
+import tarfile
+import tempfile
+import time
+import traceback
+import zipfile
+
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock, Semaphore
+
+import yaml
+
+from .jobs import UploadJob
+from .upload import DocumentUploader, PipelinedDocumentUploader
+
+MANIFEST_NAMES = ["manifest.yaml", "manifest.yml", "manifest.json"]
+
+def normalize_name(name):
+    """
+    Puts the name of a file in an archive in the form the manifest
+    uses, since archivers may store names such as "./a.txt".
+
+    Parameters
+    ----------
+    name : str
+        The name of the file as stored in the archive
+
+    Returns
+    -------
+    str
+        The normalized name, such as "a.txt"
+    """
+    return posixpath.normpath(name)
+
+class DocumentArchive():
+    """
+    Reads the members of a zip or tar archive of documents.
+    """
+    def __init__(self, path):
+        """
+        Opens the archive.
+
+        Parameters
+        ----------
+        path : str
+            The path to the archive
+        """
+        self.zip = None
+        self.tar = None
+        if zipfile.is_zipfile(path):
+            self.zip = zipfile.ZipFile(path)
+        elif tarfile.is_tarfile(path):
+            self.tar = tarfile.open(path, 'r:*')
+        else:
+            raise Exception("Archive must be a zip or tar file")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.close()
+
+    def close(self):
+        """
+        Closes the archive.
+        """
+        if self.zip:
+            self.zip.close()
+        if self.tar:
+            self.tar.close()
+
+    def members(self):
+        """
+        Lists the files in the archive, in the order they are stored.
+
+        Returns
+        -------
+        generator
+            The normalized name and an open binary stream of each file
+        """
+        if self.zip:
+            for info in self.zip.infolist():
+                if not info.is_dir():
+                    with self.zip.open(info) as member:
+                        yield normalize_name(info.filename), member
+        else:
+            for info in self.tar:
+                if info.isfile():
+                    with self.tar.extractfile(info) as member:
+                        yield normalize_name(info.name), member
+
+    def read_manifest(self):
+        """
+        Reads the manifest describing the documents in the archive. The
+        manifest maps each file name to the document's title, author
+        and, optionally, language.
+
+        Returns
+        -------
+        dict
+            The metadata of each document, keyed by file name
+        """
+        if self.zip:
+            files = {normalize_name(info.filename): info for info in self.zip.infolist() if not info.is_dir()}
+        else:
+            files = {normalize_name(info.name): info for info in self.tar.getmembers() if info.isfile()}
+
+        for name in MANIFEST_NAMES:
+            if name not in files:
+                continue
+
+            if self.zip:
+                data = self.zip.read(files[name])
+            else:
+                data = self.tar.extractfile(files[name]).read()
+
+            manifest = yaml.safe_load(data)
+            if not isinstance(manifest, dict):
+                raise Exception("Manifest must map file names to document metadata")
+            return manifest
+
+        raise Exception("Archive has no manifest")
+
+class BulkImporter():
+    """
+    Uploads every document in an archive, spreading the
+    documents across a pool of upload workers.
+    """
+    def __init__(self, params, tokenizers, workers):
+        """
+        Initializes the bulk import.
+
+        Parameters
+        ----------
+        params : dict
+            Configurations shared by every document upload. Each
+            document gets the tokenizer for its own language.
+        tokenizers : TokenizerMapper
+            The tokenizers for each supported language
+        workers : int
+            The number of documents uploaded at the same time
+        """
+        self.params = params
+        self.tokenizers = tokenizers
+        self.workers = max(1, int(workers))
+        self.documents = []
+        self.lock = Lock()
+        #Job that saves the progress of the import, if any
+        self.job = None
+        self.started = None
+        self.finished = None
+
+    def get_uploader(self, result, language):
+        """
+        Builds the uploader for one document of the archive.
+
+        Parameters
+        ----------
+        result : UploadJob
+            Tracks the upload of the document
+        language : str
+            The language of the document
+
+        Returns
+        -------
+        DocumentUploader
+            The mechanism for saving the document
+        """
+        params = dict(self.params)
+        params["tokenizer"] = self.tokenizers.select(language)
+        params["monitor"] = result
+        if int(params.get("writers", 0)) > 0:
+            return PipelinedDocumentUploader(params)
+        return DocumentUploader(params)
+
+    def import_document(self, result, doc, path, slots):
+        """
+        Uploads one document from its spooled copy.
+
+        Parameters
+        ----------
+        result : UploadJob
+            Tracks the upload of the document
+        doc : dict
+            The document to be saved
+        path : str
+            The path to the spooled copy of the document's text
+        slots : Semaphore
+            Limits the number of spooled documents
+        """
+        result.start()
+        try:
+            uploader = self.get_uploader(result, doc["language"])
+            with open(path, 'rb') as text:
+                doc["file"] = text
+                uploader.upload(doc)
+            result.finish()
+        except Exception as e:
+            traceback.print_exc()
+            result.fail(str(e))
+        finally:
+            os.remove(path)
+            slots.release()
+
+    def report(self):
+        """
+        Summarizes the import of every document in the archive.
+
+        Returns
+        -------
+        dict
+            The per-document results along with the overall
+            number of documents and pages written and throughput
+        """
+        with self.lock:
+            documents = [result.report() for result in self.documents]
+
+        elapsed = 0.0
+        if self.started is not None:
+            end = self.finished or time.time()
+            elapsed = end - self.started
+
+        complete = len([document for document in documents if document["status"] == "complete"])
+        failed = len([document for document in documents if document["status"] == "failed"])
+        pages = sum(document["pages_written"] for document in documents)
+
+        documents_per_second = 0.0
+        pages_per_second = 0.0
+        if elapsed > 0:
+            documents_per_second = (complete + failed) / elapsed
+            pages_per_second = pages / elapsed
+
+        report = {
+            "documents_total": len(documents),
+            "documents_complete": complete,
+            "documents_failed": failed,
+            "pages_written": pages,
+            "elapsed": round(elapsed, 3),
+            "documents_per_second": round(documents_per_second, 3),
+            "pages_per_second": round(pages_per_second, 3),
+            "documents": documents
+        }
+        return report
+
+    def spool(self, member):
+        """
+        Copies a document out of the archive so that it can be
+        uploaded while the rest of the archive is read.
+
+        Parameters
+        ----------
+        member : file
+            The document's stream within the archive
+
+        Returns
+        -------
+        str
+            The path to the temporary file
+        """
+        spooled = tempfile.NamedTemporaryFile(prefix="import_", suffix=".txt", delete=False)
+        with spooled:
+            shutil.copyfileobj(member, spooled)
+        return spooled.name
+
+    def upload(self, doc):
+        """
+        Saves every document listed in the archive's manifest. The
+        archive is read once, in order, and each document is handed
+        to the next free worker. A document that fails is recorded
+        without stopping the others.
+
+        Parameters
+        ----------
+        doc : dict
+            The archive to be imported. Its "file" is the path to the
+            archive or a file opened from that path, and its
+            "language" is the default for documents whose manifest
+            entry doesn't name one.
+
+        Returns
+        -------
+        dict
+            The per-document results and overall throughput
+        """
+        path = doc["file"]
+        if not isinstance(path, str):
+            path = path.name
+
+        self.started = time.time()
+        with DocumentArchive(path) as archive:
+            manifest = archive.read_manifest()
+
+            #Track every document listed in the manifest
+            pending = {}
+            for name, metadata in manifest.items():
+                name = normalize_name(str(name))
+                metadata = metadata or {}
+                document = {
+                    "title": str(metadata.get("title") or ""),
+                    "author": str(metadata.get("author") or ""),
+                    "language": metadata.get("language") or doc["language"]
+                }
+                result = UploadJob(self.params["email"], document, self.job)
+                with self.lock:
+                    self.documents.append(result)
+                if not document["title"] or not document["author"]:
+                    result.fail("Manifest entry for " + name + " needs a title and author")
+                    continue
+                pending[name] = (result, document)
+
+            slots = Semaphore(2 * self.workers)
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="import") as executor:
+                for name, member in archive.members():
+                    if name not in pending:
+                        continue
+                    result, document = pending.pop(name)
+                    slots.acquire()
+                    try:
+                        spooled = self.spool(member)
+                    except Exception as e:
+                        slots.release()
+                        result.fail(str(e))
+                        continue
+                    executor.submit(self.import_document, result, document, spooled, slots)
+
+            for name, (result, document) in pending.items():
+                result.fail(name + " isn't in the archive")
+
+        self.finished = time.time()
+        return self.report()
@@ -0,0 +1,753 @@
+import json
+import sys
+import uuid
+import zlib
+
+from array import array
+from collections import Counter
+from functools import lru_cache
+
+from ...models import CompressionDictionary, PageContent
+
+#Storage formats for page content
+COMPRESSED = "compressed"
+PACKED = "packed"
+STANDARD = "standard"
+
+#Page content whose serialized text, common to every page in the
+#order the layout builds it, primes trained dictionaries
+SKELETON_WORDS = [["", " ", ""]]
+SKELETON_BREAKS = {
+    "end": [0],
+    "pageBoundaries": {
+        "previous": {"line": 0, "page": 0, "pos": 0},
+        "next": {"line": 0, "page": 0, "pos": 0}
+    },
+    "start": [0],
+    "tokens": [{"fulltext": "", "positions": [[0, 0, 0], [0, 0, 0]]}]
+}
+
+#Number of frequent words placed in a trained dictionary
+DICTIONARY_WORDS = 2000
+
+#Maximum size of a zlib dictionary
+DICTIONARY_SIZE = 32768
+
+#Marks a split token whose full text is the word at its first position
+SAME_AS_WORD = -1
+
+#Marks a page boundary pointer that is absent from the page
+NO_POINTER = -1
+
+#Integer array types from narrowest to widest, with their bounds
+INT_TYPES = {
+    'B': (0, 255),
+    'b': (-128, 127),
+    'H': (0, 65535),
+    'h': (-32768, 32767),
+    'i': (-2147483648, 2147483647)
+}
+
+class ZlibCodec():
+    """
+    Compresses page content with zlib.
+    """
+    def __init__(self, level=6):
+        """
+        Initializes the codec.
+
+        Parameters
+        ----------
+        level : int
+            The zlib compression level
+        """
+        self.level = level
+
+    def compress(self, data, zdict=None):
+        """
+        Compresses serialized page content.
+
+        Parameters
+        ----------
+        data : bytes
+            The serialized page content
+        zdict : bytes
+            A dictionary of text expected to recur in the content
+
+        Returns
+        -------
+        bytes
+            The compressed content
+        """
+        if zdict:
+            compressor = zlib.compressobj(self.level, zdict=zdict)
+        else:
+            compressor = zlib.compressobj(self.level)
+        return compressor.compress(data) + compressor.flush()
+
+    def decompress(self, data, zdict=None):
+        """
+        Restores serialized page content.
+
+        Parameters
+        ----------
+        data : bytes
+            The compressed content
+        zdict : bytes
+            The dictionary the content was compressed with
+
+        Returns
+        -------
+        bytes
+            The serialized page content
+        """
+        if zdict:
+            decompressor = zlib.decompressobj(zdict=zdict)
+        else:
+            decompressor = zlib.decompressobj()
+        return decompressor.decompress(data) + decompressor.flush()
+
+#Codecs available for compressing page content, by name
+CODECS = {
+    "zlib": ZlibCodec
+}
+
+def register_codec(name, codec):
+    """
+    Makes a codec available for compressing page content.
+
+    Parameters
+    ----------
+    name : str
+        The name stored with every page the codec compresses
+    codec : class
+        The codec, which is constructed with a compression level and
+        provides compress(data, zdict) and decompress(data, zdict)
+    """
+    CODECS[name] = codec
+
+def get_codec(name, level=6):
+    """
+    Fetches a page content codec.
+
+    Parameters
+    ----------
+    name : str
+        The name of the codec
+    level : int
+        The compression level
+
+    Returns
+    -------
+    codec
+        The codec
+    """
+    if name not in CODECS:
+        raise Exception("Unknown compression codec: " + str(name))
+    return CODECS[name](level)
+
+@lru_cache(maxsize=128)
+def load_dictionary(dictionary_id):
+    """
+    Fetches a trained compression dictionary. Dictionaries never
+    change once saved, so they are kept in memory after the first use.
+
+    Parameters
+    ----------
+    dictionary_id : str
+        The unique identifier of the dictionary
+
+    Returns
+    -------
+    bytes
+        The dictionary
+    """
+    dictionary = CompressionDictionary.objects(dictionary_id=dictionary_id).first()
+    if not dictionary:
+        raise Exception("Couldn't find compression dictionary " + dictionary_id)
+    return dictionary.data
+
+def serialize_page_content(words, breaks):
+    """
+    Converts the content of a page into bytes for compression.
+
+    Parameters
+    ----------
+    words : list
+        The words in the page
+    breaks : dict
+        The words split across a line in the page
+
+    Returns
+    -------
+    bytes
+        The serialized content
+    """
+    content = {"breaks": breaks, "words": words}
+    content = json.dumps(content, ensure_ascii=False, separators=(",", ":"))
+    return content.encode('utf-8')
+
+def serialize_page_payload(title, author, page_number, words, breaks):
+    """
+    Converts a page into the JSON body of the response that serves
+    it, so that the body can be stored and sent as it is.
+
+    Parameters
+    ----------
+    title : str
+        The title of the document
+    author : str
+        The author of the document
+    page_number : int
+        The number of the page
+    words : list
+        The words in the page
+    breaks : dict
+        The words split across a line in the page
+
+    Returns
+    -------
+    bytes
+        The serialized response body
+    """
+    payload = {
+        "author": author,
+        "content": {"breaks": breaks, "words": words},
+        "page": page_number,
+        "title": title
+    }
+    payload = json.dumps(payload, ensure_ascii=False, separators=(",", ":"), sort_keys=True)
+    return payload.encode('utf-8')
+
+def train_dictionary(words):
+    """
+    Builds a compression dictionary from a sample of a document. zlib
+    favors matches near the end of the dictionary, so the most frequent
+    words come last.
+
+    Parameters
+    ----------
+    words : list
+        The words in a sample page of the document
+
+    Returns
+    -------
+    bytes
+        The trained dictionary
+    """
+    counts = Counter(word for line in words for word in line if word.strip())
+    frequent = [word for word, count in counts.most_common(DICTIONARY_WORDS)]
+    frequent.reverse()
+    skeleton = serialize_page_content(SKELETON_WORDS, SKELETON_BREAKS)
+    text = " ".join(json.dumps(word, ensure_ascii=False) for word in frequent)
+    dictionary = skeleton + text.encode('utf-8')
+    return dictionary[-DICTIONARY_SIZE:]
+
+class PageEncoder():
+    """
+    Builds the database representation of the content of a page
+    in the configured storage format.
+    """
+    def __init__(self, storage_format=STANDARD, compression=None, owner=None):
+        """
+        Initializes the encoder.
+
+        Parameters
+        ----------
+        storage_format : str
+            The storage format: standard, packed or compressed
+        compression : dict
+            The "codec" and "level" used by the compressed format, and
+            whether to "train" a dictionary for the document
+        owner : dict
+            The email, title, author and version of the document,
+            which identify any trained dictionary
+        """
+        compression = compression or {}
+        self.storage_format = storage_format or STANDARD
+        self.codec_name = compression.get("codec", "zlib")
+        self.codec = None
+        if self.storage_format == COMPRESSED:
+            self.codec = get_codec(self.codec_name, int(compression.get("level", 6)))
+        self.train = bool(int(compression.get("train", 0)))
+        self.owner = owner
+        self.dictionary = None
+        self.dictionary_id = None
+
+    def compress(self, words, breaks):
+        """
+        Builds the compressed database representation of the content
+        of a page. With training enabled, the first page compressed
+        trains the dictionary used for the rest of the document,
+        unless the version already has one.
+
+        Parameters
+        ----------
+        words : list
+            The words in the page
+        breaks : dict
+            The words split across a line in the page
+
+        Returns
+        -------
+        PageContent
+            The compressed database representation of the content
+        """
+        if self.train and self.dictionary is None:
+            if not self.find_dictionary():
+                self.save_dictionary(train_dictionary(words))
+
+        data = serialize_page_content(words, breaks)
+        data = self.codec.compress(data, self.dictionary)
+        page_content = PageContent(
+                                   encoding=COMPRESSED,
+                                   codec=self.codec_name,
+                                   data=data,
+                                   dictionary=self.dictionary_id
+                                  )
+        return page_content
+
+    def encode(self, page_content, page_number):
+        """
+        Converts the content of a page into the storage format.
+
+        Parameters
+        ----------
+        page_content : PageContent
+            The content of the page in the standard format
+        page_number : int
+            The number of the page
+
+        Returns
+        -------
+        PageContent
+            The database representation of the content
+        """
+        if self.storage_format == PACKED:
+            return pack_page_content(page_content.words, page_content.breaks, page_number)
+        if self.storage_format == COMPRESSED:
+            return self.compress(page_content.words, page_content.breaks)
+        return page_content
+
+    def find_dictionary(self):
+        """
+        Fetches the dictionary already trained for the version of
+        the document, so that pages written to the version again,
+        as incremental uploads do, don't train another one.
+
+        Returns
+        -------
+        bool
+            True if the version has a dictionary, False otherwise
+        """
+        dictionary = CompressionDictionary.objects(
+                                                   email=self.owner["email"],
+                                                   title=self.owner["title"],
+                                                   author=self.owner["author"],
+                                                   version=self.owner.get("version")
+                                                  ).only('dictionary_id').first()
+        if not dictionary:
+            return False
+
+        self.dictionary = load_dictionary(dictionary.dictionary_id)
+        self.dictionary_id = dictionary.dictionary_id
+        return True
+
+    def save_dictionary(self, dictionary):
+        """
+        Saves a trained dictionary so pages compressed with it can be read.
+
+        Parameters
+        ----------
+        dictionary : bytes
+            The trained dictionary
+        """
+        dictionary_id = uuid.uuid4().hex
+        CompressionDictionary(
+                              dictionary_id=dictionary_id,
+                              email=self.owner["email"],
+                              title=self.owner["title"],
+                              author=self.owner["author"],
+                              version=self.owner.get("version"),
+                              data=dictionary
+                             ).save()
+        self.dictionary = dictionary
+        self.dictionary_id = dictionary_id
+
+def decode_ints(data):
+    """
+    Converts a byte string produced by encode_ints back into
+    a list of integers.
+
+    Parameters
+    ----------
+    data : bytes
+        The encoded integers
+
+    Returns
+    -------
+    list
+        The decoded integers
+    """
+    if not data:
+        return []
+
+    values = array(chr(data[0]))
+    values.frombytes(data[1:])
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values.tolist()
+
+def encode_ints(values):
+    """
+    Converts a list of integers into a little-endian byte string,
+    using the narrowest integer type that holds every value. The
+    first byte records the type.
+
+    Parameters
+    ----------
+    values : list
+        The integers to encode
+
+    Returns
+    -------
+    bytes
+        The encoded integers
+    """
+    if not values:
+        return b""
+
+    low = min(values)
+    high = max(values)
+    typecode = 'i'
+    for code in INT_TYPES:
+        bounds = INT_TYPES[code]
+        if bounds[0] <= low and high <= bounds[1]:
+            typecode = code
+            break
+
+    values = array(typecode, values)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return typecode.encode('ascii') + values.tobytes()
+
+def encode_pointer(table, boundaries, key):
+    """
+    Appends a page boundary pointer to a breaks table.
+
+    Parameters
+    ----------
+    table : list
+        The breaks table being built
+    boundaries : dict
+        The page boundaries of the page
+    key : str
+        The pointer to encode, either "previous" or "next"
+    """
+    if key not in boundaries:
+        table.append(NO_POINTER)
+        return
+
+    pointer = boundaries[key]
+    if not pointer:
+        table.append(0)
+        return
+
+    table.append(1)
+    table += [pointer["line"], pointer["page"], pointer["pos"]]
+
+def decompress_page_content(content):
+    """
+    Rebuilds the words and line breaks of a page from its compressed
+    database representation.
+
+    Parameters
+    ----------
+    content : PageContent
+        The compressed content of the page
+
+    Returns
+    -------
+    dict
+        The words and line breaks of the page
+    """
+    zdict = None
+    if content.dictionary:
+        zdict = load_dictionary(content.dictionary)
+
+    codec = get_codec(content.codec)
+    data = codec.decompress(content.data, zdict)
+    data = json.loads(data.decode('utf-8'))
+    lines = {
+        "words": data["words"],
+        "breaks": data["breaks"]
+    }
+    return lines
+
+def decode_pointer(table, i, boundaries, key):
+    """
+    Reads a page boundary pointer from a breaks table.
+
+    Parameters
+    ----------
+    table : list
+        The breaks table
+    i : int
+        The position of the pointer in the table
+    boundaries : dict
+        The page boundaries being rebuilt
+    key : str
+        The pointer to decode, either "previous" or "next"
+
+    Returns
+    -------
+    int
+        The position in the table following the pointer
+    """
+    flag = table[i]
+    i += 1
+    if flag == NO_POINTER:
+        return i
+
+    if flag == 0:
+        boundaries[key] = {}
+        return i
+
+    line, page, pos = table[i:i + 3]
+    boundaries[key] = {"line": line, "page": page, "pos": pos}
+    return i + 3
+
+def get_content(content, page_number):
+    """
+    Fetches the words and line breaks of a page in the shape sent
+    to the document viewer, whatever format the page is stored in.
+
+    Parameters
+    ----------
+    content : PageContent
+        The stored content of the page
+    page_number : int
+        The number of the page
+
+    Returns
+    -------
+    dict
+        The words and line breaks of the page
+    """
+    if content.encoding == PACKED:
+        return unpack_page_content(content, page_number)
+    if content.encoding == COMPRESSED:
+        return decompress_page_content(content)
+
+    lines = {
+        "words": content.words,
+        "breaks": content.breaks
+    }
+    return lines
+
+def get_stored_content(content, page_number):
+    """
+    Fetches the words and line breaks of a page from its content as
+    returned by the driver. Content in the standard format is used
+    as it is, without building a PageContent from it.
+
+    Parameters
+    ----------
+    content : dict
+        The stored content of the page
+    page_number : int
+        The number of the page
+
+    Returns
+    -------
+    dict
+        The words and line breaks of the page
+    """
+    if content.get("encoding") in (PACKED, COMPRESSED):
+        return get_content(PageContent._from_son(content), page_number)
+
+    lines = {
+        "words": content.get("words", []),
+        "breaks": content.get("breaks", {})
+    }
+    return lines
+
+def get_word(words, position, page_number):
+    """
+    Finds the word at a position within a page.
+
+    Parameters
+    ----------
+    words : list
+        The words in the page
+    position : list
+        The page, line and word index of the word
+    page_number : int
+        The number of the page
+
+    Returns
+    -------
+    str
+        The word at the position, or None if it isn't in the page
+    """
+    if len(position) != 3:
+        return None
+
+    page, line, pos = position
+    if page != page_number:
+        return None
+    if line < 0 or line >= len(words):
+        return None
+    if pos < 0 or pos >= len(words[line]):
+        return None
+    return words[line][pos]
+
+def pack_page_content(words, breaks, page_number):
+    """
+    Builds the packed database representation of the content of a page.
+    The words are stored as one string with an array of word sizes,
+    from which the offset of every word follows, and an array of
+    line lengths. The line breaks are flattened into one
+    integer array, and the full text of a split token is only stored
+    when it differs from the word it points at.
+
+    Parameters
+    ----------
+    words : list
+        The words in the page
+    breaks : dict
+        The words split across a line in the page
+    page_number : int
+        The number of the page
+
+    Returns
+    -------
+    PageContent
+        The packed database representation of the content of the page
+    """
+    text = []
+    sizes = []
+    lines = []
+    for line in words:
+        lines.append(len(line))
+        for word in line:
+            text.append(word)
+            sizes.append(len(word))
+
+    table = []
+    break_text = []
+    for key in ["start", "end"]:
+        positions = breaks.get(key, [])
+        table.append(len(positions))
+        table += positions
+
+    tokens = breaks.get("tokens", [])
+    table.append(len(tokens))
+    for token in tokens:
+        positions = token["positions"]
+        table.append(len(positions))
+        for position in positions:
+            table.append(len(position))
+            table += position
+
+        fulltext = token["fulltext"]
+        if positions and get_word(words, positions[0], page_number) == fulltext:
+            table.append(SAME_AS_WORD)
+        else:
+            table.append(len(fulltext))
+            break_text.append(fulltext)
+
+    boundaries = breaks.get("pageBoundaries", {})
+    encode_pointer(table, boundaries, "previous")
+    encode_pointer(table, boundaries, "next")
+
+    page_content = PageContent(
+                               encoding=PACKED,
+                               text="".join(text),
+                               sizes=encode_ints(sizes),
+                               lines=encode_ints(lines),
+                               table=encode_ints(table),
+                               break_text="".join(break_text)
+                              )
+    return page_content
+
+def unpack_page_content(content, page_number):
+    """
+    Rebuilds the words and line breaks of a page from its packed
+    database representation.
+
+    Parameters
+    ----------
+    content : PageContent
+        The packed content of the page
+    page_number : int
+        The number of the page
+
+    Returns
+    -------
+    dict
+        The words and line breaks of the page
+    """
+    text = content.text or ""
+    sizes = decode_ints(content.sizes)
+    lines = decode_ints(content.lines)
+    table = decode_ints(content.table)
+    break_text = content.break_text or ""
+
+    words = []
+    start = 0
+    token = 0
+    for line_size in lines:
+        line = []
+        for size in sizes[token:token + line_size]:
+            end = start + size
+            line.append(text[start:end])
+            start = end
+        token += line_size
+        words.append(line)
+
+    line_boundaries = {}
+    i = 0
+    for key in ["start", "end"]:
+        count = table[i]
+        line_boundaries[key] = table[i + 1:i + 1 + count]
+        i += count + 1
+
+    count = table[i]
+    i += 1
+    tokens = []
+    text_start = 0
+    for t in range(count):
+        positions = []
+        num_positions = table[i]
+        i += 1
+        for p in range(num_positions):
+            size = table[i]
+            positions.append(table[i + 1:i + 1 + size])
+            i += size + 1
+
+        text_size = table[i]
+        i += 1
+        if text_size == SAME_AS_WORD:
+            fulltext = get_word(words, positions[0], page_number)
+        else:
+            fulltext = break_text[text_start:text_start + text_size]
+            text_start += text_size
+        tokens.append({"fulltext": fulltext, "positions": positions})
+
+    boundaries = {}
+    i = decode_pointer(table, i, boundaries, "previous")
+    i = decode_pointer(table, i, boundaries, "next")
+
+    breaks = {
+        "end": line_boundaries["end"],
+        "pageBoundaries": boundaries,
+        "start": line_boundaries["start"],
+        "tokens": tokens
+    }
+
+    lines = {
+        "words": words,
+        "breaks": breaks
+    }
+    return lines
@@ -0,0 +1,399 @@
+import copy
+import os
+import tempfile
+import time
+import traceback
+import uuid
+
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+from ...models import UploadStatus
+
+#Least number of seconds between saves of an upload's page count
+SAVE_INTERVAL = 1
+
+class UploadJob():
+    """
+    Tracks the progress of a document upload running
+    in the background.
+    """
+    def __init__(self, email, doc, parent=None):
+        """
+        Initializes the upload job.
+
+        Parameters
+        ----------
+        email : str
+            The email of the user who submitted the upload
+        doc : dict
+            The document to be uploaded
+        parent : UploadJob
+            The job that the upload is part of, such as a bulk
+            import, which saves the upload's progress along
+            with its own
+        """
+        self.job_id = uuid.uuid4().hex
+        self.email = email
+        self.title = doc["title"]
+        self.author = doc["author"]
+        self.status = "queued"
+        self.pages_written = 0
+        self.errors = []
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.details = {}
+        self.parent = parent
+        #Whether the job's progress is saved to the database
+        self.persistent = False
+        self.saved = 0
+        self.lock = Lock()
+        self.save_lock = Lock()
+
+    def fail(self, error):
+        """
+        Marks the upload as failed.
+
+        Parameters
+        ----------
+        error : str
+            A description of the failure
+        """
+        with self.lock:
+            self.errors.append(error)
+            self.status = "failed"
+            self.finished = time.time()
+        self.save()
+
+    def finish(self):
+        """
+        Marks the upload as complete.
+        """
+        with self.lock:
+            self.status = "complete"
+            self.finished = time.time()
+        self.save()
+
+    def get_details(self):
+        """
+        Fetches the progress the job reports beyond its own.
+
+        Returns
+        -------
+        dict
+            Additional fields of the job's report
+        """
+        return self.details
+
+    def is_finished(self):
+        """
+        Checks if the upload has stopped running.
+
+        Returns
+        -------
+        bool
+            True if the upload completed or failed, False otherwise
+        """
+        return self.finished is not None
+
+    def record_batch(self, size):
+        """
+        Records a batch of pages written to the database.
+
+        Parameters
+        ----------
+        size : int
+            The number of pages in the batch
+        """
+        with self.lock:
+            self.pages_written += size
+        self.save(force=False)
+
+    def report(self):
+        """
+        Summarizes the progress of the upload.
+
+        Returns
+        -------
+        dict
+            The status, pages written, throughput and errors of the upload
+        """
+        details = self.get_details()
+        with self.lock:
+            elapsed = 0.0
+            if self.started is not None:
+                end = self.finished or time.time()
+                elapsed = end - self.started
+
+            throughput = 0.0
+            if elapsed > 0:
+                throughput = self.pages_written / elapsed
+
+            report = {
+                "job_id": self.job_id,
+                "title": self.title,
+                "author": self.author,
+                "status": self.status,
+                "pages_written": self.pages_written,
+                "elapsed": round(elapsed, 3),
+                "pages_per_second": round(throughput, 3),
+                "errors": list(self.errors)
+            }
+        report.update(details)
+        return report
+
+    def save(self, force=True):
+        """
+        Saves the progress of the upload so that any web worker
+        can report on it. An upload that is part of a larger job
+        saves that job instead.
+
+        Parameters
+        ----------
+        force : bool
+            Whether to save the progress even if it was saved
+            less than SAVE_INTERVAL seconds ago
+        """
+        if self.parent is not None:
+            self.parent.save(force)
+            return
+        if not self.persistent:
+            return
+
+        with self.save_lock:
+            now = time.time()
+            if not force and now - self.saved < SAVE_INTERVAL:
+                return
+            self.saved = now
+
+            details = self.get_details()
+            with self.lock:
+                update = {
+                    "set__title": self.title,
+                    "set__author": self.author,
+                    "set__status": self.status,
+                    "set__pages_written": self.pages_written,
+                    "set__errors": list(self.errors),
+                    "set__submitted": self.submitted,
+                    "set__started": self.started,
+                    "set__finished": self.finished,
+                    "set__details": details
+                }
+            record = UploadStatus.objects(job_id=self.job_id, email=self.email)
+            record.update_one(upsert=True, **update)
+
+    def start(self):
+        """
+        Marks the upload as running.
+        """
+        with self.lock:
+            self.status = "running"
+            self.started = time.time()
+        self.save()
+
+class ImportJob(UploadJob):
+    """
+    Tracks the progress of a bulk import of an archive
+    of documents running in the background.
+    """
+    def __init__(self, email, doc, importer):
+        """
+        Initializes the import job.
+
+        Parameters
+        ----------
+        email : str
+            The email of the user who submitted the import
+        doc : dict
+            The archive to be imported
+        importer : BulkImporter
+            The mechanism for saving the archive's documents
+        """
+        super().__init__(email, doc)
+        self.importer = importer
+        importer.job = self
+
+    def get_details(self):
+        """
+        Fetches the per-document results and overall
+        throughput of the import.
+
+        Returns
+        -------
+        dict
+            Additional fields of the job's report
+        """
+        return self.importer.report()
+
+class UploadJobManager():
+    """
+    Runs document uploads on a pool of background threads
+    so that they don't tie up the web workers.
+    """
+    def __init__(self, app=None):
+        """
+        Initializes the job manager.
+
+        Parameters
+        ----------
+        app : Flask
+            The application whose configurations size the worker pool
+        """
+        self.executor = None
+        self.retention = 0
+        if app is not None:
+            self.init_app(app)
+
+    def get_job(self, job_id):
+        """
+        Fetches the saved progress of an upload job, which
+        may be running in another process.
+
+        Parameters
+        ----------
+        job_id : str
+            The unique identifier of the job
+
+        Returns
+        -------
+        UploadJob
+            The upload job, or None if it isn't known
+        """
+        record = UploadStatus.objects(job_id=job_id).as_pymongo().first()
+        if not record:
+            return None
+
+        job = UploadJob(record["email"], record)
+        job.job_id = job_id
+        job.status = record.get("status", job.status)
+        job.pages_written = record.get("pages_written", job.pages_written)
+        job.errors = record.get("errors", job.errors)
+        job.submitted = record.get("submitted", job.submitted)
+        job.started = record.get("started")
+        job.finished = record.get("finished")
+        job.details = record.get("details", job.details)
+        return job
+
+    def init_app(self, app):
+        """
+        Starts the pool of upload workers.
+
+        Parameters
+        ----------
+        app : Flask
+            The application whose configurations size the worker pool
+        """
+        workers = int(app.config["DOCUMENT_UPLOAD"]["JOB_WORKERS"])
+        self.retention = int(app.config["DOCUMENT_UPLOAD"]["JOB_RETENTION"])
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+        if workers > 0:
+            self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="upload")
+
+    def is_enabled(self):
+        """
+        Checks if uploads can run in the background.
+
+        Returns
+        -------
+        bool
+            True if a worker pool is available, False otherwise
+        """
+        return self.executor is not None
+
+    def prune(self):
+        """
+        Forgets finished jobs older than the retention period.
+        """
+        cutoff = time.time() - self.retention
+        UploadStatus.objects(finished__lt=cutoff).delete()
+
+    def run(self, job, uploader, doc):
+        """
+        Uploads the document and records the outcome on the job.
+
+        Parameters
+        ----------
+        job : UploadJob
+            The job tracking the upload
+        uploader : DocumentUploader
+            The mechanism for saving the document
+        doc : dict
+            The document to be saved. Its "file" is the path to the
+            spooled copy of the uploaded text.
+        """
+        job.start()
+        path = doc["file"]
+        try:
+            with open(path, 'rb') as text:
+                doc["file"] = text
+                uploader.upload(doc)
+            job.finish()
+        except Exception as e:
+            traceback.print_exc()
+            job.fail(str(e))
+        finally:
+            os.remove(path)
+
+    def spool(self, text):
+        """
+        Copies the uploaded text to a temporary file, since the
+        request's file is closed once the response is sent.
+
+        Parameters
+        ----------
+        text : FileStorage
+            The uploaded text or archive
+
+        Returns
+        -------
+        str
+            The path to the temporary file
+        """
+        spooled = tempfile.NamedTemporaryFile(prefix="upload_", suffix=".txt", delete=False)
+        with spooled:
+            text.save(spooled)
+        return spooled.name
+
+    def submit(self, uploader, doc, job=None):
+        """
+        Queues a document to be uploaded in the background.
+
+        Parameters
+        ----------
+        uploader : DocumentUploader
+            The mechanism for saving the document
+        doc : dict
+            The document to be saved
+        job : UploadJob
+            The job tracking the upload. A new one is made, and
+            reported to by a copy of the uploader, when none is
+            supplied.
+
+        Returns
+        -------
+        UploadJob
+            The job tracking the upload
+        """
+        self.prune()
+        if job is None:
+            job = UploadJob(uploader.params["email"], doc)
+            uploader = copy.copy(uploader)
+            uploader.params = dict(uploader.params)
+            uploader.params["monitor"] = job
+
+        doc = dict(doc)
+        doc["file"] = self.spool(doc["file"])
+        job.persistent = True
+        job.save()
+
+        try:
+            self.executor.submit(self.run, job, uploader, doc)
+        except Exception as e:
+            os.remove(doc["file"])
+            job.fail(str(e))
+        return job
+
+upload_jobs = UploadJobManager()
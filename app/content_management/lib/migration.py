@@ -0,0 +1,210 @@
+from pymongo import UpdateOne
+
+from ...models import CatalogEntry, CompressionDictionary, Page, PageContent
+from .encoding import PageEncoder, get_content, get_stored_content
+
+def backfill_catalog(email=None):
+    """
+    Adds the documents saved before the catalog described them to it.
+    Documents saved before pages were versioned get a catalog entry,
+    and entries without a page count get one along with a byte size
+    and upload time. The byte size of these documents is measured from
+    the words of their pages, since the uploaded text wasn't kept, and
+    the upload time is when their first page was written.
+
+    Parameters
+    ----------
+    email : str
+        The email of the only user whose documents are added,
+        or None to add every user's documents
+
+    Returns
+    -------
+    dict
+        The number of catalog entries created and updated
+    """
+    summary = {"created": 0, "updated": 0}
+    for owner in get_documents(email):
+        owner.setdefault("version", None)
+        entry = CatalogEntry.objects(
+                                     email=owner["email"],
+                                     title=owner["title"],
+                                     author=owner["author"]
+                                    ).first()
+
+        #Only describe the version that readers see
+        if entry:
+            if entry.version != owner["version"] or entry.page_count is not None:
+                continue
+        elif owner["version"] is not None:
+            continue
+
+        description = describe_document(owner)
+        if not description:
+            continue
+
+        CatalogEntry.objects(
+                             email=owner["email"],
+                             title=owner["title"],
+                             author=owner["author"]
+                            ).update_one(
+                                         upsert=True,
+                                         set__language=description["language"],
+                                         set__version=owner["version"],
+                                         set__page_count=description["page_count"],
+                                         set__byte_size=description["byte_size"],
+                                         set__upload_time=description["upload_time"]
+                                        )
+        if entry:
+            summary["updated"] += 1
+        else:
+            summary["created"] += 1
+    return summary
+
+def describe_document(owner):
+    """
+    Measures the stored pages of one version of a document.
+
+    Parameters
+    ----------
+    owner : dict
+        The email, title, author and version of the document
+
+    Returns
+    -------
+    dict
+        The language, page count, byte size and upload time of the
+        document, or None if it has no pages
+    """
+    pages = Page.objects(
+                         email=owner["email"],
+                         resource__title=owner["title"],
+                         resource__author=owner["author"],
+                         version=owner["version"]
+                        )
+    pages = pages.order_by('resource__page_number').only('content', 'resource').as_pymongo()
+
+    description = None
+    for page in pages:
+        if description is None:
+            description = {
+                "language": page["resource"].get("language"),
+                "page_count": 0,
+                "byte_size": 0,
+                "upload_time": page["_id"].generation_time.replace(tzinfo=None)
+            }
+        lines = get_stored_content(page.get("content") or {}, page["resource"]["page_number"])
+        description["page_count"] += 1
+        description["byte_size"] += sum(len(word.encode('utf-8')) for line in lines["words"] for word in line)
+    return description
+
+def get_documents(email=None):
+    """
+    Finds every document with stored pages.
+
+    Parameters
+    ----------
+    email : str
+        The email of the only user whose documents are found,
+        or None to find every user's documents
+
+    Returns
+    -------
+    list
+        The email, title, author and version of each document
+    """
+    pipeline = []
+    if email is not None:
+        pipeline.append({"$match": {"email": email}})
+    pipeline += [
+        {"$group": {"_id": {
+            "email": "$email",
+            "title": "$resource.title",
+            "author": "$resource.author",
+            "version": "$version"
+        }}}
+    ]
+    documents = [group["_id"] for group in Page.objects.aggregate(pipeline)]
+    return documents
+
+def migrate_document(owner, encoder, batch_size):
+    """
+    Rewrites the pages of one document with the supplied encoder.
+
+    Parameters
+    ----------
+    owner : dict
+        The email, title, author and version of the document
+    encoder : PageEncoder
+        The encoder for the new storage format
+    batch_size : int
+        The number of pages updated per database request
+
+    Returns
+    -------
+    int
+        The number of pages rewritten
+    """
+    pages = Page.objects(
+                         email=owner["email"],
+                         resource__title=owner["title"],
+                         resource__author=owner["author"],
+                         version=owner.get("version")
+                        )
+    pages = pages.order_by('resource__page_number').no_cache()
+
+    collection = Page._get_collection()
+    updates = []
+    count = 0
+    for page in pages:
+        page_number = page.resource.page_number
+        lines = get_content(page.content, page_number)
+        content = PageContent(words=lines["words"], breaks=lines["breaks"])
+        content = encoder.encode(content, page_number)
+        updates.append(UpdateOne({"_id": page.id}, {"$set": {"content": content.to_mongo()}}))
+        count += 1
+        if len(updates) >= batch_size:
+            collection.bulk_write(updates, ordered=False)
+            updates = []
+
+    if updates:
+        collection.bulk_write(updates, ordered=False)
+    return count
+
+def migrate_pages(storage_format, compression=None, batch_size=100):
+    """
+    Rewrites every stored page in a new storage format. Each version
+    of a document is rewritten separately, and dictionaries trained
+    for the old pages are removed once a version is rewritten.
+
+    Parameters
+    ----------
+    storage_format : str
+        The storage format: standard, packed or compressed
+    compression : dict
+        The codec, level and dictionary training used by the
+        compressed format
+    batch_size : int
+        The number of pages updated per database request
+
+    Returns
+    -------
+    dict
+        The number of documents and pages rewritten
+    """
+    summary = {"documents": 0, "pages": 0}
+    for owner in get_documents():
+        owner.setdefault("version", None)
+        encoder = PageEncoder(storage_format, compression, owner)
+        summary["pages"] += migrate_document(owner, encoder, batch_size)
+        summary["documents"] += 1
+
+        stale = CompressionDictionary.objects(
+                                              email=owner["email"],
+                                              title=owner["title"],
+                                              author=owner["author"],
+                                              version=owner["version"],
+                                              dictionary_id__ne=encoder.dictionary_id
+                                             )
+        stale.delete()
+    return summary
@@ -0,0 +1,155 @@
+from collections import OrderedDict
+from threading import Lock
+
+from .token_stream import read_token_stream
+from .upload import layout_pages
+
+#Bounds on the layouts that readers may request
+MIN_LINE_SIZE = 10
+MAX_LINE_SIZE = 1000
+MIN_PAGE_LIMIT = 1
+MAX_PAGE_LIMIT = 1000
+
+class ReflowedDocument():
+    """
+    Lays out the pages of a stored token stream for a line size
+    and page limit other than the ones the document was uploaded
+    with. Pages are only laid out as far as they have been read.
+    """
+    def __init__(self, stream, tokenizer, line_size, page_limit, early_cutoff=0):
+        """
+        Initializes the reflowed document.
+
+        Parameters
+        ----------
+        stream : TokenStream
+            The words of every line of the document
+        tokenizer : Tokenizer
+            The tokenizer for the document's language
+        line_size : int
+            The number of characters in a line
+        page_limit : int
+            The number of lines in a page
+        early_cutoff : int
+            The padding allowed before a line may end early
+        """
+        token_lines = tokenizer.layout_lines(read_token_stream(stream), line_size, padding=early_cutoff)
+        self.layout = layout_pages(token_lines, line_size, page_limit)
+        self.pages = {}
+        self.last_page = 0
+        self.complete = False
+        self.lock = Lock()
+
+    def get_pages(self, start, end):
+        """
+        Fetches a range of pages, laying out any that haven't
+        been reached yet.
+
+        Parameters
+        ----------
+        start : int
+            The number of the first page
+        end : int
+            The number of the last page
+
+        Returns
+        -------
+        list
+            The page number and the words and line breaks of each
+            page in the range, in page order
+        """
+        with self.lock:
+            while not self.complete and self.last_page < end:
+                page = next(self.layout, None)
+                if page is None:
+                    self.complete = True
+                    break
+                page_num, page_content = page
+                self.pages[page_num] = {
+                    "words": page_content.words,
+                    "breaks": page_content.breaks
+                }
+                self.last_page = page_num
+
+        pages = []
+        for page_num in range(start, end + 1):
+            if page_num in self.pages:
+                pages.append((page_num, self.pages[page_num]))
+        return pages
+
+class LayoutCache():
+    """
+    Keeps the most recently read reflowed documents so that
+    readers paging through a document don't lay it out again.
+    """
+    def __init__(self, app=None):
+        """
+        Initializes the layout cache.
+
+        Parameters
+        ----------
+        app : Flask
+            The application whose configurations size the cache
+        """
+        self.layouts = OrderedDict()
+        self.lock = Lock()
+        self.size = 0
+        self.tokenizers = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Sizes the cache and empties it.
+
+        Parameters
+        ----------
+        app : Flask
+            The application whose configurations size the cache
+        """
+        with self.lock:
+            self.size = int(app.config["REFLOW_CACHE_SIZE"])
+            self.tokenizers = app.config["TOKENIZER"]
+            self.layouts.clear()
+
+    def get_layout(self, stream, layout):
+        """
+        Fetches a document laid out for a line size and page limit,
+        reflowing its token stream if the layout isn't cached. Layouts
+        are cached by the stream they were laid out from, so a new
+        upload of the document is never served a stale layout.
+
+        Parameters
+        ----------
+        stream : TokenStream
+            The words of every line of the document
+        layout : tuple
+            The line size, page limit and early cutoff
+
+        Returns
+        -------
+        ReflowedDocument
+            The reflowed document
+        """
+        key = (stream.file_id,) + tuple(layout)
+        with self.lock:
+            document = self.layouts.get(key)
+            if document is not None:
+                self.layouts.move_to_end(key)
+                return document
+
+        line_size, page_limit, early_cutoff = layout
+        tokenizer = self.tokenizers.select(stream.language)
+        document = ReflowedDocument(stream, tokenizer, line_size, page_limit, early_cutoff)
+        if self.size <= 0:
+            return document
+
+        with self.lock:
+            #Keep the layout another request finished first
+            document = self.layouts.setdefault(key, document)
+            self.layouts.move_to_end(key)
+            while len(self.layouts) > self.size:
+                self.layouts.popitem(last=False)
+        return document
+
+reflow_layouts = LayoutCache()
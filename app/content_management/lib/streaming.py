@@ -0,0 +1,85 @@
+import codecs
+
+MAX_LINE_LENGTH = 10000
+READ_SIZE = 65536
+
+def split_lines(text, max_line_length):
+    """
+    Cuts complete lines off the front of decoded text. Lines longer
+    than the maximum length are split at the last space that fits,
+    or at the maximum length if there is no space.
+
+    Parameters
+    ----------
+    text : str
+        The decoded text that hasn't been split into lines yet
+    max_line_length : int
+        The maximum number of characters in a line
+
+    Returns
+    -------
+    tuple
+        The complete lines and the text left after them
+    """
+    lines = []
+    pos = 0
+    while True:
+        #Look for a line end within the maximum line length
+        end = text.find("\n", pos, pos + max_line_length + 1)
+        if end != -1:
+            lines.append(text[pos:end + 1])
+            pos = end + 1
+            continue
+
+        if len(text) - pos <= max_line_length:
+            break
+
+        #Split an overlong line where a word ends
+        cut = text.rfind(" ", pos, pos + max_line_length)
+        if cut > pos:
+            lines.append(text[pos:cut] + "\n")
+            pos = cut + 1
+        else:
+            cut = pos + max_line_length
+            lines.append(text[pos:cut] + "\n")
+            pos = cut
+
+    return lines, text[pos:]
+
+def read_lines(stream, read_size=READ_SIZE, max_line_length=MAX_LINE_LENGTH):
+    """
+    Lazily reads the lines of an uploaded text in fixed size chunks,
+    so that memory use doesn't depend on the size of the text or the
+    length of its lines. UTF-8 characters split across chunks are
+    decoded once the rest of their bytes arrive.
+
+    Parameters
+    ----------
+    stream : file
+        The uploaded text, opened in binary or text mode
+    read_size : int
+        The number of bytes read at a time
+    max_line_length : int
+        The maximum number of characters in a line
+
+    Returns
+    -------
+    generator
+        The decoded lines of the text
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    pending = ""
+    while True:
+        chunk = stream.read(read_size)
+        final = not chunk
+        if isinstance(chunk, bytes):
+            chunk = decoder.decode(chunk, final=final)
+
+        lines, pending = split_lines(pending + chunk, max_line_length)
+        yield from lines
+        if final:
+            break
+
+    #The last line may not end with a new line
+    if pending:
+        yield pending
@@ -0,0 +1,201 @@
+import json
+import zlib
+
+import gridfs
+
+from ...models import TokenStream
+
+#GridFS bucket holding the compressed token streams
+BUCKET_NAME = "token_streams"
+
+#Compressed bytes gathered before they are written to GridFS
+WRITE_SIZE = 65536
+
+#Compressed bytes decompressed at a time when reading a stream
+READ_SIZE = 65536
+
+#Codec of the token streams
+CODEC = "zlib"
+
+def get_bucket():
+    """
+    Opens the GridFS bucket holding the token streams.
+
+    Returns
+    -------
+    GridFSBucket
+        The token stream bucket
+    """
+    return gridfs.GridFSBucket(TokenStream._get_db(), bucket_name=BUCKET_NAME)
+
+def delete_token_streams(email, title, author, version=None, keep=None, all_versions=False):
+    """
+    Removes the token streams of a document.
+
+    Parameters
+    ----------
+    email : str
+        The email of the document's owner
+    title : str
+        The title of the document
+    author : str
+        The author of the document
+    version : str
+        The version whose streams are removed
+    keep : ObjectId
+        The file of a stream to be left in place
+    all_versions : bool
+        True to remove the streams of every version
+    """
+    streams = TokenStream.objects(email=email, title=title, author=author)
+    if not all_versions:
+        streams = streams.filter(version=version)
+
+    bucket = None
+    for stream in streams:
+        if keep is not None and stream.file_id == keep:
+            continue
+        if bucket is None:
+            bucket = get_bucket()
+        try:
+            bucket.delete(stream.file_id)
+        except gridfs.errors.NoFile:
+            pass
+        stream.delete()
+
+def find_token_stream(email, title, author, version):
+    """
+    Finds the token stream of a version of a document.
+
+    Parameters
+    ----------
+    email : str
+        The email of the document's owner
+    title : str
+        The title of the document
+    author : str
+        The author of the document
+    version : str
+        The version of the document
+
+    Returns
+    -------
+    TokenStream
+        The token stream, or None if the version wasn't saved with one
+    """
+    streams = TokenStream.objects(email=email, title=title, author=author, version=version)
+    return streams.order_by('-id').first()
+
+def read_token_stream(stream):
+    """
+    Reads the words of every line of a document. The compressed
+    stream is fetched whole, since it is a fraction of the size
+    of the text, but decompressed a piece at a time.
+
+    Parameters
+    ----------
+    stream : TokenStream
+        The token stream to be read
+
+    Returns
+    -------
+    generator
+        The words of each line, with None standing in for each blank line
+    """
+    data = get_bucket().open_download_stream(stream.file_id).read()
+    decompressor = zlib.decompressobj()
+    remainder = b""
+    for start in range(0, len(data), READ_SIZE):
+        remainder += decompressor.decompress(data[start:start + READ_SIZE])
+        lines = remainder.split(b"\n")
+        remainder = lines.pop()
+        for line in lines:
+            yield json.loads(line)
+
+    remainder += decompressor.flush()
+    for line in remainder.split(b"\n"):
+        if line:
+            yield json.loads(line)
+
+class TokenStreamWriter():
+    """
+    Saves the words of every line of a document as they
+    pass through on their way to be laid out.
+    """
+    def __init__(self, owner, level=6):
+        """
+        Initializes the token stream writer.
+
+        Parameters
+        ----------
+        owner : dict
+            The email, title, author, language and version
+            of the document
+        level : int
+            The zlib compression level
+        """
+        self.owner = owner
+        self.level = level
+
+    def record(self, word_lines):
+        """
+        Passes the words of each line through unchanged while writing
+        them to GridFS, one JSON array per line. The stream is only
+        saved once every line has been read, and replaces any other
+        stream of the same version.
+
+        Parameters
+        ----------
+        word_lines : iterable
+            The words of each line, with None standing in for each blank line
+
+        Returns
+        -------
+        generator
+            The words of each line
+        """
+        owner = self.owner
+        filename = "/".join([owner["email"], owner["title"], owner["author"], str(owner["version"])])
+        upload = get_bucket().open_upload_stream(filename)
+        compressor = zlib.compressobj(self.level)
+        pending = []
+        pending_size = 0
+        count = 0
+        try:
+            for words in word_lines:
+                line = json.dumps(words, ensure_ascii=False).encode("utf-8") + b"\n"
+                data = compressor.compress(line)
+                if data:
+                    pending.append(data)
+                    pending_size += len(data)
+                    if pending_size >= WRITE_SIZE:
+                        upload.write(b"".join(pending))
+                        pending = []
+                        pending_size = 0
+                count += 1
+                yield words
+
+            pending.append(compressor.flush())
+            upload.write(b"".join(pending))
+            upload.close()
+        except BaseException:
+            upload.abort()
+            raise
+
+        TokenStream(
+                    email=owner["email"],
+                    title=owner["title"],
+                    author=owner["author"],
+                    language=owner["language"],
+                    version=owner["version"],
+                    file_id=upload._id,
+                    codec=CODEC,
+                    lines=count
+                   ).save()
+        delete_token_streams(
+                             owner["email"],
+                             owner["title"],
+                             owner["author"],
+                             version=owner["version"],
+                             keep=upload._id
+                            )
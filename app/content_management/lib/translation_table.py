@@ -0,0 +1,158 @@
+from dictionaries.translation_cache import CACHED_STATUSES, normalize_query
+
+from ...models import TranslationEntry
+
+def collect_terms(word_lines, terms):
+    """
+    Gathers the distinct words of a document as they pass
+    through on their way to be laid out.
+
+    Parameters
+    ----------
+    word_lines : iterable
+        The words of each line, with None standing in for each blank line
+    terms : dict
+        The normalized words seen so far, in the order they
+        were first seen. New words are added to it.
+
+    Returns
+    -------
+    generator
+        The words of each line
+    """
+    for words in word_lines:
+        if words:
+            for word in words:
+                #Punctuation and numbers have no translations
+                if any(c.isalpha() for c in word):
+                    terms[normalize_query(word)] = None
+        yield words
+
+def delete_translation_tables(email, title, author, version=None, all_versions=False):
+    """
+    Removes the translation tables of a document.
+
+    Parameters
+    ----------
+    email : str
+        The email of the document's owner
+    title : str
+        The title of the document
+    author : str
+        The author of the document
+    version : str
+        The version whose table is removed
+    all_versions : bool
+        True to remove the tables of every version
+    """
+    entries = TranslationEntry.objects(email=email, title=title, author=author)
+    if not all_versions:
+        entries = entries.filter(version=version)
+    entries.delete()
+
+def find_translations(email, title, author, version, terms, size, dictionary_version):
+    """
+    Looks up words in the translation table of a version of a document.
+    A table looked up in an older build of the dictionary is ignored.
+
+    Parameters
+    ----------
+    email : str
+        The email of the document's owner
+    title : str
+        The title of the document
+    author : str
+        The author of the document
+    version : str
+        The version of the document
+    terms : list
+        The normalized words to be looked up
+    size : int
+        The number of results per page
+    dictionary_version : str
+        The version of the dictionary's current index, or
+        None if it isn't known
+
+    Returns
+    -------
+    dict
+        The JSON response and HTTP status code of each word found
+        in the table. Words the document doesn't contain are left out.
+    """
+    if version is None or dictionary_version is None or not terms:
+        return {}
+
+    entries = TranslationEntry.objects(
+                                       email=email,
+                                       title=title,
+                                       author=author,
+                                       version=version,
+                                       dictionary_version=dictionary_version,
+                                       size=size,
+                                       term__in=list(terms)
+                                      )
+    entries = entries.only('term', 'status', 'body').as_pymongo()
+
+    translations = {}
+    for entry in entries:
+        translations[entry["term"]] = (entry["body"], entry["status"])
+    return translations
+
+def write_translation_table(owner, terms, dictionary, size, batch_size):
+    """
+    Looks up the first page of translations of every distinct word
+    of a document, a batch of words per dictionary request, and
+    saves them as the translation table of the document's version.
+    Any table the version already had is replaced. If any lookup
+    fails, the table is left unfinished and an exception is raised,
+    so the caller should remove it.
+
+    Parameters
+    ----------
+    owner : dict
+        The email, title, author and version of the document
+    terms : iterable
+        The normalized words of the document
+    dictionary : ForeignLanguageDictionary
+        The dictionary of the document's language
+    size : int
+        The number of results per page
+    batch_size : int
+        The number of words looked up per dictionary request
+
+    Returns
+    -------
+    int
+        The number of words in the table
+    """
+    delete_translation_tables(owner["email"], owner["title"], owner["author"], version=owner["version"])
+
+    #Taken before the lookups, so that a rebuild during them makes the table stale
+    dictionary_version = dictionary.get_index_version()
+    if dictionary_version is None:
+        raise Exception("Couldn't find the dictionary's index")
+
+    terms = list(terms)
+    collection = TranslationEntry._get_collection()
+    for start in range(0, len(terms), batch_size):
+        batch = terms[start:start + batch_size]
+        responses = dictionary.get_translations(batch, 1, size)
+        entries = []
+        for term, (body, status) in zip(batch, responses):
+            if status not in CACHED_STATUSES:
+                raise Exception("Couldn't translate " + term)
+            entry = TranslationEntry(
+                                     email=owner["email"],
+                                     title=owner["title"],
+                                     author=owner["author"],
+                                     version=owner["version"],
+                                     term=term,
+                                     dictionary_version=dictionary_version,
+                                     size=size,
+                                     status=status,
+                                     body=body
+                                    )
+            entries.append(entry.to_mongo())
+        if entries:
+            collection.insert_many(entries, ordered=False)
+    return len(terms)
@@ -1,4 +1,26 @@
-from ...models import Book, Page, PageContent
+import datetime
+import hashlib
+import json
+import multiprocessing
+import uuid
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from queue import Queue
+from threading import Thread
+
+from mongoengine.errors import NotUniqueError
+from pymongo import DeleteOne, InsertOne, UpdateOne
+
+from ...models import Book, CatalogEntry, CompressionDictionary, Page, PageContent
+from .encoding import STANDARD, PageEncoder, serialize_page_payload
+from .migration import backfill_catalog
+from .streaming import MAX_LINE_LENGTH, READ_SIZE, read_lines
+from .token_stream import TokenStreamWriter, delete_token_streams
+from .translation_table import collect_terms, delete_translation_tables, write_translation_table
+
+#Tokenizer of the current tokenization worker process
+worker_tokenizer = None
 
 def add_page(batch, page_content, page_number, upload_info):
     """
@@ -13,16 +35,33 @@ def add_page(batch, page_content, page_number, upload_info):
         The content of the page to be added
     page_number: int
         The number of the page to be added
-    upload_info: func
-        The document resource creator
+    upload_info: dict
+        The user, document, resource creator, page content
+        encoder and version of the upload, and whether to
+        store the response body of the page
     """
     user = upload_info["user"]
     resource = upload_info["resource"]
     doc = upload_info["doc"]
+    content_hash = get_content_hash(page_content)
+    payload = None
+    if upload_info.get("payload"):
+        payload = serialize_page_payload(
+                                         doc["title"],
+                                         doc["author"],
+                                         page_number,
+                                         page_content.words,
+                                         page_content.breaks
+                                        )
+    page_content = upload_info["encoder"].encode(page_content, page_number)
+
     page = Page(
                 email=user,
                 resource=resource(doc, page_number),
-                content=page_content
+                content=page_content,
+                content_hash=content_hash,
+                version=upload_info["version"],
+                payload=payload
                )
     batch.append(page)
 
@@ -53,6 +92,60 @@ def check_line_start(line_breaks, char_count):
     can_process = can_process and (char_count == 0)
     return can_process
 
+def get_content_hash(page_content):
+    """
+    Fingerprints the content of a page so that changed pages
+    can be found without comparing their full content.
+
+    Parameters
+    ----------
+    page_content: PageContent
+        The content of the page
+
+    Returns
+    -------
+    str
+        The hex digest of the page content
+    """
+    content = {
+        "words": page_content.words,
+        "breaks": page_content.breaks
+    }
+    content = json.dumps(content, sort_keys=True, ensure_ascii=False)
+    content_hash = hashlib.sha1(content.encode('utf-8')).hexdigest()
+    return content_hash
+
+def get_chunks(lines, chunk_size):
+    """
+    Splits the lines of a document into chunks that can be tokenized
+    independently. A chunk only ends on a blank line, since the
+    character count of a line restarts there.
+
+    Parameters
+    ----------
+    lines: iterable
+        The lines of the document
+    chunk_size: int
+        The minimum number of lines in a chunk
+
+    Returns
+    -------
+    generator
+        The chunks of decoded lines, in document order
+    """
+    chunk = []
+    for line in lines:
+        #Convert from bytes to unicode if necessary
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        chunk.append(line)
+        if line == "\n" and len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+
+    if chunk:
+        yield chunk
+
 def get_next_page_pointer(words, page):
     """
     Finds the position of the first word in the page
@@ -155,6 +248,113 @@ def get_prev_page_pointer(words, line_breaks):
     }
     return prev_pointer
 
+def insert_pages(batch):
+    """
+    Inserts pages into the database with a single unordered bulk
+    write. The pages belong to an unpublished version, so their
+    insertion order doesn't matter to readers.
+
+    Parameters
+    ----------
+    batch: list
+        The pages to be inserted
+    """
+    pages = [page.to_mongo() for page in batch]
+    Page._get_collection().insert_many(pages, ordered=False)
+
+def layout_pages(token_lines, line_size, new_page):
+    """
+    Lays out the tokens of a document as pages.
+
+    Parameters
+    ----------
+    token_lines: iterable
+        The tokens of each line, with None standing in for each blank line
+    line_size: int
+        The number of characters in a line
+    new_page: int
+        The number of lines in a page
+
+    Returns
+    -------
+    generator
+        The number and content of each page, in page order
+    """
+    #Process each line in document
+    line_num = 0
+    page_num = 1
+    words = [[]]
+    line_breaks = reset_line_breaks()
+    prev_state = reset_prev_state()
+    can_add_page = False
+    char_count = 0
+    curr_boundary = {
+        "pos": 0
+    }
+    for tokenized in token_lines:
+        #Blank new line
+        if tokenized is None:
+            #Insert empty Line
+            line_num += 1
+            words.append([])
+
+            #Start new line for text
+            char_count = 0
+            line_num += 1
+            words.append([])
+            continue
+
+        for token in tokenized:
+            text, size, fulltext = token
+            #Check if token continues onto next line
+            if size + char_count >= line_size:
+                words[line_num].append(text)
+                line_info = [line_num, page_num, new_page, len(words[line_num]), line_size]
+                curr_boundary = process_line_end(token, curr_boundary, line_info, line_breaks)
+                char_count = 0
+                if (line_num + 1) < new_page:
+                    line_num += 1
+                    words.append([])
+                else:
+                    line_num += 1
+            else:
+                if check_line_start(line_breaks, char_count):
+                    line_info = [line_num, page_num, new_page, line_size]
+                    curr_boundary = process_line_start(token, curr_boundary, line_info, line_breaks)
+                words[line_num].append(text)
+                char_count += size
+
+            #Hand off previous page
+            if can_add_page:
+                can_get_next_pointer = (len(words[0]) > 1) or (len(words) > 1)
+                if can_get_next_pointer:
+                    prev_page = page_num - 1
+                    yield prev_page, get_page_content(words, prev_page, prev_state)
+                    can_add_page = False
+
+            #Start new page
+            if (line_num + 1) > new_page:
+                can_add_page = True
+                update_prev_state(words, line_breaks, prev_state)
+                page_num += 1
+                line_num = 0
+                words = [[]]
+                line_breaks = reset_line_breaks(curr_boundary)
+                #Blank lines can end a page without a line boundary resetting
+                #the position, so count the new page's split words from its own
+                curr_boundary = {
+                    "pos": len(line_breaks["tokens"])
+                }
+
+    #Hand off last page
+    prev_page = page_num - 1
+    if len(words) > 0:
+        update_prev_state(words, line_breaks, prev_state)
+        blank_page = []
+        yield page_num, get_page_content(blank_page, page_num, prev_state)
+    else:
+        yield prev_page, get_page_content(words, prev_page, prev_state)
+
 def process_line_end(token, curr_boundary, line_info, line_breaks):
     """
     Updates line breaks dictionary to save data about a split token that
@@ -162,8 +362,9 @@ def process_line_end(token, curr_boundary, line_info, line_breaks):
 
     Parameters
     ----------
-    token: dict
-        The token that overlaps with the end of the line
+    token: tuple
+        The text, size and full text of the token that
+        overlaps with the end of the line
     
     curr_boundary: dict
         The most recent line boundary reached in the page
@@ -180,11 +381,12 @@ def process_line_end(token, curr_boundary, line_info, line_breaks):
         The next boundary to be processed
     """
     line_num, page_num, new_page, num_words, line_size = line_info
+    text, size, fulltext = token
     new_boundary = {}
     curr_pos = curr_boundary["pos"]
 
     #Word overflows onto next line
-    if "break" in token:
+    if fulltext is not None:
         left_token = [page_num, line_num, num_words - 1]
         right_token = []
         if (line_num + 1) < new_page:
@@ -201,7 +403,7 @@ def process_line_end(token, curr_boundary, line_info, line_breaks):
             }
         
         to_append = {
-            "fulltext": token["break"],
+            "fulltext": fulltext,
             "positions": [left_token, right_token]
         }
         line_breaks["tokens"].append(to_append)
@@ -213,11 +415,11 @@ def process_line_end(token, curr_boundary, line_info, line_breaks):
     else:
         line_breaks["end"].append(curr_pos)
         
-        if token["size"] == line_size:
+        if size == line_size:
             line_breaks["start"].append(curr_pos)
         
         to_append = {
-            "fulltext": token["text"],
+            "fulltext": text,
             "positions": [[page_num, line_num, max(0, num_words - 1)]]
         }
         line_breaks["tokens"].append(to_append)
@@ -236,8 +438,9 @@ def process_line_start(token, curr_boundary, line_info, line_breaks):
 
     Parameters
     ----------
-    token: dict
-        The token that overlaps with the start of the line
+    token: tuple
+        The text, size and full text of the token that
+        overlaps with the start of the line
     
     curr_boundary: dict
         The most recent line boundary reached in the page
@@ -254,17 +457,18 @@ def process_line_start(token, curr_boundary, line_info, line_breaks):
         The next boundary to be processed
     """
     line_num, page_num, new_page, line_size = line_info
+    text, size, fulltext = token
     new_boundary = {}
     curr_pos = curr_boundary["pos"]
     
     line_breaks["start"].append(curr_pos)
     to_append = {
-        "fulltext": token["text"],  
+        "fulltext": text,
         "positions": [[page_num, line_num, 0]]
     }
     line_breaks["tokens"].append(to_append)
 
-    if token["size"] == line_size:
+    if size == line_size:
         line_breaks["end"].append(curr_pos)
         if (line_num + 1) >= new_page:
             new_boundary["pos"] = 0
@@ -322,6 +526,93 @@ def reset_prev_state():
     }
     return prev_state
 
+def set_worker_tokenizer(tokenizer):
+    """
+    Saves the tokenizer used by a tokenization worker process.
+
+    Parameters
+    ----------
+    tokenizer: Tokenizer
+        The tokenizer for the document's language
+    """
+    global worker_tokenizer
+    worker_tokenizer = tokenizer
+
+def split_chunk(chunk):
+    """
+    Splits a chunk of a document into words inside a worker process.
+
+    Parameters
+    ----------
+    chunk: list
+        The lines of the chunk
+
+    Returns
+    -------
+    list
+        The words of each line, with None standing in for each blank line
+    """
+    return list(split_lines(chunk, worker_tokenizer))
+
+def split_chunks(chunks, tokenizer, processes):
+    """
+    Splits the chunks of a document into words across a pool of
+    worker processes. Only a few chunks are in flight at a time so
+    that memory use doesn't grow with the size of the document.
+
+    Parameters
+    ----------
+    chunks: iterable
+        The chunks of the document
+    tokenizer: Tokenizer
+        The tokenizer for the document's language
+    processes: int
+        The number of worker processes
+
+    Returns
+    -------
+    generator
+        The words of each line, in document order, with None
+        standing in for each blank line
+    """
+    max_pending = 2 * processes
+    #Workers are started from a fork server, since forking the
+    #threads of the web server could copy a held lock into them
+    with ProcessPoolExecutor(max_workers=processes,
+                             mp_context=multiprocessing.get_context("forkserver"),
+                             initializer=set_worker_tokenizer,
+                             initargs=(tokenizer,)) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(split_chunk, chunk))
+            if len(pending) >= max_pending:
+                yield from pending.popleft().result()
+
+        while pending:
+            yield from pending.popleft().result()
+
+def split_lines(lines, tokenizer):
+    """
+    Splits the lines of a document into words. The tokenizer
+    works through buffered blocks of lines rather than one
+    line at a time.
+
+    Parameters
+    ----------
+    lines: iterable
+        The lines of the document
+    tokenizer: Tokenizer
+        The tokenizer for the document's language
+
+    Returns
+    -------
+    generator
+        The words of each line, with None standing in for each blank line
+    """
+    #Convert from bytes to unicode if necessary
+    lines = (line.decode('utf-8') if isinstance(line, bytes) else line for line in lines)
+    return tokenizer.split_lines(lines)
+
 def update_prev_state(words, line_breaks, prev_state):
     """
     Modifies a dictionary containing information about a previous 
@@ -355,6 +646,19 @@ class DocumentUploader():
             Configurations for the document upload procedure
         """
         self.params = params
+        self.collector = None
+        self.stats = {"pages": 0, "bytes": 0}
+        self.terms = None
+
+    def catalog_user(self):
+        """
+        Adds the user's documents saved before the catalog to it before
+        the user's first catalog entry is written, since the documents
+        of a user with catalog entries are listed from the catalog alone.
+        """
+        email = self.params["email"]
+        if not CatalogEntry.objects(email=email).only('id').first():
+            backfill_catalog(email)
 
     def cleanup(self, doc):
         """
@@ -365,6 +669,12 @@ class DocumentUploader():
         doc : dict
             The document to be deleted
         """
+        CatalogEntry.objects(
+                             email=self.params["email"],
+                             title=doc["title"],
+                             author=doc["author"]
+                            ).delete()
+
         to_delete = Page.objects(
                                  email=self.params["email"],
                                  resource__title=doc["title"],
@@ -376,7 +686,285 @@ class DocumentUploader():
             except Exception as e:
                 error_msg = "Couldn't delete existing document"
                 raise Exception(error_msg)
+
+        CompressionDictionary.objects(
+                                      email=self.params["email"],
+                                      title=doc["title"],
+                                      author=doc["author"]
+                                     ).delete()
+        delete_token_streams(self.params["email"], doc["title"], doc["author"], all_versions=True)
+        delete_translation_tables(self.params["email"], doc["title"], doc["author"], all_versions=True)
     
+    def collect_garbage(self, doc):
+        """
+        Removes the pages, dictionaries, token streams and translation
+        tables of replaced versions of the document, along with pages
+        saved before documents were versioned.
+
+        Parameters
+        ----------
+        doc : dict
+            The document whose old versions are removed
+        """
+        email = self.params["email"]
+        entry = CatalogEntry.objects(email=email, title=doc["title"], author=doc["author"]).first()
+        if not entry:
+            return
+
+        stale_versions = [None] + list(entry.stale_versions)
+        for version in stale_versions:
+            Page.objects(
+                         email=email,
+                         resource__title=doc["title"],
+                         resource__author=doc["author"],
+                         version=version
+                        ).delete()
+            CompressionDictionary.objects(
+                                          email=email,
+                                          title=doc["title"],
+                                          author=doc["author"],
+                                          version=version
+                                         ).delete()
+            delete_token_streams(email, doc["title"], doc["author"], version=version)
+            delete_translation_tables(email, doc["title"], doc["author"], version=version)
+            if version is not None:
+                entry.update(pull__stale_versions=version)
+
+    def count_bytes(self, lines):
+        """
+        Counts the bytes of the document's text as its lines are read.
+
+        Parameters
+        ----------
+        lines : iterable
+            The lines of the document
+
+        Returns
+        -------
+        generator
+            The lines of the document
+        """
+        stats = self.stats
+        for line in lines:
+            if isinstance(line, bytes):
+                stats["bytes"] += len(line)
+            else:
+                stats["bytes"] += len(line.encode('utf-8'))
+            yield line
+
+    def discard_version(self, doc, version):
+        """
+        Removes the pages, token stream and translation table of
+        a version that was never published.
+
+        Parameters
+        ----------
+        doc : dict
+            The document being uploaded
+        version : str
+            The version to be removed
+        """
+        Page.objects(
+                     email=self.params["email"],
+                     resource__title=doc["title"],
+                     resource__author=doc["author"],
+                     version=version
+                    ).delete()
+        CompressionDictionary.objects(
+                                      email=self.params["email"],
+                                      title=doc["title"],
+                                      author=doc["author"],
+                                      version=version
+                                     ).delete()
+        delete_token_streams(self.params["email"], doc["title"], doc["author"], version=version)
+        delete_translation_tables(self.params["email"], doc["title"], doc["author"], version=version)
+
+    def get_catalog_update(self, doc, version):
+        """
+        Builds the update that points the document's catalog entry
+        at the uploaded version and describes its size.
+
+        Parameters
+        ----------
+        doc : dict
+            The document being uploaded
+        version : str
+            The uploaded version
+
+        Returns
+        -------
+        dict
+            The catalog entry update
+        """
+        update = {
+            "set__language": doc["language"],
+            "set__version": version,
+            "set__page_count": self.stats["pages"],
+            "set__byte_size": self.stats["bytes"],
+            "set__upload_time": datetime.datetime.utcnow()
+        }
+        return update
+
+    def get_current_version(self, doc):
+        """
+        Fetches the published version of the document.
+
+        Parameters
+        ----------
+        doc : dict
+            The document being uploaded
+
+        Returns
+        -------
+        str
+            The published version, or None if the document's pages
+            aren't versioned
+        """
+        entry = CatalogEntry.objects(
+                                     email=self.params["email"],
+                                     title=doc["title"],
+                                     author=doc["author"]
+                                    ).only('version').first()
+        if not entry:
+            return None
+        return entry.version
+
+    def get_encoder(self, doc, version):
+        """
+        Builds the encoder that converts page content into
+        the configured storage format.
+
+        Parameters
+        ----------
+        doc : dict
+            The document being uploaded
+        version : str
+            The version being written
+
+        Returns
+        -------
+        PageEncoder
+            The page content encoder
+        """
+        storage_format = self.params.get("storage_format", STANDARD)
+        compression = self.params.get("compression")
+        owner = {
+            "email": self.params["email"],
+            "title": doc["title"],
+            "author": doc["author"],
+            "version": version
+        }
+        encoder = PageEncoder(storage_format, compression, owner)
+        return encoder
+
+    def get_lines(self, doc):
+        """
+        Gets the lines of the document. Uploaded files are streamed in
+        fixed size chunks instead of being read a line at a time, so
+        that a file without line ends isn't read into memory at once.
+
+        Parameters
+        ----------
+        doc : dict
+            The document being uploaded
+
+        Returns
+        -------
+        iterable
+            The lines of the document
+        """
+        lines = doc["file"]
+        if hasattr(lines, "read"):
+            read_size = int(self.params.get("read_size", READ_SIZE))
+            max_line_length = int(self.params.get("max_line_length", MAX_LINE_LENGTH))
+            lines = read_lines(lines, read_size, max_line_length)
+        return self.count_bytes(lines)
+
+    def get_token_lines(self, doc, version=None):
+        """
+        Tokenizes the lines of the document as they will be laid out.
+        When configured to, the words of every line are also saved
+        so that the document can be laid out again later, and its
+        distinct words gathered so that they can be translated once
+        the pages are written.
+
+        Parameters
+        ----------
+        doc : dict
+            The document to be tokenized
+        version : str
+            The version being written
+
+        Returns
+        -------
+        generator
+            The tokens of each line, in document order, with None
+            standing in for each blank line
+        """
+        tokenizer = self.params["tokenizer"]
+        line_size = int(self.params["line_size"])
+        early_cutoff = int(self.params["early_cutoff"])
+        word_lines = self.get_words(doc)
+        if int(self.params.get("translate", 0)):
+            self.terms = {}
+            word_lines = collect_terms(word_lines, self.terms)
+        if int(self.params.get("store_tokens", 0)):
+            word_lines = self.get_token_writer(doc, version).record(word_lines)
+        return tokenizer.layout_lines(word_lines, line_size, padding=early_cutoff)
+
+    def get_token_writer(self, doc, version):
+        """
+        Builds the writer that saves the words of every
+        line of the document.
+
+        Parameters
+        ----------
+        doc : dict
+            The document being uploaded
+        version : str
+            The version being written
+
+        Returns
+        -------
+        TokenStreamWriter
+            The token stream writer
+        """
+        compression = self.params.get("compression") or {}
+        owner = {
+            "email": self.params["email"],
+            "title": doc["title"],
+            "author": doc["author"],
+            "language": doc["language"],
+            "version": version
+        }
+        return TokenStreamWriter(owner, int(compression.get("level", 6)))
+
+    def get_words(self, doc):
+        """
+        Splits the lines of the document into words. When worker
+        processes are configured, the document is split in chunks
+        across a process pool.
+
+        Parameters
+        ----------
+        doc : dict
+            The document to be split
+
+        Returns
+        -------
+        generator
+            The words of each line, in document order, with None
+            standing in for each blank line
+        """
+        tokenizer = self.params["tokenizer"]
+        processes = int(self.params.get("processes", 0))
+        if processes > 0:
+            chunk_size = int(self.params["chunk_size"])
+            chunks = get_chunks(self.get_lines(doc), chunk_size)
+            return split_chunks(chunks, tokenizer, processes)
+
+        return split_lines(self.get_lines(doc), tokenizer)
+
     def insert_batch(self, batch, doc):
         """
         Inserts a batch of pages into the database.
@@ -389,114 +977,403 @@ class DocumentUploader():
             The document from which the pages are derived
         """
         try:
-            Page.objects.insert(batch)
+            insert_pages(batch)
         except Exception as e:
             error_msg = "Couldn't insert page batch"
-            self.cleanup(doc)
             raise Exception(error_msg)
+        self.record_batch(batch)
 
-    def upload(self, doc):
+    def publish(self, doc, version):
         """
-        Saves the document to the database.
+        Makes a fully written version of the document the one that
+        readers see, then removes replaced versions in the background.
 
         Parameters
         ----------
         doc : dict
-            The document to be saved
+            The document being uploaded
+        version : str
+            The version to be published
+        """
+        self.catalog_user()
+
+        #The version swap and the record of the replaced version are a
+        #single update, made only if no other upload published in between
+        while True:
+            previous = self.get_current_version(doc)
+            update = self.get_catalog_update(doc, version)
+            if previous and previous != version:
+                update["push__stale_versions"] = previous
+            entry = CatalogEntry.objects(
+                                         email=self.params["email"],
+                                         title=doc["title"],
+                                         author=doc["author"],
+                                         version=previous
+                                        )
+            try:
+                entry.update_one(upsert=True, **update)
+                break
+            except NotUniqueError:
+                continue
+
+        collector = Thread(target=self.collect_garbage, args=(doc,), daemon=True)
+        collector.start()
+        self.collector = collector
+
+    def record_batch(self, batch):
+        """
+        Reports an inserted batch to the upload monitor, if one
+        was supplied in the upload configurations.
+
+        Parameters
+        ----------
+        batch : list
+            The pages that were inserted
+        """
+        monitor = self.params.get("monitor")
+        if monitor:
+            monitor.record_batch(len(batch))
+
+    def get_batches(self, doc, version=None):
+        """
+        Lays out the document as pages and groups the pages
+        into batches ready to be inserted into the database.
+
+        Parameters
+        ----------
+        doc : dict
+            The document to be laid out
+        version : str
+            The version the pages belong to
+
+        Returns
+        -------
+        generator
+            The batches of pages, in page order
         """
         user = self.params["email"]
         new_page = int(self.params["new_page"])
         line_size = int(self.params["line_size"])
-        early_cutoff = int(self.params["early_cutoff"])
         batch_size = int(self.params["batch_size"])
-        tokenizer = self.params["tokenizer"]
         resource = self.params["resource"]
-        upload_info = {"user": user, "resource": resource, "doc": doc}
-        
-        #Remove current document from database, if it exists
-        self.cleanup(doc)
-
-        #Process each line in document
-        line_num = 0
-        page_num = 1
-        words = [[]]
-        line_breaks = reset_line_breaks()
-        prev_state = reset_prev_state()
+        encoder = self.get_encoder(doc, version)
+        upload_info = {
+            "user": user,
+            "resource": resource,
+            "doc": doc,
+            "encoder": encoder,
+            "version": version,
+            "payload": int(self.params.get("store_payloads", 0))
+        }
+
+        self.stats = {"pages": 0, "bytes": 0}
         batch = []
-        can_add_page = False
-        char_count = 0
-        curr_boundary = {
-            "pos": 0
+        token_lines = self.get_token_lines(doc, version)
+        for page_num, page_content in layout_pages(token_lines, line_size, new_page):
+            add_page(batch, page_content, page_num, upload_info)
+            self.stats["pages"] += 1
+
+            #Hand off full page batch
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+
+        #Hand off final batch
+        if batch:
+            yield batch
+
+    def write_translations(self, doc, version):
+        """
+        Translates the distinct words gathered while the document was
+        laid out and saves them as the version's translation table, so
+        that readers' lookups don't have to go to the dictionary. The
+        table is optional: if any word can't be translated, the table
+        is removed and readers look words up in the dictionary as they
+        would without one.
+
+        Parameters
+        ----------
+        doc : dict
+            The document being uploaded
+        version : str
+            The version the words belong to
+        """
+        terms = self.terms
+        self.terms = None
+        dict_manager = self.params.get("dictionaries")
+        if terms is None or version is None or dict_manager is None:
+            return
+        if not dict_manager.has_dictionary(doc["language"]):
+            return
+
+        owner = {
+            "email": self.params["email"],
+            "title": doc["title"],
+            "author": doc["author"],
+            "version": version
         }
-        for line in doc["file"]:
-            #Convert from bytes to unicode if necessary
-            if isinstance(line, bytes):
-                line = line.decode('utf-8')
-            #Blank new line
-            if line == "\n":
-                #Insert empty Line
-                line_num += 1
-                words.append([])
-
-                #Start new line for text
-                char_count = 0
-                line_num += 1
-                words.append([])
+        dictionary = dict_manager.get_dictionary(doc["language"])
+        size = int(self.params["translation_size"])
+        batch_size = int(self.params["translation_batch_size"])
+        try:
+            self.stats["terms"] = write_translation_table(owner, terms, dictionary, size, batch_size)
+        except Exception as e:
+            delete_translation_tables(owner["email"], owner["title"], owner["author"], version=version)
+
+    def upload(self, doc):
+        """
+        Saves the document to the database as a new version, which
+        replaces any existing version only once every page is written.
+
+        Parameters
+        ----------
+        doc : dict
+            The document to be saved
+        """
+        version = uuid.uuid4().hex
+        try:
+            for batch in self.get_batches(doc, version):
+                self.insert_batch(batch, doc)
+            self.write_translations(doc, version)
+        except Exception as e:
+            self.discard_version(doc, version)
+            raise
+
+        self.publish(doc, version)
+
+class PipelinedDocumentUploader(DocumentUploader):
+    """
+    Uploads a user-specified document while writer threads insert
+    finished page batches, so that page layout and database writes
+    overlap.
+    """
+    def __init__(self, params):
+        """
+        Initializes the document upload mechanism.
+
+        Parameters
+        ----------
+        params : dict
+            Configurations for the document upload procedure. In addition
+            to the DocumentUploader configurations, "writers" is the number
+            of writer threads and "queue_size" is the number of finished
+            batches allowed to wait for a writer.
+        """
+        super().__init__(params)
+        self.writers = max(1, int(params["writers"]))
+        self.queue_size = max(1, int(params["queue_size"]))
+
+    def write_batches(self, batches, errors):
+        """
+        Inserts queued page batches into the database until
+        told to stop.
+
+        Parameters
+        ----------
+        batches : Queue
+            The batches waiting to be inserted. None signals that
+            no more batches will arrive.
+        errors : list
+            The errors raised by any writer so far
+        """
+        while True:
+            batch = batches.get()
+            try:
+                if batch is None:
+                    return
+                #Drain remaining batches once the upload has failed
+                if errors:
+                    continue
+                insert_pages(batch)
+                self.record_batch(batch)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                batches.task_done()
+
+    def upload(self, doc):
+        """
+        Saves the document to the database. Pages are laid out on the
+        calling thread while writer threads insert the batches. The
+        bounded queue between them blocks layout whenever the writers
+        fall behind, which caps the number of pages held in memory.
+
+        Parameters
+        ----------
+        doc : dict
+            The document to be saved
+        """
+        version = uuid.uuid4().hex
+        batches = Queue(maxsize=self.queue_size)
+        errors = []
+        writers = []
+        for i in range(self.writers):
+            writer = Thread(target=self.write_batches, args=(batches, errors), daemon=True)
+            writer.start()
+            writers.append(writer)
+
+        try:
+            for batch in self.get_batches(doc, version):
+                if errors:
+                    break
+                batches.put(batch)
+        except Exception as e:
+            errors.append(e)
+            raise
+        finally:
+            for writer in writers:
+                batches.put(None)
+            for writer in writers:
+                writer.join()
+            if errors:
+                self.discard_version(doc, version)
+
+        if errors:
+            error_msg = "Couldn't insert page batch"
+            raise Exception(error_msg)
+
+        self.write_translations(doc, version)
+        self.publish(doc, version)
+
+class IncrementalDocumentUploader(DocumentUploader):
+    """
+    Uploads a new revision of a user-specified document by writing
+    only the pages whose content differs from the stored ones.
+    """
+    def get_stored_pages(self, doc, version):
+        """
+        Fetches the page numbers and content hashes of the stored
+        revision of the document.
+
+        Parameters
+        ----------
+        doc : dict
+            The document being uploaded
+        version : str
+            The published version of the document
+
+        Returns
+        -------
+        dict
+            The ids and content hashes of the stored pages, keyed by
+            page number. A page number may have been stored more
+            than once.
+        """
+        pages = Page.objects(
+                             email=self.params["email"],
+                             resource__title=doc["title"],
+                             resource__author=doc["author"],
+                             version=version
+                            )
+        pages = pages.only('resource.page_number', 'content_hash').as_pymongo()
+
+        stored = {}
+        for page in pages:
+            page_num = page["resource"]["page_number"]
+            stored.setdefault(page_num, []).append((page["_id"], page.get("content_hash")))
+        return stored
+
+    def get_changes(self, batch, stored):
+        """
+        Compares a batch of laid out pages to the stored pages.
+
+        Parameters
+        ----------
+        batch : list
+            The laid out pages
+        stored : dict
+            The stored pages not yet compared. Compared pages are
+            removed from it.
+
+        Returns
+        -------
+        list
+            The bulk write requests that bring the stored pages
+            up to date with the batch
+        """
+        changes = []
+        for page in batch:
+            page_num = page.resource.page_number
+            if page_num not in stored:
+                changes.append(InsertOne(page.to_mongo()))
                 continue
 
-            tokenized = tokenizer.tokenize(line, line_size, offset=char_count, padding=early_cutoff)
-            for token in tokenized:
-                #Check if token continues onto next line
-                if token["size"] + char_count >= line_size:
-                    words[line_num].append(token["text"])
-                    line_info = [line_num, page_num, new_page, len(words[line_num]), line_size]
-                    curr_boundary = process_line_end(token, curr_boundary, line_info, line_breaks)
-                    char_count = 0
-                    if (line_num + 1) < new_page:
-                        line_num += 1
-                        words.append([])
-                    else:
-                        line_num += 1
+            #Keep an unchanged copy of the page if there is one and remove the others
+            copies = stored.pop(page_num)
+            copies.sort(key=lambda copy: copy[1] != page.content_hash)
+            page_id, content_hash = copies[0]
+            changes.extend(DeleteOne({"_id": copy[0]}) for copy in copies[1:])
+            if content_hash != page.content_hash:
+                update = {
+                    "content": page.content.to_mongo(),
+                    "content_hash": page.content_hash,
+                    "resource": page.resource.to_mongo()
+                }
+                change = {"$set": update}
+                #A stored response body would serve the old content
+                if page.payload is None:
+                    change["$unset"] = {"payload": ""}
                 else:
-                    if check_line_start(line_breaks, char_count):
-                        line_info = [line_num, page_num, new_page, line_size]
-                        curr_boundary = process_line_start(token, curr_boundary, line_info, line_breaks)
-                    words[line_num].append(token["text"])
-                    char_count += token["size"]
-                
-                #Add page to upload batch
-                if can_add_page:
-                    can_get_next_pointer = (len(words[0]) > 1) or (len(words) > 1)
-                    if can_get_next_pointer:
-                        prev_page = page_num - 1
-                        page_content = get_page_content(words, prev_page, prev_state)
-                        add_page(batch, page_content, prev_page, upload_info)
-                        can_add_page = False
-                
-                #Start new page
-                if (line_num + 1) > new_page:
-                    can_add_page = True
-                    update_prev_state(words, line_breaks, prev_state)
-                    page_num += 1
-                    line_num = 0
-                    words = [[]]
-                    line_breaks = reset_line_breaks(curr_boundary)
-                
-                #Insert page batch into database
-                if len(batch) >= batch_size:
-                    self.insert_batch(batch, doc)
-                    batch = []
-        
-        #Load last page
-        prev_page = page_num - 1
-        if len(words) > 0:
-            update_prev_state(words, line_breaks, prev_state)
-            blank_page = []
-            page_content = get_page_content(blank_page, page_num, prev_state)
-            add_page(batch, page_content, page_num, upload_info)
-        else:
-            page_content = get_page_content(words, prev_page, prev_state)
-            add_page(batch, page_content, prev_page, upload_info)
+                    update["payload"] = page.payload
+                changes.append(UpdateOne({"_id": page_id}, change))
+        return changes
+
+    def upload(self, doc):
+        """
+        Saves the document to the database, inserting new pages,
+        updating changed pages and deleting pages past the new end
+        of the document. The published version is changed in place
+        and its catalog entry updated.
+
+        Parameters
+        ----------
+        doc : dict
+            The document to be saved
+
+        Returns
+        -------
+        dict
+            The number of pages inserted, updated, deleted and unchanged
+        """
+        version = self.get_current_version(doc)
+        stored = self.get_stored_pages(doc, version)
+        collection = Page._get_collection()
+        summary = {"inserted": 0, "updated": 0, "deleted": 0, "unchanged": 0}
+
+        for batch in self.get_batches(doc, version):
+            changes = self.get_changes(batch, stored)
+            inserted = sum(1 for change in changes if isinstance(change, InsertOne))
+            updated = sum(1 for change in changes if isinstance(change, UpdateOne))
+            summary["inserted"] += inserted
+            summary["updated"] += updated
+            summary["deleted"] += len(changes) - inserted - updated
+            summary["unchanged"] += len(batch) - inserted - updated
+            if changes:
+                try:
+                    collection.bulk_write(changes, ordered=False)
+                except Exception as e:
+                    error_msg = "Couldn't update page batch"
+                    raise Exception(error_msg)
+            self.record_batch(batch)
+
+        #Remove pages that no longer exist in the document
+        removed = [DeleteOne({"_id": page[0]}) for copies in stored.values() for page in copies]
+        if removed:
+            try:
+                collection.bulk_write(removed, ordered=False)
+            except Exception as e:
+                error_msg = "Couldn't remove outdated pages"
+                raise Exception(error_msg)
+        summary["deleted"] += len(removed)
+        self.write_translations(doc, version)
 
-        #Insert final batch
-        self.insert_batch(batch, doc)
\ No newline at end of file
+        #Count the change so cached page ranges of the version are revalidated
+        self.catalog_user()
+        update = self.get_catalog_update(doc, version)
+        update["inc__revision"] = 1
+        CatalogEntry.objects(
+                             email=self.params["email"],
+                             title=doc["title"],
+                             author=doc["author"]
+                            ).update_one(upsert=True, **update)
+        return summary
@@ -1,12 +1,95 @@
 import traceback
 
-from flask import current_app, flash, g, render_template
+from http import HTTPStatus
+
+from flask import current_app, flash, g, jsonify, render_template, url_for
 from flask_login import current_user, login_required
 
 from . import cm
-from .forms import SourceTextForm
+from .forms import BulkImportForm, SourceTextForm
+from .lib.bulk_import import BulkImporter
+from .lib.jobs import ImportJob, upload_jobs
 from .lib.resources import create_book
-from .lib.upload import DocumentUploader
+from .lib.upload import DocumentUploader, IncrementalDocumentUploader, PipelinedDocumentUploader
+
+def get_upload_params(email, language):
+    """
+    Builds the document upload configurations from
+    the application's configurations.
+
+    Parameters
+    ----------
+    email : str
+        The email of the user uploading documents
+    language : str
+        The language of the documents
+
+    Returns
+    -------
+    dict
+        Configurations for the document upload procedure
+    """
+    params = {}
+    params["email"] = email
+    params["new_page"] = current_app.config["DOCUMENT_UPLOAD"]["PAGE_LIMIT"]
+    params["line_size"] = current_app.config["DOCUMENT_UPLOAD"]["LINE_SIZE"]
+    params["early_cutoff"] = current_app.config["DOCUMENT_UPLOAD"]["EARLY_CUTOFF"]
+    params["batch_size"] = current_app.config["DOCUMENT_UPLOAD"]["BATCH_SIZE"]
+    params["tokenizer"] = current_app.config["TOKENIZER"].select(language)
+    params["resource"] = create_book
+    params["processes"] = current_app.config["DOCUMENT_UPLOAD"]["PROCESSES"]
+    params["chunk_size"] = current_app.config["DOCUMENT_UPLOAD"]["CHUNK_SIZE"]
+    params["storage_format"] = current_app.config["DOCUMENT_UPLOAD"]["STORAGE_FORMAT"]
+    params["compression"] = {
+        "codec": current_app.config["DOCUMENT_UPLOAD"]["COMPRESSION_CODEC"],
+        "level": current_app.config["DOCUMENT_UPLOAD"]["COMPRESSION_LEVEL"],
+        "train": current_app.config["DOCUMENT_UPLOAD"]["COMPRESSION_DICTIONARY"]
+    }
+    params["writers"] = current_app.config["DOCUMENT_UPLOAD"]["WRITER_THREADS"]
+    params["queue_size"] = current_app.config["DOCUMENT_UPLOAD"]["QUEUE_SIZE"]
+    params["read_size"] = current_app.config["DOCUMENT_UPLOAD"]["READ_SIZE"]
+    params["max_line_length"] = current_app.config["DOCUMENT_UPLOAD"]["MAX_LINE_LENGTH"]
+    params["store_payloads"] = current_app.config["DOCUMENT_UPLOAD"]["STORE_PAYLOADS"]
+    params["store_tokens"] = current_app.config["DOCUMENT_UPLOAD"]["STORE_TOKENS"]
+    params["translate"] = current_app.config["DOCUMENT_UPLOAD"]["TRANSLATE"]
+    params["translation_batch_size"] = current_app.config["DOCUMENT_UPLOAD"]["TRANSLATION_BATCH_SIZE"]
+    params["translation_size"] = current_app.config["TRANSLATIONS_PAGE_SIZE"]
+    params["dictionaries"] = current_app.config["DICTIONARY_MANAGER"]
+    return params
+
+@cm.route("/bulk_import", methods=["GET", "POST"])
+@login_required
+def bulk_import():
+    """
+    Uploads every document in a user-specified archive. The
+    import runs on the background upload workers.
+    """
+    form = BulkImportForm()
+    if form.validate_on_submit():
+        user = current_user
+
+        doc = {}
+        doc["file"] = form.archive.data
+        doc["title"] = form.archive.data.filename or "archive"
+        doc["author"] = ""
+        doc["language"] = form.language.data
+
+        if not upload_jobs.is_enabled():
+            error_msg = "Bulk imports need background upload workers."
+            flash(error_msg)
+            return render_template('content_management/bulk_import.html', form=form)
+
+        params = get_upload_params(user.email, doc["language"])
+        workers = current_app.config["DOCUMENT_UPLOAD"]["IMPORT_WORKERS"]
+        importer = BulkImporter(params, current_app.config["TOKENIZER"], workers)
+        job = ImportJob(user.email, doc, importer)
+        upload_jobs.submit(importer, doc, job)
+
+        status_url = url_for('content_management.upload_status', job_id=job.job_id)
+        started_msg = "Import started. Progress is available at " + status_url
+        flash(started_msg)
+
+    return render_template('content_management/bulk_import.html', form=form)
 
 @cm.route("/document_upload", methods=["GET", "POST"])
 @login_required
@@ -24,16 +107,23 @@ def document_upload():
         doc["title"] = form.title.data
         doc["language"] = form.language.data
 
-        params = {}
-        params["email"] = user.email
-        params["new_page"] = current_app.config["DOCUMENT_UPLOAD"]["PAGE_LIMIT"]
-        params["line_size"] = current_app.config["DOCUMENT_UPLOAD"]["LINE_SIZE"]
-        params["early_cutoff"] = current_app.config["DOCUMENT_UPLOAD"]["EARLY_CUTOFF"]
-        params["batch_size"] = current_app.config["DOCUMENT_UPLOAD"]["BATCH_SIZE"]
-        params["tokenizer"] = current_app.config["TOKENIZER"].select(doc["language"])
-        params["resource"] = create_book
+        params = get_upload_params(user.email, doc["language"])
+
+        #Choose how the pages are written to the database
         doc_uploader = DocumentUploader(params)
+        if form.incremental.data:
+            doc_uploader = IncrementalDocumentUploader(params)
+        elif int(params["writers"]) > 0:
+            doc_uploader = PipelinedDocumentUploader(params)
         
+        #Hand the upload off to the background workers when available
+        if upload_jobs.is_enabled():
+            job = upload_jobs.submit(doc_uploader, doc)
+            status_url = url_for('content_management.upload_status', job_id=job.job_id)
+            started_msg = "Document upload started. Progress is available at " + status_url
+            flash(started_msg)
+            return render_template('content_management/document_upload.html', form=form)
+
         could_upload = True
         try:
             doc_uploader.upload(doc)
@@ -49,6 +139,33 @@ def document_upload():
 
     return render_template('content_management/document_upload.html', form=form)
 
+@cm.route("/upload_status/<string:job_id>")
+@login_required
+def upload_status(job_id):
+    """
+    Reports the progress of a background document upload.
+
+    Parameters
+    ----------
+    job_id : str
+        The unique identifier of the upload job
+
+    Returns
+    -------
+    json
+        The status, pages written, throughput and errors of the upload
+    int
+        An HTTP status code
+    """
+    job = upload_jobs.get_job(job_id)
+    if not job or job.email != current_user.email:
+        error_code = HTTPStatus.NOT_FOUND.value
+        response = jsonify(status=error_code, text="Couldn't find upload job")
+        return response, error_code
+
+    response = jsonify(job.report())
+    return response, HTTPStatus.OK.value
+
 @cm.route("/select_content")
 @login_required
 def select_content():
@@ -400,6 +400,18 @@ describe("Set page range", () => {
         axios.mockResolvedValue(JSON.stringify(data))
         actions.getPages(testDispatch, store.getState, 6)
     })
+
+    it("check request", () => {
+        axios.mockClear()
+        axios.mockResolvedValue(JSON.stringify(data))
+        actions.getPages(store.dispatch, store.getState, 6)
+        expect(axios.mock.calls[0][0].method).toBe('GET')
+        expect(axios.mock.calls[0][0].params).toStrictEqual({
+            title: "Die Welt",
+            author: "Schopenhauer",
+            start: 6
+        })
+    })
 })
 
 describe("Set text boundary", () => {
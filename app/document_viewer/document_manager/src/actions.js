@@ -140,16 +140,23 @@ const logError = error => console.error(error)
  * @param {func} dispatch Sends a message to the state store.
  * @param {string} url The endpoint for accessing the microservice.
  * @param {string} method The type of HTTP request to make.
- * @param {object} body The body of the JSON request.
+ * @param {object} body The body of the JSON request, or the query
+ *                      string parameters of a GET request.
  */
 const makeServiceCall = (convert, dispatch, url, method, body={}) => {
-    axios({
+    let request = {
       url: url,
       method: method,
       headers: getHeaders(), 
-      data: body,
       timeout: 20000  
-    })
+    }
+    if (method === 'GET') {
+        request.params = body
+    }
+    else {
+        request.data = body
+    }
+    axios(request)
     .then(parseResponse)
     .then(convert)
     .then(dispatch)
@@ -272,7 +279,7 @@ export const getPages = (dispatch, getState, pageNumber) => {
             convertPages,
             (messages) => multiDispatch(dispatch, messages),
             localStorage["login::services::getPages"],
-            'POST',
+            'GET',
             body 
         )
     }
@@ -204,6 +204,19 @@ class PageContent(db.EmbeddedDocument):
     """
     words = ListField()
     breaks = DictField()
+    #Packed storage format: every word of the page in one string
+    #with integer arrays locating the words and line breaks
+    encoding = StringField()
+    text = StringField()
+    sizes = BinaryField()
+    lines = BinaryField()
+    table = BinaryField()
+    break_text = StringField()
+    #Compressed storage format: the page serialized and compressed
+    #by a codec, optionally primed with a per-document dictionary
+    codec = StringField()
+    data = BinaryField()
+    dictionary = StringField()
 
 class Page(db.Document):
     """
@@ -212,10 +225,131 @@ class Page(db.Document):
     email = ReferenceField(User, reverse_delete_rule=CASCADE)
     resource = EmbeddedDocumentField(Resource)
     content = EmbeddedDocumentField(PageContent)
+    #Fingerprint of the content for detecting changed pages
+    content_hash = StringField()
+    #Upload that wrote the page; only the published version is read
+    version = StringField()
+    #Body of the response serving the page, encoded at upload time
+    payload = BinaryField()
 
     meta = {'indexes':[
         ('email',
          'resource.page_number',
          'resource.title',
-         'resource.author')
+         'resource.author'),
+        ('email',
+         'resource.title',
+         'resource.author',
+         'version',
+         'resource.page_number')
+    ]}
+
+class CompressionDictionary(db.Document):
+    """
+    A compression dictionary trained on one of the user's resources.
+    """
+    dictionary_id = StringField(primary_key=True)
+    email = ReferenceField(User, reverse_delete_rule=CASCADE)
+    title = StringField()
+    author = StringField()
+    version = StringField()
+    data = BinaryField()
+
+    meta = {'indexes':[
+        ('email',
+         'title',
+         'author')
+    ]}
+
+class CatalogEntry(db.Document):
+    """
+    A document in a user's library, pointing at the published
+    version of its pages.
+    """
+    email = ReferenceField(User, reverse_delete_rule=CASCADE)
+    title = StringField()
+    author = StringField()
+    language = StringField()
+    version = StringField()
+    #Size of the published version, so listing documents never reads pages
+    page_count = IntField()
+    byte_size = IntField()
+    upload_time = DateTimeField()
+    #Number of times the published version was changed in place
+    revision = IntField()
+    #Replaced versions whose pages have yet to be removed
+    stale_versions = ListField(StringField())
+
+    meta = {'indexes':[
+        {'fields': ('email', 'title', 'author'), 'unique': True}
+    ]}
+
+class TokenStream(db.Document):
+    """
+    The words of every line of one of the user's resources, saved
+    compressed in GridFS so that its pages can be laid out again
+    for any line size and page limit.
+    """
+    email = ReferenceField(User, reverse_delete_rule=CASCADE)
+    title = StringField()
+    author = StringField()
+    language = StringField()
+    version = StringField()
+    file_id = ObjectIdField()
+    codec = StringField()
+    lines = IntField()
+
+    meta = {'indexes':[
+        ('email',
+         'title',
+         'author',
+         'version')
+    ]}
+
+class TranslationEntry(db.Document):
+    """
+    The translations of one of the distinct words of a version of
+    one of the user's resources, looked up when it was uploaded.
+    """
+    email = ReferenceField(User, reverse_delete_rule=CASCADE)
+    title = StringField()
+    author = StringField()
+    version = StringField()
+    term = StringField()
+    #Version of the dictionary index the translations were looked up in
+    dictionary_version = StringField()
+    #Number of results per page the translations were looked up with
+    size = IntField()
+    status = IntField()
+    body = StringField()
+
+    meta = {'indexes':[
+        ('email',
+         'title',
+         'author',
+         'version',
+         'term')
+    ]}
+
+class UploadStatus(db.Document):
+    """
+    The progress of one of the user's background uploads, saved
+    by the worker running it so that any web worker can report
+    on it.
+    """
+    job_id = StringField(primary_key=True)
+    email = ReferenceField(User, reverse_delete_rule=CASCADE)
+    title = StringField()
+    author = StringField()
+    status = StringField()
+    pages_written = IntField()
+    errors = ListField(StringField())
+    submitted = FloatField()
+    started = FloatField()
+    finished = FloatField()
+    #Progress of the documents of a bulk import
+    details = DictField()
+
+    meta = {'indexes':[
+        'finished'
     ]}
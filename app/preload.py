@@ -0,0 +1,74 @@
+import gc
+import resource
+import time
+
+def get_memory_usage():
+    """
+    Measures the memory of the current process.
+
+    Returns
+    -------
+    dict
+        The resident set size in kilobytes and, where Linux reports
+        them, the proportional set size and the kilobytes shared
+        with and private to the process
+    """
+    usage = {}
+    try:
+        with open("/proc/self/smaps_rollup", 'r') as smaps:
+            fields = {}
+            for line in smaps:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[1])
+    except OSError:
+        #Only the peak is available outside of Linux
+        usage["rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return usage
+
+    usage["rss_kb"] = fields.get("Rss", 0)
+    usage["pss_kb"] = fields.get("Pss", 0)
+    usage["shared_kb"] = fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0)
+    usage["private_kb"] = fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)
+    return usage
+
+def preload(app):
+    """
+    Loads the tokenizers, with NLTK and its data, and the dictionaries
+    up front, then freezes every object created so far. A pre-forking
+    server that creates the app before starting its workers then
+    shares these pages across all of them instead of each worker
+    loading its own copy on its first request. Freezing keeps the
+    garbage collector from writing to the objects, which would copy
+    the pages they live on into every worker.
+
+    Parameters
+    ----------
+    app : Flask
+        The application to preload
+
+    Returns
+    -------
+    dict
+        How long preloading took and the memory of the process
+        before and after
+    """
+    before = get_memory_usage()
+    start = time.perf_counter()
+
+    app.config["TOKENIZER"].preload()
+    app.config["DICTIONARY_MANAGER"].preload()
+
+    gc.collect()
+    gc.freeze()
+
+    report = {
+        "seconds": round(time.perf_counter() - start, 3),
+        "frozen_objects": gc.get_freeze_count(),
+        "before": before,
+        "after": get_memory_usage()
+    }
+    app.extensions["preload"] = report
+    app.logger.info("Preloaded in %ss, RSS %skB -> %skB",
+                    report["seconds"], before["rss_kb"], report["after"]["rss_kb"])
+    return report
@@ -0,0 +1,21 @@
+import subprocess
+
+def get_revision():
+    """
+    Finds the commit being benchmarked.
+
+    Returns
+    -------
+    str
+        The git commit hash, or None outside of a git checkout
+    """
+    try:
+        revision = subprocess.run(
+                                  ["git", "rev-parse", "HEAD"],
+                                  capture_output=True,
+                                  check=True,
+                                  text=True
+                                 )
+    except Exception as e:
+        return None
+    return revision.stdout.strip()
@@ -0,0 +1,314 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+from . import get_revision
+
+#Runs in a fresh interpreter so that nothing is imported beforehand
+STARTUP_SCRIPT = """
+import json
+import sys
+import time
+
+start = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+create_app({config!r})
+created = time.perf_counter()
+
+startup = {{
+    "import_seconds": imported - start,
+    "create_app_seconds": created - imported,
+    "modules": sorted(sys.modules)
+}}
+print(json.dumps(startup))
+"""
+
+#Forks workers from the app like a pre-forking server, and has each
+#one serve a first request that needs a tokenizer and a dictionary
+WORKER_SCRIPT = """
+import json
+import os
+import time
+
+from app import create_app
+from app.preload import get_memory_usage
+
+app = create_app({config!r})
+workers = []
+for worker in range({workers}):
+    read_end, write_end = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_end)
+        before = get_memory_usage()
+        start = time.perf_counter()
+        tokenizer = app.config["TOKENIZER"].select({language!r})
+        tokenizer.tokenize({text!r}, 50)
+        app.config["DICTIONARY_MANAGER"].get_dictionary({language!r})
+        report = {{
+            "before": before,
+            "after": get_memory_usage(),
+            "first_request_seconds": round(time.perf_counter() - start, 4)
+        }}
+        os.write(write_end, json.dumps(report).encode())
+        os._exit(0)
+
+    os.close(write_end)
+    with os.fdopen(read_end, 'rb') as worker_output:
+        workers.append(json.loads(worker_output.read()))
+    os.waitpid(pid, 0)
+
+workers = {{"preload": app.extensions.get("preload"), "workers": workers}}
+print(json.dumps(workers))
+"""
+
+#Modules that the app should only import once they are needed
+DEFERRED_MODULES = ["nltk", "requests"]
+
+#The text of the workers' first request
+WORKER_TEXT = "Sapere aude! Habe Mut, dich deines eigenen Verstandes zu bedienen.\n"
+
+def run_script(script, preload=False, importtime=False):
+    """
+    Runs a script in a new process from the top level project directory.
+
+    Parameters
+    ----------
+    script : str
+        The Python code to run
+    preload : bool
+        True to have the app preload its tokenizers and dictionaries
+    importtime : bool
+        True to have Python report the time spent importing each module
+
+    Returns
+    -------
+    tuple
+        The JSON printed last by the process, its total run
+        time in seconds and its stderr
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    command = [sys.executable]
+    if importtime:
+        command.extend(["-X", "importtime"])
+    command.extend(["-c", script])
+    env = dict(os.environ)
+    env["PRELOAD"] = "1" if preload else "0"
+
+    start = time.perf_counter()
+    process = subprocess.run(command, cwd=root, env=env, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if process.returncode != 0:
+        raise Exception("Couldn't create the app:\n" + process.stderr)
+
+    output = json.loads(process.stdout.strip().splitlines()[-1])
+    return output, elapsed, process.stderr
+
+def run_startup(config, preload=False, importtime=False):
+    """
+    Creates the app in a new process.
+
+    Parameters
+    ----------
+    config : str
+        The name of the configuration to create the app with
+    preload : bool
+        True to have the app preload its tokenizers and dictionaries
+    importtime : bool
+        True to have Python report the time spent importing each module
+
+    Returns
+    -------
+    tuple
+        The timings and imported modules reported by the process, its
+        total run time in seconds and its stderr
+    """
+    script = STARTUP_SCRIPT.format(config=config)
+    return run_script(script, preload=preload, importtime=importtime)
+
+def run_workers(config, workers, language, preload=False):
+    """
+    Creates the app and forks workers from it, each of which
+    handles a first request.
+
+    Parameters
+    ----------
+    config : str
+        The name of the configuration to create the app with
+    workers : int
+        The number of workers to fork
+    language : str
+        The language of the first request
+    preload : bool
+        True to have the app preload its tokenizers and dictionaries
+
+    Returns
+    -------
+    dict
+        The app's preload report and, for each worker, its memory
+        before and after the first request and how long it took
+    """
+    script = WORKER_SCRIPT.format(config=config, workers=workers, language=language, text=WORKER_TEXT)
+    return run_script(script, preload=preload)[0]
+
+def parse_importtime(output):
+    """
+    Reads the per-module timings printed by python -X importtime.
+
+    Parameters
+    ----------
+    output : str
+        The stderr of a process run with -X importtime
+
+    Returns
+    -------
+    list
+        The module name, nesting depth, and self and cumulative
+        import time in milliseconds of each imported module
+    """
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+
+        name = fields[2].rstrip()
+        stripped = name.lstrip()
+        modules.append({
+            "module": stripped,
+            "depth": (len(name) - len(stripped) - 1) // 2,
+            "self_ms": int(fields[0]) / 1000,
+            "cumulative_ms": int(fields[1]) / 1000
+        })
+    return modules
+
+def summarize_imports(modules, top, depth):
+    """
+    Picks out the modules that account for most of the import time.
+
+    Parameters
+    ----------
+    modules : list
+        The timings of each imported module
+    top : int
+        The number of modules to report in each ranking
+    depth : int
+        The nesting depth of the modules ranked by cumulative time,
+        where 0 is the app itself and 1 what it imports
+
+    Returns
+    -------
+    dict
+        The total import time and the slowest modules at the given
+        depth, by cumulative time, and overall, by self time
+    """
+    direct = [module for module in modules if module["depth"] == 0]
+    nested = [module for module in modules if module["depth"] == depth]
+    by_cumulative = sorted(nested, key=lambda module: module["cumulative_ms"], reverse=True)
+    by_self = sorted(modules, key=lambda module: module["self_ms"], reverse=True)
+
+    def describe(module, key):
+        return {"module": module["module"], key: round(module[key], 3)}
+
+    summary = {
+        "modules": len(modules),
+        "total_ms": round(sum(module["cumulative_ms"] for module in direct), 3),
+        "slowest_cumulative": [describe(module, "cumulative_ms") for module in by_cumulative[:top]],
+        "slowest_self": [describe(module, "self_ms") for module in by_self[:top]]
+    }
+    return summary
+
+def parse_args(argv):
+    """
+    Reads the benchmark options from the command line.
+
+    Parameters
+    ----------
+    argv : list
+        The command line arguments
+
+    Returns
+    -------
+    Namespace
+        The parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="Measures how long the app takes to start.")
+    parser.add_argument("--config", default="testing", help="Configuration to create the app with")
+    parser.add_argument("--repeat", type=int, default=5, help="Cold starts to time")
+    parser.add_argument("--importtime", action="store_true",
+                        help="Add a per-module breakdown from an extra run with python -X importtime")
+    parser.add_argument("--top", type=int, default=15, help="Modules to list in the breakdown")
+    parser.add_argument("--depth", type=int, default=1,
+                        help="Nesting depth of the modules ranked by cumulative import time")
+    parser.add_argument("--preload", action="store_true",
+                        help="Have the app preload its tokenizers and dictionaries")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Workers to fork from the app, reporting the memory of each")
+    parser.add_argument("--language", default="german", help="Language of the workers' first request")
+    parser.add_argument("--output", help="File to save the JSON results to")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """
+    Times cold starts of the app and reports the results as JSON.
+
+    Parameters
+    ----------
+    argv : list
+        The command line arguments
+
+    Returns
+    -------
+    int
+        0 if the app started without importing any of the deferred
+        modules, or was told to preload them, 1 otherwise
+    """
+    args = parse_args(argv)
+
+    runs = [run_startup(args.config, preload=args.preload) for run in range(args.repeat)]
+    startups = [startup for startup, elapsed, stderr in runs]
+    eager = []
+    if not args.preload:
+        eager = [module for module in DEFERRED_MODULES if module in startups[0]["modules"]]
+
+    results = {
+        "benchmark": "startup",
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "revision": get_revision(),
+        "python": platform.python_version(),
+        "config": args.config,
+        "preload": args.preload,
+        "runs": args.repeat,
+        "process_seconds": round(statistics.median(elapsed for startup, elapsed, stderr in runs), 3),
+        "import_seconds": round(statistics.median(startup["import_seconds"] for startup in startups), 3),
+        "create_app_seconds": round(statistics.median(startup["create_app_seconds"] for startup in startups), 3),
+        "modules_loaded": len(startups[0]["modules"]),
+        "eager_modules": eager
+    }
+
+    #Import timing slows imports down, so it gets a run of its own
+    if args.importtime:
+        startup, elapsed, stderr = run_startup(args.config, preload=args.preload, importtime=True)
+        results["imports"] = summarize_imports(parse_importtime(stderr), args.top, args.depth)
+
+    if args.workers > 0:
+        results.update(run_workers(args.config, args.workers, args.language, preload=args.preload))
+
+    report = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as output:
+            output.write(report + "\n")
+    print(report)
+    return 1 if eager else 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,136 @@
+import random
+import re
+
+SIZE_UNITS = {
+    "B": 1,
+    "KB": 1024,
+    "MB": 1024 ** 2,
+    "GB": 1024 ** 3
+}
+
+WORDS = [
+    "aber", "alle", "also", "auch", "auf", "aus", "bedienen", "bei", "das",
+    "dass", "dein", "der", "die", "dich", "doch", "durch", "eigenen", "ein",
+    "eine", "einem", "einer", "für", "ganz", "gegen", "groß", "habe", "haben",
+    "hier", "ihm", "ihr", "immer", "ist", "jeder", "kann", "kein", "können",
+    "leben", "machen", "man", "mehr", "mit", "muss", "mut", "nach", "nicht",
+    "noch", "nur", "oder", "ohne", "schon", "sehr", "sein", "sich", "sie",
+    "sind", "so", "über", "um", "und", "uns", "unter", "verstandes", "viel",
+    "vom", "von", "vor", "wahlspruch", "was", "weil", "welt", "wenn", "werden",
+    "wie", "wieder", "wir", "wird", "zu", "zum", "zur", "zwischen"
+]
+
+STEMS = [
+    "Aufklärung", "Bildung", "Donau", "Dampf", "Erkenntnis", "Fahrt",
+    "Freiheit", "Gesellschaft", "Kapitän", "Mündigkeit", "Schiff", "Selbst",
+    "Staat", "Straße", "Verstand", "Vernunft", "Welt", "Wissenschaft"
+]
+
+PUNCTUATION = [",", ".", ";", "!", "?"]
+
+def parse_size(size):
+    """
+    Converts a human readable size into a number of bytes.
+
+    Parameters
+    ----------
+    size : str
+        The size, such as 100KB or 500MB
+
+    Returns
+    -------
+    int
+        The size in bytes
+    """
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMG]?B)?\s*", size.upper())
+    if not match:
+        raise ValueError("Invalid size " + size)
+    amount, unit = match.groups()
+    return int(float(amount) * SIZE_UNITS[unit or "B"])
+
+def generate_word(rng, long_word_ratio):
+    """
+    Picks the next word of the synthetic text.
+
+    Parameters
+    ----------
+    rng : Random
+        The seeded random number generator
+    long_word_ratio : float
+        The fraction of words that are long compound words
+
+    Returns
+    -------
+    str
+        The word
+    """
+    if rng.random() < long_word_ratio:
+        stems = [rng.choice(STEMS) for i in range(rng.randint(3, 6))]
+        return stems[0] + "".join(stem.lower() for stem in stems[1:])
+    return rng.choice(WORDS)
+
+def generate_text(size, seed=0, paragraph_density=0.1, long_word_ratio=0.02, line_length=70):
+    """
+    Lazily generates reproducible German-like text, one line at a time,
+    so that large documents never have to be held in memory.
+
+    Paragraphs are hard-wrapped like a plain text book. The last line of
+    each paragraph is cut short at a sentence end.
+
+    Parameters
+    ----------
+    size : int
+        The approximate size of the text in UTF-8 bytes
+    seed : int
+        The seed that makes the text reproducible
+    paragraph_density : float
+        The probability that a sentence ends its paragraph
+    long_word_ratio : float
+        The fraction of words that are long compound words
+    line_length : int
+        The number of characters at which lines are wrapped
+
+    Returns
+    -------
+    generator
+        The lines of the text, each ending with a newline
+    """
+    rng = random.Random(seed)
+    written = 0
+    line = []
+    line_size = 0
+    sentence_start = True
+    while written < size:
+        word = generate_word(rng, long_word_ratio)
+        if sentence_start:
+            word = word[0].upper() + word[1:]
+            sentence_start = False
+
+        paragraph_end = False
+        if rng.random() < 0.08:
+            punctuation = rng.choice(PUNCTUATION)
+            word += punctuation
+            if punctuation != ",":
+                sentence_start = True
+                paragraph_end = rng.random() < paragraph_density
+
+        #Wrap before the word overflows the line
+        if line and line_size + 1 + len(word) > line_length:
+            text = " ".join(line) + "\n"
+            written += len(text.encode("utf-8"))
+            yield text
+            line = []
+            line_size = 0
+
+        line.append(word)
+        line_size += len(word) + (line_size > 0)
+
+        if paragraph_end:
+            text = " ".join(line) + "\n"
+            written += len(text.encode("utf-8"))
+            yield text
+            line = []
+            line_size = 0
+
+    if line:
+        yield " ".join(line) + "\n"
@@ -0,0 +1,163 @@
+import argparse
+import datetime
+import json
+import platform
+import sys
+import time
+
+from text_processing.tokenizers.mapper import RegexLanguage, StandardLanguage
+from . import get_revision
+from .text_generator import generate_text, parse_size
+
+class FallbackCounter():
+    """
+    Counts the lines that the regex engine hands to NLTK.
+    """
+    def __init__(self, language):
+        """
+        Wraps the NLTK tokenizer of a regex language.
+
+        Parameters
+        ----------
+        language : RegexLanguage
+            The language whose fallbacks are counted
+        """
+        self.word_tokenize = language.word_tokenize
+        self.count = 0
+        language.word_tokenize = self
+
+    def __call__(self, line):
+        self.count += 1
+        return self.word_tokenize(line)
+
+def load_corpus(args):
+    """
+    Reads the lines to be tokenized.
+
+    Parameters
+    ----------
+    args : Namespace
+        The parsed command line arguments
+
+    Returns
+    -------
+    list
+        The lines of every corpus file, or of a synthetic
+        text when no files are given
+    """
+    if not args.corpus:
+        return list(generate_text(parse_size(args.size), seed=args.seed))
+
+    lines = []
+    for path in args.corpus:
+        with open(path, 'r', encoding='utf-8') as corpus:
+            lines.extend(corpus.readlines())
+    return lines
+
+def time_tokenizer(language, lines, repeat):
+    """
+    Tokenizes every line, keeping the fastest of several runs.
+
+    Parameters
+    ----------
+    language : Language
+        The language whose tokenizer is timed
+    lines : list
+        The lines to be tokenized
+    repeat : int
+        The number of runs
+
+    Returns
+    -------
+    tuple
+        The tokens of each line and the fastest run in seconds
+    """
+    best = None
+    for run in range(repeat):
+        start = time.perf_counter()
+        tokens = [language.tokenize(line) for line in lines]
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return tokens, best
+
+def parse_args(argv):
+    """
+    Reads the benchmark options from the command line.
+
+    Parameters
+    ----------
+    argv : list
+        The command line arguments
+
+    Returns
+    -------
+    Namespace
+        The parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="Compares the regex tokenizer engine with NLTK.")
+    parser.add_argument("corpus", nargs="*", help="UTF-8 text files to tokenize")
+    parser.add_argument("--language", default="german", help="Language of the corpus")
+    parser.add_argument("--size", default="1MB", help="Size of the synthetic text used without a corpus")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the synthetic text")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs of each engine")
+    parser.add_argument("--examples", type=int, default=10, help="Mismatched lines to report")
+    parser.add_argument("--output", help="File to save the JSON results to")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """
+    Checks that the regex engine produces the same tokens as NLTK
+    and measures the speedup.
+
+    Parameters
+    ----------
+    argv : list
+        The command line arguments
+
+    Returns
+    -------
+    int
+        0 if every line was tokenized the same way, 1 otherwise
+    """
+    args = parse_args(argv)
+    lines = load_corpus(args)
+
+    standard = StandardLanguage(args.language)
+    regex = RegexLanguage(args.language)
+    regex.init_sentence_model()
+
+    expected, nltk_time = time_tokenizer(standard, lines, args.repeat)
+    counter = FallbackCounter(regex)
+    actual, regex_time = time_tokenizer(regex, lines, args.repeat)
+
+    mismatches = []
+    for line, nltk_tokens, regex_tokens in zip(lines, expected, actual):
+        if nltk_tokens != regex_tokens:
+            mismatches.append({"line": line, "nltk": nltk_tokens, "regex": regex_tokens})
+
+    results = {
+        "benchmark": "tokenizer",
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "revision": get_revision(),
+        "python": platform.python_version(),
+        "language": args.language,
+        "lines": len(lines),
+        "tokens": sum(len(tokens) for tokens in expected),
+        "mismatched_lines": len(mismatches),
+        "fallback_lines": counter.count // args.repeat,
+        "nltk_seconds": round(nltk_time, 3),
+        "regex_seconds": round(regex_time, 3),
+        "speedup": round(nltk_time / regex_time, 2),
+        "examples": mismatches[:args.examples]
+    }
+
+    report = json.dumps(results, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w') as output:
+            output.write(report + "\n")
+    print(report)
+    return 1 if mismatches else 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
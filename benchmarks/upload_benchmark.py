@@ -0,0 +1,333 @@
+import argparse
+import datetime
+import json
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+
+from bson import BSON
+from mongoengine import connect, disconnect
+
+from app.content_management.lib.resources import create_book
+from app.content_management.lib.upload import DocumentUploader
+from config import Config
+from . import get_revision
+from .text_generator import generate_text, parse_size
+
+BENCHMARK_EMAIL = "benchmark@example.com"
+
+class BenchmarkUploader(DocumentUploader):
+    """
+    Uploads a document while timing every batch insert.
+    """
+    def __init__(self, params):
+        """
+        Initializes the document upload mechanism.
+
+        Parameters
+        ----------
+        params : dict
+            Configurations for the document upload procedure
+        """
+        super().__init__(params)
+        self.latencies = []
+        self.pages = 0
+
+    def insert_batch(self, batch, doc):
+        """
+        Inserts a batch of pages and records how long it took.
+
+        Parameters
+        ----------
+        batch : list
+            The pages to be inserted
+        doc : dict
+            The document from which the pages are derived
+        """
+        start = time.perf_counter()
+        self.write_batch(batch, doc)
+        self.latencies.append(time.perf_counter() - start)
+        self.pages += len(batch)
+
+    def write_batch(self, batch, doc):
+        """
+        Writes a batch of pages to the database.
+
+        Parameters
+        ----------
+        batch : list
+            The pages to be written
+        doc : dict
+            The document from which the pages are derived
+        """
+        super().insert_batch(batch, doc)
+
+class MemoryUploader(BenchmarkUploader):
+    """
+    Uploads a document without a database. Pages are encoded to
+    BSON, as the driver would do, and then dropped.
+    """
+    def cleanup(self, doc):
+        pass
+
+    def discard_version(self, doc, version):
+        pass
+
+    def publish(self, doc, version):
+        pass
+
+    def write_batch(self, batch, doc):
+        """
+        Encodes a batch of pages to BSON.
+
+        Parameters
+        ----------
+        batch : list
+            The pages to be encoded
+        doc : dict
+            The document from which the pages are derived
+        """
+        for page in batch:
+            BSON.encode(page.to_mongo())
+
+class LineCounter():
+    """
+    Counts the lines of a document as the uploader reads them.
+    """
+    def __init__(self, lines):
+        """
+        Initializes the line counter.
+
+        Parameters
+        ----------
+        lines : iterable
+            The lines of the document
+        """
+        self.lines = lines
+        self.count = 0
+
+    def __iter__(self):
+        for line in self.lines:
+            self.count += 1
+            yield line
+
+def get_percentiles(latencies):
+    """
+    Summarizes batch insert latencies.
+
+    Parameters
+    ----------
+    latencies : list
+        The latency of each batch insert in seconds
+
+    Returns
+    -------
+    dict
+        The median, 90th, 99th percentile and maximum latency
+        in milliseconds
+    """
+    if not latencies:
+        return {"p50": 0.0, "p90": 0.0, "p99": 0.0, "max": 0.0}
+
+    ordered = sorted(latencies)
+    def percentile(fraction):
+        index = min(len(ordered) - 1, int(fraction * len(ordered)))
+        return round(ordered[index] * 1000, 3)
+
+    return {
+        "p50": percentile(0.5),
+        "p90": percentile(0.9),
+        "p99": percentile(0.99),
+        "max": round(ordered[-1] * 1000, 3)
+    }
+
+def build_params(args):
+    """
+    Builds the upload configurations for a benchmark run. Defaults
+    come from the application's configurations.
+
+    Parameters
+    ----------
+    args : Namespace
+        The parsed command line arguments
+
+    Returns
+    -------
+    dict
+        Configurations for the document upload procedure
+    """
+    upload_config = Config.DOCUMENT_UPLOAD
+    params = {}
+    params["email"] = BENCHMARK_EMAIL
+    params["new_page"] = int(args.page_limit or upload_config["PAGE_LIMIT"])
+    params["line_size"] = int(args.line_size or upload_config["LINE_SIZE"])
+    params["early_cutoff"] = int(upload_config["EARLY_CUTOFF"])
+    params["batch_size"] = int(args.batch_size or upload_config["BATCH_SIZE"])
+    params["tokenizer"] = Config.TOKENIZER.select(args.language)
+    params["resource"] = create_book
+    params["processes"] = int(args.processes)
+    params["chunk_size"] = int(upload_config["CHUNK_SIZE"])
+    params["storage_format"] = args.storage_format
+    params["store_payloads"] = int(args.store_payloads)
+    #The memory target has no GridFS to save token streams to
+    params["store_tokens"] = int(upload_config["STORE_TOKENS"]) if args.target == "mongodb" else 0
+    params["compression"] = {
+        "codec": upload_config["COMPRESSION_CODEC"],
+        "level": int(upload_config["COMPRESSION_LEVEL"]),
+        "train": 0
+    }
+    return params
+
+def run_case(args, size):
+    """
+    Uploads one synthetic document and measures the upload.
+
+    Parameters
+    ----------
+    args : Namespace
+        The parsed command line arguments
+    size : str
+        The size of the synthetic document, such as 100KB
+
+    Returns
+    -------
+    dict
+        The throughput, latency and memory measurements
+    """
+    num_bytes = parse_size(size)
+    lines = generate_text(
+                          num_bytes,
+                          seed=args.seed,
+                          paragraph_density=args.paragraph_density,
+                          long_word_ratio=args.long_word_ratio
+                         )
+    counter = LineCounter(lines)
+    doc = {
+        "file": counter,
+        "title": "benchmark-" + size,
+        "author": "benchmark",
+        "language": args.language
+    }
+
+    uploader_class = MemoryUploader if args.target == "memory" else BenchmarkUploader
+    uploader = uploader_class(build_params(args))
+
+    if args.tracemalloc:
+        tracemalloc.start()
+    start = time.perf_counter()
+    uploader.upload(doc)
+    elapsed = time.perf_counter() - start
+    traced_peak = None
+    if args.tracemalloc:
+        traced_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    #Remove the benchmark document from the database
+    if args.target == "mongodb":
+        if uploader.collector:
+            uploader.collector.join()
+        uploader.cleanup(doc)
+
+    result = {
+        "size": size,
+        "bytes": num_bytes,
+        "lines": counter.count,
+        "pages": uploader.pages,
+        "batches": len(uploader.latencies),
+        "elapsed": round(elapsed, 3),
+        "pages_per_second": round(uploader.pages / elapsed, 3),
+        "lines_per_second": round(counter.count / elapsed, 3),
+        "insert_latency_ms": get_percentiles(uploader.latencies),
+        "tracemalloc_peak_bytes": traced_peak,
+        "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    }
+    return result
+
+def parse_args(argv):
+    """
+    Reads the benchmark options from the command line.
+
+    Parameters
+    ----------
+    argv : list
+        The command line arguments
+
+    Returns
+    -------
+    Namespace
+        The parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="Measures document upload throughput and memory.")
+    parser.add_argument("--sizes", nargs="+", default=["100KB", "1MB", "10MB"],
+                        help="Sizes of the synthetic documents, from 100KB to 500MB")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the synthetic text")
+    parser.add_argument("--paragraph-density", type=float, default=0.1,
+                        help="Probability that a sentence ends its paragraph")
+    parser.add_argument("--long-word-ratio", type=float, default=0.02,
+                        help="Fraction of words that are long compound words")
+    parser.add_argument("--language", default="german", help="Language of the synthetic text")
+    parser.add_argument("--target", choices=["memory", "mongodb"], default="memory",
+                        help="Write pages to an in-memory stand-in or to MongoDB")
+    parser.add_argument("--mongodb-uri", default="mongodb://localhost:27017/benchmark",
+                        help="Database used by the mongodb target")
+    parser.add_argument("--storage-format", choices=["standard", "packed", "compressed"],
+                        default=Config.DOCUMENT_UPLOAD["STORAGE_FORMAT"], help="Page storage format")
+    parser.add_argument("--store-payloads", action="store_true",
+                        help="Also store each page's pre-encoded response body")
+    parser.add_argument("--processes", type=int, default=0, help="Tokenization worker processes")
+    parser.add_argument("--batch-size", type=int, help="Pages per insert")
+    parser.add_argument("--line-size", type=int, help="Characters per line")
+    parser.add_argument("--page-limit", type=int, help="Lines per page")
+    parser.add_argument("--no-tracemalloc", dest="tracemalloc", action="store_false",
+                        help="Skip tracing allocations, which slows the upload down")
+    parser.add_argument("--output", help="File to save the JSON results to")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """
+    Runs the upload benchmark and reports the results as JSON.
+
+    Parameters
+    ----------
+    argv : list
+        The command line arguments
+
+    Returns
+    -------
+    dict
+        The benchmark results
+    """
+    args = parse_args(argv)
+    for size in args.sizes:
+        parse_size(size)
+
+    if args.target == "mongodb":
+        connect(host=args.mongodb_uri)
+
+    try:
+        cases = [run_case(args, size) for size in args.sizes]
+    finally:
+        if args.target == "mongodb":
+            disconnect()
+
+    results = {
+        "benchmark": "upload",
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "revision": get_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "cases": cases
+    }
+
+    report = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as output:
+            output.write(report + "\n")
+    print(report)
+    return results
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -7,22 +7,54 @@ basedir = os.path.abspath(os.path.dirname(__file__))
 
 class Config:
     AUTH_TOKEN_LIFETIME = os.environ.get('AUTH_TOKEN_LIFETIME') or 3600
+    DICTIONARY_CONNECT_TIMEOUT = os.environ.get('DICTIONARY_CONNECT_TIMEOUT') or 5
+    DICTIONARY_POOL_SIZE = os.environ.get('DICTIONARY_POOL_SIZE') or 10
+    DICTIONARY_READ_TIMEOUT = os.environ.get('DICTIONARY_READ_TIMEOUT') or 60
+    DICTIONARY_RETRIES = os.environ.get('DICTIONARY_RETRIES') or 2
+    DICTIONARY_RETRY_BACKOFF = os.environ.get('DICTIONARY_RETRY_BACKOFF') or 0.1
     DICTIONARY_ROUTES = os.environ.get('DICTIONARY_ROUTES') or 'dict_routes.yaml'
     DICTIONARY_MANAGER = DictionaryManager(DICTIONARY_ROUTES)
+    DOC_LIST_PAGE_SIZE = os.environ.get('DOC_LIST_PAGE_SIZE') or 50
+    DOCUMENT_CACHE_CONTROL = os.environ.get('DOCUMENT_CACHE_CONTROL') or 'private, no-cache'
     DOCUMENT_UPLOAD = {}
     DOCUMENT_UPLOAD["BATCH_SIZE"] = os.environ.get("DOCUMENT_UPLOAD_BATCH_SIZE") or 100
+    DOCUMENT_UPLOAD["CHUNK_SIZE"] = os.environ.get("DOCUMENT_UPLOAD_CHUNK_SIZE") or 2000
+    DOCUMENT_UPLOAD["COMPRESSION_CODEC"] = os.environ.get("DOCUMENT_UPLOAD_COMPRESSION_CODEC") or "zlib"
+    DOCUMENT_UPLOAD["COMPRESSION_DICTIONARY"] = os.environ.get("DOCUMENT_UPLOAD_COMPRESSION_DICTIONARY") or 0
+    DOCUMENT_UPLOAD["COMPRESSION_LEVEL"] = os.environ.get("DOCUMENT_UPLOAD_COMPRESSION_LEVEL") or 6
     DOCUMENT_UPLOAD["EARLY_CUTOFF"] = os.environ.get("DOCUMENT_UPLOAD_EARLY_CUTOFF") or 0
+    DOCUMENT_UPLOAD["IMPORT_WORKERS"] = os.environ.get("DOCUMENT_UPLOAD_IMPORT_WORKERS") or 4
+    DOCUMENT_UPLOAD["JOB_RETENTION"] = os.environ.get("DOCUMENT_UPLOAD_JOB_RETENTION") or 3600
+    DOCUMENT_UPLOAD["JOB_WORKERS"] = os.environ.get("DOCUMENT_UPLOAD_JOB_WORKERS") or 2
     DOCUMENT_UPLOAD["LINE_SIZE"] = os.environ.get("DOCUMENT_UPLOAD_LINE_SIZE") or 50
+    DOCUMENT_UPLOAD["MAX_LINE_LENGTH"] = os.environ.get("DOCUMENT_UPLOAD_MAX_LINE_LENGTH") or 10000
     DOCUMENT_UPLOAD["PAGE_LIMIT"] = os.environ.get("DOCUMENT_UPLOAD_PAGE_LIMIT") or 30
+    DOCUMENT_UPLOAD["PROCESSES"] = os.environ.get("DOCUMENT_UPLOAD_PROCESSES") or 0
+    DOCUMENT_UPLOAD["QUEUE_SIZE"] = os.environ.get("DOCUMENT_UPLOAD_QUEUE_SIZE") or 4
+    DOCUMENT_UPLOAD["READ_SIZE"] = os.environ.get("DOCUMENT_UPLOAD_READ_SIZE") or 65536
+    DOCUMENT_UPLOAD["STORAGE_FORMAT"] = os.environ.get("DOCUMENT_UPLOAD_STORAGE_FORMAT") or "standard"
+    DOCUMENT_UPLOAD["STORE_PAYLOADS"] = os.environ.get("DOCUMENT_UPLOAD_STORE_PAYLOADS") or 0
+    DOCUMENT_UPLOAD["STORE_TOKENS"] = os.environ.get("DOCUMENT_UPLOAD_STORE_TOKENS") or 1
+    DOCUMENT_UPLOAD["TRANSLATE"] = os.environ.get("DOCUMENT_UPLOAD_TRANSLATE") or 0
+    DOCUMENT_UPLOAD["TRANSLATION_BATCH_SIZE"] = os.environ.get("DOCUMENT_UPLOAD_TRANSLATION_BATCH_SIZE") or 200
+    DOCUMENT_UPLOAD["WRITER_THREADS"] = os.environ.get("DOCUMENT_UPLOAD_WRITER_THREADS") or 0
     DOCUMENT_VIEWER_SERVICES = {
         "getPages": "http://localhost:5000/api/v1/document_retrieval/page_range",
         "getTranslations": "http://localhost:5000/api/v1/translation/LANGUAGE",
         "listDocuments": "http://localhost:5000/api/v1/document_retrieval/doc_list"
     }
     LANGUAGE_OPTIONS = [('english', 'English'), ('german', 'German')]
+    PAGE_RANGE_BATCH_SIZE = os.environ.get("PAGE_RANGE_BATCH_SIZE") or 20
     PAGE_RANGE_DEFAULT_SIZE = os.environ.get("PAGE_RANGE_DEFAULT_SIZE") or 0
+    PRELOAD = os.environ.get('PRELOAD') or 0
+    REFLOW_CACHE_SIZE = os.environ.get('REFLOW_CACHE_SIZE') or 16
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'hard to guess string'
-    TOKENIZER = TokenizerMapper()
+    TOKENIZER_ENGINE = os.environ.get('TOKENIZER_ENGINE') or 'nltk'
+    TOKENIZER = TokenizerMapper(TOKENIZER_ENGINE)
+    TRANSLATION_BATCH_LIMIT = os.environ.get('TRANSLATION_BATCH_LIMIT') or 500
+    TRANSLATION_CACHE_CHECK_INTERVAL = os.environ.get('TRANSLATION_CACHE_CHECK_INTERVAL') or 60
+    TRANSLATION_CACHE_SIZE = os.environ.get('TRANSLATION_CACHE_SIZE') or 10000
+    TRANSLATION_CACHE_TTL = os.environ.get('TRANSLATION_CACHE_TTL') or 3600
     TRANSLATIONS_PAGE_SIZE = os.environ.get('TRANSLATIONS_PAGE_SIZE') or 5
     VOCAB_ENTRIES_PER_PAGE = os.environ.get('VOCAB_ENTRIES_PER_PAGE') or 50
 
@@ -0,0 +1,294 @@
+import json
+
+from abc import ABC, abstractmethod
+
+from dictionaries.connections import GetDictionaryData
+from dictionaries.queries import SimpleQuery
+from dictionaries.sqlite_store import SQLiteDictionaryStore
+
+class DictionaryBackend(ABC):
+    """
+    The store that a foreign language dictionary looks up its
+    entries in.
+    """
+    @abstractmethod
+    def get_index_version(self):
+        """
+        Fetches the unique identifier of the dictionary's index,
+        which changes whenever the index is rebuilt.
+
+        Returns
+        -------
+        str
+            The unique identifier of the index, or None if
+            the index doesn't exist
+        """
+        pass
+
+    @abstractmethod
+    def search(self, query, page, size):
+        """
+        Finds the dictionary entries matching a query.
+
+        Parameters
+        ----------
+        query : str
+            The text to be looked up
+        page : int
+            The number of the results page
+            in the pagination scheme
+        size : int
+            The number of results per page
+
+        Returns
+        -------
+        list
+            The matching entries, each under a '_source' key, or
+            None if the lookup failed
+        """
+        pass
+
+    def search_many(self, queries, page, size):
+        """
+        Finds the dictionary entries matching each of several queries.
+
+        Parameters
+        ----------
+        queries : list
+            The pieces of text to be looked up
+        page : int
+            The number of the results page
+            in the pagination scheme
+        size : int
+            The number of results per page
+
+        Returns
+        -------
+        list
+            The matching entries of each query, or None where the
+            lookup failed, in the order the queries were given
+        """
+        return [self.search(query, page, size) for query in queries]
+
+class ElasticsearchBackend(DictionaryBackend):
+    """
+    A dictionary index in an Elasticsearch service.
+    """
+    def __init__(self, route, index_name):
+        """
+        Initializes the backend.
+
+        Parameters
+        ----------
+        route : str
+            The path to the Elasticsearch service
+        index_name : str
+            The name of the dictionary's index
+        """
+        self.route = route
+        self.index_name = index_name
+
+    def get_index_version(self):
+        """
+        Fetches the unique identifier of the dictionary's index,
+        which changes whenever the index is rebuilt.
+
+        Returns
+        -------
+        str
+            The unique identifier of the index, or None if
+            the index doesn't exist
+        """
+        route = self.route + "/" + self.index_name + "/_settings"
+        response = GetDictionaryData().request(route)
+        json_response = json.loads(response.text)
+        if "status" in json_response:
+            #Presence of 'status' key indicates an error
+            return None
+        return json_response[self.index_name]["settings"]["index"]["uuid"]
+
+    def get_params(self, query, page, size):
+        """
+        Builds the parameters of a query of the dictionary's index.
+
+        Parameters
+        ----------
+        query : str
+            The text to be looked up
+        page : int
+            The number of the results page
+            in the pagination scheme
+        size : int
+            The number of results per page
+
+        Returns
+        -------
+        dict
+            The parameters of the query
+        """
+        params = {}
+        params["index_name"] = self.index_name
+        params["page"] = page
+        params["size"] = size
+        params["term"] = query
+        return params
+
+    def search(self, query, page, size):
+        """
+        Finds the dictionary entries matching a query with
+        a single Elasticsearch search.
+
+        Parameters
+        ----------
+        query : str
+            The text to be looked up
+        page : int
+            The number of the results page
+            in the pagination scheme
+        size : int
+            The number of results per page
+
+        Returns
+        -------
+        list
+            The matching entries, each under a '_source' key, or
+            None if the search failed
+        """
+        params = self.get_params(query, page, size)
+        translations = SimpleQuery().run_query(params, self.route)
+        json_response = json.loads(translations.text)
+        if "status" in json_response:
+            #Presence of 'status' key indicates an error
+            return None
+        return json_response["hits"]["hits"]
+
+    def search_many(self, queries, page, size):
+        """
+        Finds the dictionary entries matching each of several
+        queries with a single Elasticsearch multi-search.
+
+        Parameters
+        ----------
+        queries : list
+            The pieces of text to be looked up
+        page : int
+            The number of the results page
+            in the pagination scheme
+        size : int
+            The number of results per page
+
+        Returns
+        -------
+        list
+            The matching entries of each query, or None where the
+            search failed, in the order the queries were given
+        """
+        if not queries:
+            return []
+
+        params_list = [self.get_params(query, page, size) for query in queries]
+        translations = SimpleQuery().run_queries(params_list, self.route)
+        json_response = json.loads(translations.text)
+        responses = json_response.get("responses")
+        if responses is None:
+            #The whole multi-search failed
+            return [None] * len(queries)
+
+        results = []
+        for result in responses:
+            if "error" in result:
+                #Presence of 'error' key indicates that this search failed
+                results.append(None)
+            else:
+                results.append(result["hits"]["hits"])
+        return results
+
+class SQLiteBackend(DictionaryBackend):
+    """
+    A dictionary file read in process, which needs no separate
+    service and answers without a network round trip. Entries
+    are analyzed and ranked as the Elasticsearch index does.
+    """
+    def __init__(self, path, analyzer):
+        """
+        Initializes the backend.
+
+        Parameters
+        ----------
+        path : str
+            The path of the dictionary file
+        analyzer : Analyzer
+            The analyzer of the dictionary's language
+        """
+        self.store = SQLiteDictionaryStore(path, analyzer)
+
+    def get_index_version(self):
+        """
+        Fetches the unique identifier of the dictionary file's build,
+        which changes whenever the file is rebuilt.
+
+        Returns
+        -------
+        str
+            The unique identifier of the build
+        """
+        return self.store.get_version()
+
+    def search(self, query, page, size):
+        """
+        Finds the dictionary entries matching a query.
+
+        Parameters
+        ----------
+        query : str
+            The text to be looked up
+        page : int
+            The number of the results page
+            in the pagination scheme
+        size : int
+            The number of results per page
+
+        Returns
+        -------
+        list
+            The matching entries, each under a '_source' key
+        """
+        return [{"_source": entry} for entry in self.store.search(query, page, size)]
+
+def create_backend(config, index_name, analyzer, default_route=None):
+    """
+    Creates the backend of a dictionary from its entry in the
+    dictionary routes file. An entry is either the route to an
+    Elasticsearch service or a mapping naming the backend:
+
+        german:
+          backend: sqlite
+          path: /path/to/german.sqlite
+
+    Parameters
+    ----------
+    config : str or dict
+        The dictionary's entry in the routes file
+    index_name : str
+        The name of the dictionary's index
+    analyzer : Analyzer
+        The analyzer of the dictionary's language, which
+        dictionary files are looked up with
+    default_route : str
+        The route to the Elasticsearch service used when
+        the entry doesn't give one
+
+    Returns
+    -------
+    DictionaryBackend
+        The dictionary's backend
+    """
+    if config is None or isinstance(config, str):
+        return ElasticsearchBackend(config or default_route, index_name)
+
+    backend = config.get("backend", "elasticsearch")
+    if backend == "sqlite":
+        return SQLiteBackend(config["path"], analyzer)
+    if backend == "elasticsearch":
+        return ElasticsearchBackend(config.get("route") or default_route, index_name)
+    raise Exception("Unknown dictionary backend: " + str(backend))
@@ -1,14 +1,22 @@
-import requests
+import os
+import time
 
 import yaml
 
 from abc import ABC, abstractmethod
+from threading import Lock
 
 class DataConnection(ABC):
     """
     Connection to a data source
     """
 
+    def finish(self):
+        """
+        Completes the data source once every entry has been written.
+        """
+        pass
+
     def get_connection(self):
         """
         Fetches the method for connecting to a data source.
@@ -61,19 +69,256 @@ class DataConnection(ABC):
         """
         pass
 
+class DictionaryTransport():
+    """
+    The HTTP transport shared by every request to the dictionary
+    services. Each process keeps one session whose connections are
+    pooled and kept alive between requests, so that translations
+    don't pay for a new TCP connection each time. A process forked
+    from one that already used the transport starts a session of its
+    own rather than sharing sockets with its parent. Requests is
+    only imported once the first session is created, so that the app
+    can configure the transport without importing it at startup.
+    """
+    def __init__(self, pool_size=10, connect_timeout=5, read_timeout=60, retries=2, backoff=0.1):
+        """
+        Initializes the transport.
+
+        Parameters
+        ----------
+        pool_size : int
+            The number of connections kept alive per host
+        connect_timeout : float
+            The seconds to wait for a connection to be made
+        read_timeout : float
+            The seconds to wait for a response
+        retries : int
+            The number of times a request is retried after a failed
+            connection, or after a busy service responds with 502,
+            503 or 504. Requests that may not be repeated, such as
+            POSTs, are only retried when they couldn't connect.
+        backoff : float
+            The seconds to wait before the first retry, doubling
+            with each retry after
+        """
+        self.lock = Lock()
+        self.session = None
+        self.pid = None
+        self.configure(pool_size, connect_timeout, read_timeout, retries, backoff)
+
+    def configure(self, pool_size, connect_timeout, read_timeout, retries, backoff):
+        """
+        Changes the transport's settings. The session is replaced
+        the next time a request is sent.
+
+        Parameters
+        ----------
+        pool_size : int
+            The number of connections kept alive per host
+        connect_timeout : float
+            The seconds to wait for a connection to be made
+        read_timeout : float
+            The seconds to wait for a response
+        retries : int
+            The number of times a failed request is retried
+        backoff : float
+            The seconds to wait before the first retry
+        """
+        with self.lock:
+            self.pool_size = int(pool_size)
+            self.timeout = (float(connect_timeout), float(read_timeout))
+            self.retries = int(retries)
+            self.backoff = float(backoff)
+            self.session = None
+            self.pid = None
+            self.reset_stats()
+
+    def init_app(self, app):
+        """
+        Configures the transport from an application's settings.
+
+        Parameters
+        ----------
+        app : Flask
+            The application whose configurations set up the transport
+        """
+        self.configure(
+                       app.config["DICTIONARY_POOL_SIZE"],
+                       app.config["DICTIONARY_CONNECT_TIMEOUT"],
+                       app.config["DICTIONARY_READ_TIMEOUT"],
+                       app.config["DICTIONARY_RETRIES"],
+                       app.config["DICTIONARY_RETRY_BACKOFF"]
+                      )
+
+    def create_session(self):
+        """
+        Creates a session with a pool of keep-alive connections.
+
+        Returns
+        -------
+        Session
+            The new session
+        """
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        retry = Retry(
+                      total=self.retries,
+                      connect=self.retries,
+                      read=0,
+                      status=self.retries,
+                      status_forcelist=(502, 503, 504),
+                      backoff_factor=self.backoff,
+                      raise_on_status=False
+                     )
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size, max_retries=retry)
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def get_session(self):
+        """
+        Fetches the current process's session, creating it on
+        first use.
+
+        Returns
+        -------
+        Session
+            The session of the current process
+        """
+        pid = os.getpid()
+        if self.pid != pid:
+            with self.lock:
+                if self.pid != pid:
+                    #The sockets of a parent's session must not be shared
+                    self.session = self.create_session()
+                    self.pid = pid
+                    self.reset_stats()
+        return self.session
+
+    def get_stats(self):
+        """
+        Fetches the transport's counters for the current process.
+
+        Returns
+        -------
+        dict
+            The number of requests, failed requests and retries, the
+            connections opened and reused, and the mean and longest
+            request latency in milliseconds
+        """
+        with self.lock:
+            stats = dict(self.stats)
+            session = self.session if self.pid == os.getpid() else None
+
+        connections = 0
+        if session is not None:
+            for adapter in set(session.adapters.values()):
+                pools = adapter.poolmanager.pools
+                for key in pools.keys():
+                    pool = pools.get(key)
+                    if pool is not None:
+                        connections += pool.num_connections
+
+        requests_sent = stats["requests"] + stats["retries"]
+        stats["connections"] = connections
+        stats["reused"] = max(requests_sent - connections, 0)
+        stats["pool_size"] = self.pool_size
+        latency = stats.pop("latency")
+        count = stats["requests"]
+        stats["mean_latency_ms"] = round(latency * 1000 / count, 3) if count else 0
+        stats["max_latency_ms"] = round(stats.pop("max_latency") * 1000, 3)
+        return stats
+
+    def request(self, method, route, timeout=None, **kwargs):
+        """
+        Sends an HTTP request over a pooled connection.
+
+        Parameters
+        ----------
+        method : str
+            The HTTP method of the request
+        route : str
+            The path to the service
+        timeout : float
+            The seconds to wait for a response, or None to use the
+            transport's connect and read timeouts
+        **kwargs
+            The data, headers and other arguments of the request
+
+        Returns
+        -------
+        Response
+            The response from the service
+        """
+        from requests import RequestException
+
+        session = self.get_session()
+        if timeout is None:
+            timeout = self.timeout
+        start = time.perf_counter()
+        try:
+            response = session.request(method, route, timeout=timeout, **kwargs)
+        except RequestException:
+            self.record(time.perf_counter() - start, 0, error=True)
+            raise
+
+        retries = response.raw.retries
+        retry_count = len(retries.history) if retries is not None else 0
+        self.record(time.perf_counter() - start, retry_count)
+        return response
+
+    def record(self, latency, retries, error=False):
+        """
+        Adds a request to the transport's counters.
+
+        Parameters
+        ----------
+        latency : float
+            The seconds the request took, including retries
+        retries : int
+            The number of times the request was retried
+        error : bool
+            True if no response was received
+        """
+        with self.lock:
+            stats = self.stats
+            stats["requests"] += 1
+            stats["retries"] += retries
+            stats["errors"] += int(error)
+            stats["latency"] += latency
+            stats["max_latency"] = max(stats["max_latency"], latency)
+
+    def reset_stats(self):
+        """
+        Sets the transport's counters back to zero.
+        """
+        self.stats = {
+            "errors": 0,
+            "latency": 0.0,
+            "max_latency": 0.0,
+            "requests": 0,
+            "retries": 0
+        }
+
+transport = DictionaryTransport()
+
 class DictionaryDataRequest(ABC):
     """
     Base class for interacting with a
     foreign language dictionary.
     """
-    def __init__(self, timeout=60):
+    def __init__(self, timeout=None):
         """
         Initializes the request.
 
         Parameters
         ----------
         timeout : int
-            The amount of time to keep the request active
+            The amount of time to keep the request active, or None
+            to use the transport's connect and read timeouts
         """
         self.set_timeout(timeout)
 
@@ -134,7 +379,7 @@ class DeleteDictionaryData(DictionaryDataRequest):
             The JSON response from the DELETE request
         """
         timeout = self.get_timeout()
-        return requests.delete(route, timeout=timeout)
+        return transport.request("DELETE", route, timeout=timeout)
 
 class GetDictionaryData(DictionaryDataRequest):
     """
@@ -160,8 +405,8 @@ class GetDictionaryData(DictionaryDataRequest):
         if params:
             data = params["data"]
             headers = params["headers"]
-            return requests.get(route, data=data, headers=headers, timeout=timeout)    
-        return requests.get(route, timeout=timeout)
+            return transport.request("GET", route, data=data, headers=headers, timeout=timeout)    
+        return transport.request("GET", route, timeout=timeout)
 
 class PostDictionaryData(DictionaryDataRequest):
     """
@@ -187,8 +432,8 @@ class PostDictionaryData(DictionaryDataRequest):
         if params:
             data = params["data"]
             headers = params["headers"]
-            return requests.post(route, data=data, headers=headers, timeout=timeout)
-        return requests.post(route, timeout=timeout)
+            return transport.request("POST", route, data=data, headers=headers, timeout=timeout)
+        return transport.request("POST", route, timeout=timeout)
 
 class UpdateDictionaryData(DictionaryDataRequest):
     """
@@ -214,5 +459,5 @@ class UpdateDictionaryData(DictionaryDataRequest):
         if params:
             data = params["data"]
             headers = params["headers"]
-            return requests.put(route, data=data, headers=headers, timeout=timeout)
-        return requests.put(route, timeout=timeout)
\ No newline at end of file
+            return transport.request("PUT", route, data=data, headers=headers, timeout=timeout)
+        return transport.request("PUT", route, timeout=timeout)
\ No newline at end of file
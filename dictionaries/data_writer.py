@@ -59,4 +59,5 @@ class DataWriter():
                 data_stream = []
         
         if data_stream:
-            data_conn.write(data_stream)
\ No newline at end of file
+            data_conn.write(data_stream)
+        data_conn.finish()
\ No newline at end of file
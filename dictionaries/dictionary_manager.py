@@ -1,11 +1,13 @@
-import yaml
+from threading import Lock
 
-from dictionaries.languages.german.german_dictionary import GermanDictionary
+import yaml
 
 class DictionaryManager():
     """
     Controls access to the different foreign language dictionaries
-    that are supported.
+    that are supported. The routes are read and the dictionaries
+    imported the first time one is needed, so that processes which
+    never translate don't pay for them at startup.
     """
     def __init__(self, config):
         """
@@ -17,7 +19,8 @@ class DictionaryManager():
             A path to the configuration file
         """
         self.routes_config = config
-        self.init_dictionaries()
+        self.dictionaries = None
+        self.lock = Lock()
     
     def get_dictionary(self, language):
         """
@@ -38,12 +41,29 @@ class DictionaryManager():
         if not self.has_dictionary(language):
             return {}
 
-        return self.dictionaries[language]()
+        return self.get_dictionaries()[language]()
+
+    def get_dictionaries(self):
+        """
+        Fetches the foreign language dictionaries, loading
+        them on first use.
+
+        Returns
+        -------
+        dict
+            A function creating each language's dictionary
+        """
+        if self.dictionaries is None:
+            with self.lock:
+                if self.dictionaries is None:
+                    self.init_dictionaries()
+        return self.dictionaries
 
     def get_routes(self):
         """
         Fetches the routes to the foreign language dictionary
-        services.
+        services. A language may name its own backend, otherwise
+        its dictionary is queried at the default route.
         
         Returns
         -------
@@ -76,13 +96,28 @@ class DictionaryManager():
         bool
             True if the dictionary is supported, False otherwise
         """
-        return language in self.dictionaries
+        return language in self.get_dictionaries()
+
+    def preload(self):
+        """
+        Loads the routes and creates each dictionary once, so that
+        the modules behind them are imported up front.
+        """
+        for create_dictionary in self.get_dictionaries().values():
+            create_dictionary()
 
     def init_dictionaries(self):
         """
         Loads the foreign language dictionaries.
         """
-        self.dictionaries = {}
+        from dictionaries.backends import create_backend
+        from dictionaries.languages.german.german_analyzer import GermanAnalyzer
+        from dictionaries.languages.german.german_dictionary import GermanDictionary
+
+        dictionaries = {}
         routes = self.get_routes()
-        self.dictionaries["german"] = (lambda: GermanDictionary(routes["default"]))
-        #Add dictionaries for other languages here
\ No newline at end of file
+        default_route = routes.get("default")
+        german = create_backend(routes.get("german"), "german", GermanAnalyzer(), default_route)
+        dictionaries["german"] = (lambda: GermanDictionary(german))
+        #Add dictionaries for other languages here
+        self.dictionaries = dictionaries
\ No newline at end of file
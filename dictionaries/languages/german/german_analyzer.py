@@ -0,0 +1,180 @@
+import re
+
+#Name the analyzer is recorded under in dictionary files
+ANALYZER_NAME = "german"
+
+#Elasticsearch's _german_ stopwords
+STOPWORDS = frozenset("""
+aber alle allem allen aller alles als also am an ander andere anderem anderen
+anderer anderes anderm andern anderr anders auch auf aus bei bin bis bist da
+damit dann der den des dem die das daß derselbe derselben denselben desselben
+demselben dieselbe dieselben dasselbe dazu dein deine deinem deinen deiner
+deines denn derer dessen dich dir du dies diese diesem diesen dieser dieses
+doch dort durch ein eine einem einen einer eines einig einige einigem einigen
+einiger einiges einmal er ihn ihm es etwas euer eure eurem euren eurer eures
+für gegen gewesen hab habe haben hat hatte hatten hier hin hinter ich mich mir
+ihr ihre ihrem ihren ihrer ihres euch im in indem ins ist jede jedem jeden
+jeder jedes jene jenem jenen jener jenes jetzt kann kein keine keinem keinen
+keiner keines können könnte machen man manche manchem manchen mancher manches
+mein meine meinem meinen meiner meines mit muss musste nach nicht nichts noch
+nun nur ob oder ohne sehr sein seine seinem seinen seiner seines selbst sich
+sie ihnen sind so solche solchem solchen solcher solches soll sollte sondern
+sonst über um und uns unse unsem unsen unser unses unter viel vom von vor
+während war waren warst was weg weil weiter welche welchem welchen welcher
+welches wenn werde werden wie wieder will wir wird wirst wo wollen wollte
+würde würden zu zum zur zwar zwischen
+""".split())
+
+#Runs of letters and digits, and the characters that join two runs into one
+#word: between letters, as in "z.B", or between digits, as in "3,5"
+WORD_RUN = re.compile(r"\w[\w\u0300-\u036f]*")
+LETTER_JOINERS = ".:'‘’·"
+DIGIT_JOINERS = ".,;'‘’"
+
+#Vowels the light stemmer folds to their plain forms
+FOLDED_VOWELS = str.maketrans("äàáâöòóôïìíîüùúû", "aaaaooooiiiiuuuu")
+
+#Consonants that may precede an -s or -st ending the light stemmer removes
+ST_ENDINGS = "bdfghklmnt"
+
+class GermanAnalyzer():
+    """
+    Splits text into the terms that German dictionary entries are
+    indexed and looked up by, in the same way as Elasticsearch's
+    german analyzer: the standard tokenizer, then lowercasing,
+    German stopword removal, German normalization and the light
+    German stemmer.
+    """
+    name = ANALYZER_NAME
+
+    def analyze(self, text):
+        """
+        Splits text into terms.
+
+        Parameters
+        ----------
+        text : str
+            The text to be analyzed
+
+        Returns
+        -------
+        list
+            The terms of the text, in order, including repeats
+        """
+        terms = []
+        for token in self.tokenize(text):
+            token = token.lower()
+            if token in STOPWORDS:
+                continue
+            terms.append(self.stem(self.normalize(token)))
+        return terms
+
+    def normalize(self, token):
+        """
+        Folds umlauts and their two-letter spellings and ß into
+        plain letters, so that "Häuser" and "Haeuser" are the same.
+
+        Parameters
+        ----------
+        token : str
+            The lowercased token
+
+        Returns
+        -------
+        str
+            The normalized token
+        """
+        #Whether the last letter was a vowel that an 'e' after it folds into
+        umlaut = False
+        #Whether the last letter was a vowel or 'q', after which a 'u' isn't folded
+        vowel = False
+        normalized = []
+        for c in token:
+            if c in "ao":
+                umlaut, vowel = True, True
+            elif c == "u":
+                umlaut, vowel = not vowel, True
+            elif c == "e":
+                if umlaut:
+                    umlaut, vowel = False, True
+                    continue
+                umlaut, vowel = False, True
+            elif c in "iqy":
+                umlaut, vowel = False, True
+            elif c in "äöü":
+                c = {"ä": "a", "ö": "o", "ü": "u"}[c]
+                umlaut, vowel = False, True
+            elif c == "ß":
+                c = "ss"
+                umlaut, vowel = False, False
+            else:
+                umlaut, vowel = False, False
+            normalized.append(c)
+        return "".join(normalized)
+
+    def stem(self, token):
+        """
+        Removes common German inflectional endings.
+
+        Parameters
+        ----------
+        token : str
+            The normalized token
+
+        Returns
+        -------
+        str
+            The stem of the token
+        """
+        s = token.translate(FOLDED_VOWELS)
+
+        if len(s) > 5 and s.endswith("ern"):
+            s = s[:-3]
+        elif len(s) > 4 and s[-2] == "e" and s[-1] in "mnrs":
+            s = s[:-2]
+        elif len(s) > 3 and s[-1] == "e":
+            s = s[:-1]
+        elif len(s) > 3 and s[-1] == "s" and s[-2] in ST_ENDINGS:
+            s = s[:-1]
+
+        if len(s) > 5 and s.endswith("est"):
+            s = s[:-3]
+        elif len(s) > 4 and s.endswith("er"):
+            s = s[:-2]
+        elif len(s) > 4 and s.endswith("st") and s[-3] in ST_ENDINGS:
+            s = s[:-2]
+        return s
+
+    def tokenize(self, text):
+        """
+        Splits text into words on whitespace and punctuation.
+        Periods, colons and apostrophes between letters and
+        periods, commas and apostrophes between digits don't
+        split a word.
+
+        Parameters
+        ----------
+        text : str
+            The text to be split
+
+        Returns
+        -------
+        list
+            The words of the text
+        """
+        tokens = []
+        last_end = None
+        for match in WORD_RUN.finditer(text):
+            start = match.start()
+            if tokens and last_end == start - 1:
+                joiner = text[last_end]
+                before = text[last_end - 1]
+                after = text[start]
+                if (joiner in LETTER_JOINERS and before.isalpha() and after.isalpha()) \
+                   or (joiner in DIGIT_JOINERS and before.isdigit() and after.isdigit()):
+                    tokens[-1] += joiner + match.group()
+                    last_end = match.end()
+                    continue
+            tokens.append(match.group())
+            last_end = match.end()
+        return tokens
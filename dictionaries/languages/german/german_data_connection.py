@@ -1,6 +1,9 @@
+import json
 import os
 
 from connections import DataConnection, PostDictionaryData
+from languages.german.german_analyzer import GermanAnalyzer
+from sqlite_store import SQLiteDictionaryWriter
 
 class GermanDataConnection(DataConnection):
     """
@@ -44,4 +47,45 @@ class GermanDataConnection(DataConnection):
         params["headers"] = headers
         resp = conn_method.request(route, params=params)
         
-        os.remove(tmp_file)
\ No newline at end of file
+        os.remove(tmp_file)
+
+class GermanSQLiteConnection(DataConnection):
+    """
+    Connection to a German dictionary file, which the
+    dictionary service reads in process.
+    """
+    def __init__(self, config):
+        """
+        Initialize the German dictionary file.
+
+        Parameters
+        ----------
+        config : str
+            A configuration file with the path of the dictionary file
+        """
+        super().load_params(config)
+        self.writer = SQLiteDictionaryWriter(self.params["path"], GermanAnalyzer())
+
+    def finish(self):
+        """
+        Indexes the German dictionary file and puts it
+        in place of the previous one.
+        """
+        self.writer.close()
+
+    def write(self, data):
+        """
+        Writes German dictionary data to the dictionary file.
+
+        Parameters
+        ----------
+        data : list
+            A list of dictionary entries, each preceded by
+            an Elasticsearch bulk index command
+        """
+        entries = []
+        for line in data:
+            entry = json.loads(line)
+            if "inflected_form" in entry:
+                entries.append(entry)
+        self.writer.write(entries)
\ No newline at end of file
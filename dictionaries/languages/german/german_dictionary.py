@@ -2,22 +2,20 @@ import json
 
 from http import HTTPStatus
 
-from dictionaries.queries import SimpleQuery
-
 class GermanDictionary():
     """
     The German dictionary service.
     """
-    def __init__(self, route):
+    def __init__(self, backend):
         """
         Initializes the service
 
         Parameters
         ----------
-        route : str
-            The path to the Elasticsearch service
+        backend : DictionaryBackend
+            The store holding the dictionary's entries
         """
-        self.set_route(route)
+        self.set_backend(backend)
 
     def format_match(self, match):
         """
@@ -56,17 +54,79 @@ class GermanDictionary():
         
         return formatted
     
-    def get_route(self):
+    def format_translations(self, translations, query, page):
+        """
+        Builds the response to a user's query from
+        the dictionary entries that matched it.
+
+        Parameters
+        ----------
+        translations : list
+            The dictionary entries that matched the query, or
+            None if the lookup failed
+        query : str
+            The text to be translated
+        page : int
+            The number of the results page
+            in the pagination scheme
+
+        Returns
+        -------
+        json
+            The JSON response containing the answers to
+            the user's query
+        int
+            An HTTP status code
+        """
+        if translations is None:
+            #A failed lookup isn't the same as a word with no translations
+            response = {}
+            response["text"] = "The dictionary is unavailable"
+            response = json.dumps(response, ensure_ascii=False)
+            return (response, HTTPStatus.SERVICE_UNAVAILABLE.value)
+
+        if not translations:
+            response = {}
+            response["text"] = "No translations found"
+            response = json.dumps(response, ensure_ascii=False)
+            return (response, HTTPStatus.NOT_FOUND.value)
+
+        response = {}
+        if page == 1:
+            response["translations"] = self.get_top_matches(translations, query)
+        else:
+            response["translations"] = []
+            for t in translations:
+                formatted = self.format_match(t["_source"])
+                response["translations"] += formatted
+        
+        response = json.dumps(response, ensure_ascii=False)
+        return (response, HTTPStatus.OK.value)
+
+    def get_backend(self):
+        """
+        Fetches the store holding the dictionary's entries.
+
+        Returns
+        -------
+        DictionaryBackend
+            The store holding the dictionary's entries
+        """
+        return self.backend
+
+    def get_index_version(self):
         """
-        Fetches the route to the Elasticsearch service.
+        Fetches the unique identifier of the dictionary's index,
+        which changes whenever the index is rebuilt.
 
         Returns
         -------
         str
-            The route to the Elasticsearch service
+            The unique identifier of the index, or None if
+            the index doesn't exist
         """
-        return self.route
-    
+        return self.get_backend().get_index_version()
+
     def get_top_matches(self, matches, query):
         """
         Ranks exact matches to a user's query at
@@ -124,50 +184,48 @@ class GermanDictionary():
         int
             An HTTP status code
         """
-        translator = SimpleQuery()
-        route = self.get_route()
-        params = {}
-        params["index_name"] = "german"
-        params["page"] = page
-        params["size"] = size
-        params["term"] = query
+        translations = self.get_backend().search(query, page, size)
+        return self.format_translations(translations, query, page)
 
-        translations = translator.run_query(params, route)
-        json_response = json.loads(translations.text)
-        
-        if "status" in json_response:
-            #Presence of 'status' key indicates an error
-            response = {}
-            response["text"] = "No translations found"
-            response = json.dumps(response, ensure_ascii=False)
-            return (response, HTTPStatus.NOT_FOUND.value)
-        
-        translations = json_response["hits"]["hits"]
-        if not translations:
-            response = {}
-            response["text"] = "No translations found"
-            response = json.dumps(response, ensure_ascii=False)
-            return (response, HTTPStatus.NOT_FOUND.value)
+    def get_translations(self, queries, page, size):
+        """
+        Finds the dictionary translations of several pieces of
+        text at once, with a single request where the backend
+        supports it.
 
-        response = {}
-        if page == 1:
-            response["translations"] = self.get_top_matches(translations, query)
-        else:
-            response["translations"] = []
-            for t in translations:
-                formatted = self.format_match(t["_source"])
-                response["translations"] += formatted
-        
-        response = json.dumps(response, ensure_ascii=False)
-        return (response, HTTPStatus.OK.value)
+        Parameters
+        ----------
+        queries : list
+            The pieces of text to be translated
+        page : int
+            The number of the results page
+            in the pagination scheme
+        size : int
+            The number of results per page
+
+        Returns
+        -------
+        list
+            The JSON response and HTTP status code that
+            get_translation gives for each query, in the
+            order the queries were given
+        """
+        if not queries:
+            return []
+
+        results = []
+        matches = self.get_backend().search_many(queries, page, size)
+        for query, translations in zip(queries, matches):
+            results.append(self.format_translations(translations, query, page))
+        return results
         
-    def set_route(self, route):
+    def set_backend(self, backend):
         """
-        Saves the route to the Elasticsearch service.
+        Saves the store holding the dictionary's entries.
 
         Parameters
         ----------
-        route : str
-            The route to the Elasticsearch service
+        backend : DictionaryBackend
+            The store holding the dictionary's entries
         """
-        self.route = route
\ No newline at end of file
+        self.backend = backend
\ No newline at end of file
@@ -2,8 +2,10 @@ import argparse
 
 from datetime import datetime
 
+import yaml
+
 from data_writer import DataWriter
-from languages.german.german_data_connection import GermanDataConnection
+from languages.german.german_data_connection import GermanDataConnection, GermanSQLiteConnection
 from languages.german.german_data_processor import GermanDataProcessor
 
 if __name__ == "__main__":
@@ -21,7 +23,12 @@ if __name__ == "__main__":
     data_source = args.data_source
     conn_config = args.conn_config
     data_config = args.data_config
-    connection = GermanDataConnection(conn_config)
+    with open(conn_config, 'r') as conf:
+        backend = yaml.safe_load(conf).get("backend", "elasticsearch")
+    if backend == "sqlite":
+        connection = GermanSQLiteConnection(conn_config)
+    else:
+        connection = GermanDataConnection(conn_config)
     processor = (lambda data: GermanDataProcessor(data, data_config))
     data_writer = DataWriter(connection, processor, data_config)
     
@@ -77,6 +77,39 @@ class TextQuery(ABC):
         lookup["headers"] = {'Content-Type': 'application/json'}
         return conn_method.request(route, lookup)
 
+    def run_queries(self, params_list, route):
+        """
+        Executes several of the user's queries in a single
+        multi-search request.
+
+        Parameters
+        ----------
+        params_list : list
+            A dictionary of parameters for each query
+        route : str
+            A path to the dictionary service
+
+        Returns
+        -------
+        json
+            The JSON response holding the response to each query,
+            in the order the queries were given
+        """
+        seperator = "/"
+        search = "_msearch"
+        route = route + seperator + search
+        lines = []
+        for params in params_list:
+            header = {"index": params["index_name"]}
+            lines.append(json.dumps(header))
+            lines.append(self.build_query(params))
+        conn_method = self.get_connection()
+        lookup = {}
+        #Multi-search bodies are newline delimited and must end with a newline
+        lookup["data"] = ("\n".join(lines) + "\n").encode("utf-8")
+        lookup["headers"] = {'Content-Type': 'application/x-ndjson'}
+        return conn_method.request(route, lookup)
+
 class SimpleQuery(TextQuery):
     """
     The most primitive translation query a user can make.
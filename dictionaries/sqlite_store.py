@@ -0,0 +1,453 @@
+import json
+import math
+import os
+import sqlite3
+import struct
+import threading
+import uuid
+
+from collections import Counter
+
+#Bytes of the dictionary file that readers memory-map
+MMAP_SIZE = 268435456
+
+#Best scoring entries with each term that are ranked when looking up
+#several terms, before falling back to every entry with the terms
+MAX_WORD_MATCHES = 500
+
+#Suffix of the file a dictionary is built in before it replaces the old one
+BUILD_SUFFIX = ".building"
+
+#Elasticsearch's BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+#Field lengths below this are stored exactly by Lucene, longer ones lossily
+EXACT_LENGTHS = 24
+
+def to_float(value):
+    """
+    Rounds a number to single precision, which is
+    the precision Lucene computes scores in.
+
+    Parameters
+    ----------
+    value : float
+        The number to be rounded
+
+    Returns
+    -------
+    float
+        The rounded number
+    """
+    return struct.unpack("f", struct.pack("f", value))[0]
+
+def round_length(length):
+    """
+    Rounds the number of terms in an entry the way Lucene does
+    when it stores the length for scoring.
+
+    Parameters
+    ----------
+    length : int
+        The number of terms in the entry
+
+    Returns
+    -------
+    int
+        The length that the entry is scored with
+    """
+    if length < EXACT_LENGTHS:
+        return length
+
+    #Keep the four most significant bits of the length beyond the exact ones
+    value = length - EXACT_LENGTHS
+    shift = max(value.bit_length() - 4, 0)
+    return EXACT_LENGTHS + ((value >> shift) << shift)
+
+class BM25Scorer():
+    """
+    Scores how well an entry matches a term with the same BM25
+    formula and precision as Elasticsearch, so that entries are
+    ranked in the same order.
+    """
+    def __init__(self, doc_count, total_length):
+        """
+        Initializes the scorer.
+
+        Parameters
+        ----------
+        doc_count : int
+            The number of entries with at least one term
+        total_length : int
+            The number of terms in every entry
+        """
+        self.doc_count = doc_count
+        self.k1 = to_float(BM25_K1)
+        self.b = to_float(BM25_B)
+        self.avgdl = to_float(total_length / doc_count) if doc_count else 1.0
+
+    def score(self, tf, length, df):
+        """
+        Scores an entry for one of the terms in it.
+
+        Parameters
+        ----------
+        tf : int
+            The number of times the term is in the entry
+        length : int
+            The number of terms in the entry
+        df : int
+            The number of entries with the term
+
+        Returns
+        -------
+        float
+            The entry's score for the term
+        """
+        k1, b = self.k1, self.b
+        idf = to_float(math.log(1 + (self.doc_count - df + 0.5) / (df + 0.5)))
+        weight = to_float(idf * to_float(k1 + 1))
+        norm = to_float(b * round_length(length))
+        norm = to_float(norm / self.avgdl)
+        norm = to_float(k1 * to_float(to_float(1 - b) + norm))
+        return to_float(to_float(weight * tf) / to_float(tf + norm))
+
+class SQLiteDictionaryWriter():
+    """
+    Builds a dictionary file from the entries produced by the ETL
+    process. Entries are indexed by the terms the analyzer splits
+    their inflected forms into. The file is built under a temporary
+    name and only replaces the previous dictionary once it is
+    complete, so that readers never see a partial dictionary.
+    """
+    def __init__(self, path, analyzer):
+        """
+        Initializes the writer.
+
+        Parameters
+        ----------
+        path : str
+            The path of the dictionary file
+        analyzer : Analyzer
+            The analyzer of the dictionary's language
+        """
+        self.path = path
+        self.analyzer = analyzer
+        self.build_path = path + BUILD_SUFFIX
+        if os.path.exists(self.build_path):
+            os.remove(self.build_path)
+
+        self.conn = sqlite3.connect(self.build_path)
+        self.conn.execute("PRAGMA journal_mode = OFF")
+        self.conn.execute("PRAGMA synchronous = OFF")
+        self.conn.execute("""
+            CREATE TABLE entries (
+                id INTEGER PRIMARY KEY,
+                length INTEGER NOT NULL,
+                source TEXT NOT NULL
+            )""")
+        self.conn.execute("""
+            CREATE TABLE words (
+                word TEXT NOT NULL,
+                id INTEGER NOT NULL,
+                tf INTEGER NOT NULL,
+                length INTEGER NOT NULL,
+                word_count INTEGER NOT NULL,
+                score REAL,
+                PRIMARY KEY (word, id)
+            ) WITHOUT ROWID""")
+        self.conn.execute("CREATE TABLE metadata (key TEXT PRIMARY KEY, value TEXT)")
+
+    def close(self):
+        """
+        Scores and indexes the entries and puts the finished
+        dictionary in place of the previous one.
+        """
+        conn = self.conn
+        doc_count, total_length = conn.execute(
+                                               "SELECT COUNT(*), TOTAL(length) FROM entries WHERE length > 0"
+                                              ).fetchone()
+        scorer = BM25Scorer(doc_count, int(total_length))
+        conn.create_function("bm25", 3, scorer.score, deterministic=True)
+        conn.execute("CREATE TEMP TABLE terms (word TEXT PRIMARY KEY, df INTEGER) WITHOUT ROWID")
+        conn.execute("INSERT INTO terms SELECT word, COUNT(*) FROM words GROUP BY word")
+        conn.execute("""
+            UPDATE words SET score = bm25(tf, length, (SELECT df FROM terms WHERE terms.word = words.word))
+            """)
+        conn.execute("CREATE INDEX words_rank ON words (word, score DESC, word_count, id)")
+
+        metadata = [("analyzer", self.analyzer.name), ("version", uuid.uuid4().hex)]
+        conn.executemany("INSERT INTO metadata VALUES (?, ?)", metadata)
+        conn.commit()
+        conn.close()
+        os.replace(self.build_path, self.path)
+
+    def write(self, entries):
+        """
+        Adds entries to the dictionary.
+
+        Parameters
+        ----------
+        entries : iterable
+            The dictionary entries, each with an inflected form, base
+            form, part of speech, definitions and word count
+        """
+        conn = self.conn
+        for entry in entries:
+            source = json.dumps(entry, ensure_ascii=False)
+            terms = Counter(self.analyzer.analyze(entry["inflected_form"]))
+            length = sum(terms.values())
+            cursor = conn.execute("INSERT INTO entries (length, source) VALUES (?, ?)", (length, source))
+            words = []
+            for word, tf in terms.items():
+                words.append((word, cursor.lastrowid, tf, length, entry["word_count"]))
+            conn.executemany("INSERT INTO words (word, id, tf, length, word_count) VALUES (?, ?, ?, ?, ?)", words)
+
+class SQLiteDictionaryStore():
+    """
+    Looks up entries in a dictionary file. Each thread reads over its
+    own read-only connection, which is reopened when the file is
+    replaced by a new build or the process is forked.
+    """
+    def __init__(self, path, analyzer):
+        """
+        Initializes the store.
+
+        Parameters
+        ----------
+        path : str
+            The path of the dictionary file
+        analyzer : Analyzer
+            The analyzer of the dictionary's language, which
+            must be the one the file was built with
+        """
+        self.path = path
+        self.analyzer = analyzer
+        self.local = threading.local()
+
+    def get_connection(self):
+        """
+        Fetches the current thread's connection to the dictionary
+        file, opening it on first use.
+
+        Returns
+        -------
+        Connection
+            The connection to the dictionary file
+        """
+        stat = os.stat(self.path)
+        identity = (os.getpid(), stat.st_ino, stat.st_mtime_ns)
+        local = self.local
+        if getattr(local, "identity", None) != identity:
+            if getattr(local, "conn", None) is not None and local.identity[0] == identity[0]:
+                local.conn.close()
+            uri = "file:" + self.path + "?mode=ro"
+            conn = sqlite3.connect(uri, uri=True)
+            conn.execute("PRAGMA mmap_size = " + str(MMAP_SIZE))
+            row = conn.execute("SELECT value FROM metadata WHERE key = 'analyzer'").fetchone()
+            if row is None or row[0] != self.analyzer.name:
+                conn.close()
+                raise Exception("Dictionary file wasn't built with the " + self.analyzer.name + " analyzer")
+            local.conn = conn
+            local.identity = identity
+        return local.conn
+
+    def get_entries(self, conn, ids):
+        """
+        Fetches entries by their ids.
+
+        Parameters
+        ----------
+        conn : Connection
+            The connection to the dictionary file
+        ids : list
+            The ids of the entries
+
+        Returns
+        -------
+        list
+            The entries, in the order of their ids
+        """
+        rows = conn.execute(
+                            "SELECT id, source FROM entries WHERE id IN (SELECT value FROM json_each(?))",
+                            (json.dumps(ids),)
+                           ).fetchall()
+        sources = dict(rows)
+        return [json.loads(sources[entry_id]) for entry_id in ids]
+
+    def get_version(self):
+        """
+        Fetches the unique identifier of the dictionary's build.
+
+        Returns
+        -------
+        str
+            The unique identifier of the build
+        """
+        conn = self.get_connection()
+        row = conn.execute("SELECT value FROM metadata WHERE key = 'version'").fetchone()
+        return row[0] if row else None
+
+    def rank(self, conn, terms, limit):
+        """
+        Scores the entries with any of several terms, starting from
+        the best scoring entries with each term.
+
+        Parameters
+        ----------
+        conn : Connection
+            The connection to the dictionary file
+        terms : Counter
+            The terms and the number of times each was looked up
+        limit : int
+            The number of best scoring entries read for each term
+
+        Returns
+        -------
+        list
+            The id, score and word count of the entries read, best first
+        tuple
+            The sort key of the last entry that is certain to be placed
+            ahead of every entry that wasn't read, or None if every
+            entry with the terms was read
+        """
+        postings = {}
+        word_counts = {}
+        bound = 0.0
+        last = {}
+        for term, count in terms.items():
+            rows = conn.execute(
+                                "SELECT id, score, word_count FROM words WHERE word = ? ORDER BY score DESC, word_count, id LIMIT ?",
+                                (term, limit)
+                               ).fetchall()
+            postings[term] = {row[0]: row[1] for row in rows}
+            word_counts.update((row[0], row[2]) for row in rows)
+            if len(rows) == limit:
+                bound += count * rows[-1][1]
+                last[term] = rows[-1]
+
+        #Fill in the scores of entries read for one term but not another
+        ids = list(word_counts)
+        for term in last:
+            scores = postings[term]
+            missing = [entry_id for entry_id in ids if entry_id not in scores]
+            if missing:
+                rows = conn.execute(
+                                    "SELECT id, score FROM words WHERE word = ? AND id IN (SELECT value FROM json_each(?))",
+                                    (term, json.dumps(missing))
+                                   ).fetchall()
+                scores.update(rows)
+
+        ranked = []
+        for entry_id in ids:
+            total = 0.0
+            for term, count in terms.items():
+                total += count * postings[term].get(entry_id, 0.0)
+            ranked.append((entry_id, to_float(total), word_counts[entry_id]))
+        ranked.sort(key=lambda entry: (-entry[1], entry[2], entry[0]))
+        if not last:
+            return ranked, None
+
+        #An entry that wasn't read scores at most the bound, and can only
+        #tie with it by tying with the last entry read for each term, in
+        #which case it comes after all of them
+        last_key = max((row[2], row[0]) for row in last.values())
+        return ranked, (-to_float(bound),) + last_key
+
+    def rank_all(self, conn, terms, count):
+        """
+        Scores every entry with any of several terms.
+
+        Parameters
+        ----------
+        conn : Connection
+            The connection to the dictionary file
+        terms : Counter
+            The terms and the number of times each was looked up
+        count : int
+            The number of best scoring entries needed
+
+        Returns
+        -------
+        list
+            The id, score and word count of at least the best scoring
+            entries needed, best first
+        """
+        values = ", ".join(["(?, ?)"] * len(terms))
+        params = []
+        for term, term_count in terms.items():
+            params += [term, term_count]
+        rows = conn.execute(
+                            """
+                            WITH query (word, count) AS (VALUES """ + values + """)
+                            SELECT words.id, SUM(words.score * query.count) AS total, MIN(words.word_count)
+                            FROM query JOIN words ON words.word = query.word
+                            GROUP BY words.id
+                            ORDER BY total DESC
+                            """,
+                            params
+                           )
+
+        #Lucene rounds scores to single precision before breaking ties
+        #by word count, so read on past every entry that may tie
+        ranked = []
+        for entry_id, total, word_count in rows:
+            total = to_float(total)
+            if len(ranked) >= count and total < ranked[-1][1]:
+                break
+            ranked.append((entry_id, total, word_count))
+        ranked.sort(key=lambda entry: (-entry[1], entry[2], entry[0]))
+        return ranked
+
+    def search(self, query, page, size):
+        """
+        Finds the entries matching a query, ranked as Elasticsearch
+        ranks them: by BM25 score over the terms of the query, then
+        fewest words first, then the order they were added in.
+
+        Parameters
+        ----------
+        query : str
+            The text to be looked up
+        page : int
+            The number of the results page
+            in the pagination scheme
+        size : int
+            The number of results per page
+
+        Returns
+        -------
+        list
+            The matching entries on the page
+        """
+        conn = self.get_connection()
+        terms = Counter(self.analyzer.analyze(query))
+        offset = (page - 1) * size
+        if not terms or size <= 0 or offset < 0:
+            return []
+
+        if len(terms) == 1:
+            #Read straight down the term's index in result order
+            rows = conn.execute(
+                                """
+                                SELECT entries.source FROM words
+                                JOIN entries ON entries.id = words.id
+                                WHERE words.word = ?
+                                ORDER BY words.score DESC, words.word_count, words.id
+                                LIMIT ? OFFSET ?
+                                """,
+                                (next(iter(terms)), size, offset)
+                               ).fetchall()
+            return [json.loads(row[0]) for row in rows]
+
+        #Entries placed ahead of the bound are certain to outrank the ones
+        #that weren't read, otherwise every entry with the terms is scored
+        ranked, bound = self.rank(conn, terms, max(MAX_WORD_MATCHES, offset + size))
+        if bound is not None:
+            page_end = ranked[offset + size - 1:offset + size]
+            if not page_end or (-page_end[0][1], page_end[0][2], page_end[0][0]) > bound:
+                ranked = self.rank_all(conn, terms, offset + size)
+
+        ids = [entry[0] for entry in ranked[offset:offset + size]]
+        return self.get_entries(conn, ids)
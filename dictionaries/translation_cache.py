@@ -0,0 +1,326 @@
+import time
+
+from collections import OrderedDict
+from http import HTTPStatus
+from threading import Lock
+
+#Stands in for the index version of a language that hasn't been checked yet
+UNCHECKED = object()
+
+#Statuses of the responses that are kept. Any other status means the
+#lookup failed, and the next request for the query should try again.
+CACHED_STATUSES = (HTTPStatus.OK.value, HTTPStatus.NOT_FOUND.value)
+
+def normalize_query(query):
+    """
+    Reduces a translation query to the form it's cached under. The
+    dictionaries match queries case-insensitively and word by word,
+    so case and extra whitespace don't change the translations.
+
+    Parameters
+    ----------
+    query : str
+        The text to be translated
+
+    Returns
+    -------
+    str
+        The normalized query
+    """
+    return " ".join(query.split()).lower()
+
+class TranslationCache():
+    """
+    Keeps the most recently requested translations, including
+    queries with no translations, so that common words don't go
+    to the dictionary service every time they are looked up.
+    Failed lookups aren't kept. Each process has its own cache,
+    and drops a language's entries when it sees that the
+    language's dictionary index was rebuilt.
+    """
+    def __init__(self, app=None):
+        """
+        Initializes the translation cache.
+
+        Parameters
+        ----------
+        app : Flask
+            The application whose configurations size the cache
+        """
+        self.entries = OrderedDict()
+        self.lock = Lock()
+        self.size = 0
+        self.ttl = 0
+        self.check_interval = 0
+        self.versions = {}
+        self.checked = {}
+        self.reset_stats()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Sizes the cache and empties it.
+
+        Parameters
+        ----------
+        app : Flask
+            The application whose configurations size the cache
+        """
+        with self.lock:
+            self.size = int(app.config["TRANSLATION_CACHE_SIZE"])
+            self.ttl = float(app.config["TRANSLATION_CACHE_TTL"])
+            self.check_interval = float(app.config["TRANSLATION_CACHE_CHECK_INTERVAL"])
+            self.entries.clear()
+            self.versions.clear()
+            self.checked.clear()
+            self.reset_stats()
+
+    def check_version(self, language, dictionary):
+        """
+        Compares the version of a language's dictionary index with
+        the one last seen, at most once per check interval, and drops
+        the language's entries if the index was rebuilt since.
+
+        Parameters
+        ----------
+        language : str
+            The language of the dictionary
+        dictionary : ForeignLanguageDictionary
+            The dictionary to be checked
+        """
+        now = time.monotonic()
+        with self.lock:
+            last_check = self.checked.get(language)
+            if last_check is not None and now - last_check < self.check_interval:
+                return
+            self.checked[language] = now
+
+        try:
+            version = dictionary.get_index_version()
+        except Exception:
+            #Keep the cached translations until the index can be reached
+            return
+
+        with self.lock:
+            previous = self.versions.get(language, UNCHECKED)
+            self.versions[language] = version
+        if previous is not UNCHECKED and previous != version:
+            self.invalidate(language)
+
+    def get_index_version(self, language, dictionary):
+        """
+        Fetches the version of a language's dictionary index as last
+        seen, checking it again if the check interval has passed.
+
+        Parameters
+        ----------
+        language : str
+            The language of the dictionary
+        dictionary : ForeignLanguageDictionary
+            The dictionary to be checked
+
+        Returns
+        -------
+        str
+            The unique identifier of the index, or None if
+            it isn't known
+        """
+        self.check_version(language, dictionary)
+        with self.lock:
+            version = self.versions.get(language)
+        return version
+
+    def get_stats(self):
+        """
+        Fetches the cache's counters.
+
+        Returns
+        -------
+        dict
+            The hits, misses, evictions, expirations and invalidations
+            since the cache was last emptied, along with the number of
+            entries and the most the cache will hold
+        """
+        with self.lock:
+            stats = dict(self.stats)
+            stats["entries"] = len(self.entries)
+            stats["size"] = self.size
+            stats["ttl"] = self.ttl
+        return stats
+
+    def get_translation(self, language, dictionary, query, page, size):
+        """
+        Finds the translations of a query, asking the dictionary only
+        when they aren't cached or the cached ones have expired.
+
+        Parameters
+        ----------
+        language : str
+            The language of the dictionary
+        dictionary : ForeignLanguageDictionary
+            The dictionary to query on a miss
+        query : str
+            The text to be translated
+        page : int
+            The number of the results page
+            in the pagination scheme
+        size : int
+            The number of results per page
+
+        Returns
+        -------
+        json
+            The JSON response containing the answers to
+            the user's query
+        int
+            An HTTP status code
+        """
+        query = normalize_query(query)
+        if self.size <= 0:
+            return dictionary.get_translation(query, page, size)
+
+        self.check_version(language, dictionary)
+        key = (language, query, page, size)
+        with self.lock:
+            response = self.lookup(key)
+        if response is not None:
+            return response
+
+        response = dictionary.get_translation(query, page, size)
+        with self.lock:
+            self.store(key, response)
+        return response
+
+    def get_translations(self, language, dictionary, queries, page, size):
+        """
+        Finds the translations of several queries, asking the
+        dictionary for all of the ones that aren't cached at once.
+
+        Parameters
+        ----------
+        language : str
+            The language of the dictionary
+        dictionary : ForeignLanguageDictionary
+            The dictionary to query on a miss
+        queries : list
+            The pieces of text to be translated
+        page : int
+            The number of the results page
+            in the pagination scheme
+        size : int
+            The number of results per page
+
+        Returns
+        -------
+        dict
+            The JSON response and HTTP status code of each
+            normalized query
+        """
+        queries = list(dict.fromkeys(normalize_query(query) for query in queries))
+        if self.size <= 0:
+            responses = dictionary.get_translations(queries, page, size)
+            return dict(zip(queries, responses))
+
+        self.check_version(language, dictionary)
+        results = {}
+        missing = []
+        with self.lock:
+            for query in queries:
+                response = self.lookup((language, query, page, size))
+                if response is None:
+                    missing.append(query)
+                else:
+                    results[query] = response
+
+        responses = dictionary.get_translations(missing, page, size)
+        with self.lock:
+            for query, response in zip(missing, responses):
+                self.store((language, query, page, size), response)
+                results[query] = response
+        return results
+
+    def invalidate(self, language=None):
+        """
+        Drops the cached translations of a language.
+
+        Parameters
+        ----------
+        language : str
+            The language whose translations are dropped, or
+            None to drop every language's translations
+        """
+        with self.lock:
+            if language is None:
+                count = len(self.entries)
+                self.entries.clear()
+            else:
+                keys = [key for key in self.entries if key[0] == language]
+                count = len(keys)
+                for key in keys:
+                    del self.entries[key]
+            self.stats["invalidations"] += count
+
+    def lookup(self, key):
+        """
+        Fetches a cached translation, counting a hit or a miss.
+        The cache's lock must be held.
+
+        Parameters
+        ----------
+        key : tuple
+            The language, normalized query, page and page size
+
+        Returns
+        -------
+        tuple
+            The cached JSON response and HTTP status code, or
+            None if the translation isn't cached or has expired
+        """
+        entry = self.entries.get(key)
+        if entry is not None:
+            expires, response = entry
+            if self.ttl <= 0 or time.monotonic() < expires:
+                self.entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return response
+            del self.entries[key]
+            self.stats["expirations"] += 1
+        self.stats["misses"] += 1
+        return None
+
+    def reset_stats(self):
+        """
+        Sets the cache's counters back to zero.
+        """
+        self.stats = {
+            "evictions": 0,
+            "expirations": 0,
+            "hits": 0,
+            "invalidations": 0,
+            "misses": 0
+        }
+
+    def store(self, key, response):
+        """
+        Caches a translation, evicting the least recently used
+        ones beyond the cache's size. Responses to failed lookups
+        aren't cached. The cache's lock must be held.
+
+        Parameters
+        ----------
+        key : tuple
+            The language, normalized query, page and page size
+        response : tuple
+            The JSON response and HTTP status code
+        """
+        if response[1] not in CACHED_STATUSES:
+            return
+
+        self.entries[key] = (time.monotonic() + self.ttl, response)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+translation_cache = TranslationCache()
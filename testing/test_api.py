@@ -1,12 +1,43 @@
 import json
 import datetime
+import os
+import tempfile
 
 from base64 import b64encode
 from http import HTTPStatus
 
-from app.models import Book, Page, PageContent, VocabEntry
+from app.content_management.lib.encoding import serialize_page_payload
+from app.content_management.lib.migration import backfill_catalog
+from app.models import Book, CatalogEntry, Page, PageContent, User, VocabEntry
+from dictionaries.backends import DictionaryBackend, ElasticsearchBackend, SQLiteBackend
+from dictionaries.connections import DeleteDictionaryData, GetDictionaryData, PostDictionaryData, UpdateDictionaryData
+from dictionaries.languages.german.german_analyzer import GermanAnalyzer
+from dictionaries.languages.german.german_dictionary import GermanDictionary
+from dictionaries.sqlite_store import SQLiteDictionaryWriter
+from dictionaries.translation_cache import TranslationCache
 from testing.test_base import BaseTest
 
+class FailingBackend(DictionaryBackend):
+    """
+    A dictionary backend whose lookups fail until it is told
+    to recover, counting the lookups it was asked for.
+    """
+    def __init__(self):
+        """
+        Initializes the backend.
+        """
+        self.failing = True
+        self.lookups = 0
+
+    def get_index_version(self):
+        return "1"
+
+    def search(self, query, page, size):
+        self.lookups += 1
+        if self.failing:
+            return None
+        return []
+
 class APITest(BaseTest):
     """
     Contains logic for running any test that interacts with
@@ -140,6 +171,42 @@ class DocumentRetrievalTest(APITest):
         self.assertEqual(int(json_response["page"]), 1)
         self.assertEqual(json_response["content"], self.kant["content"])
 
+    def test_fetch_page_payload(self):
+        """
+        Tests that a page stored with its response body
+        is served as it is.
+        """
+        #Store the response body with the page
+        page = self.hegel["page"]
+        payload = serialize_page_payload(
+                                         self.hegel["book"].title,
+                                         self.hegel["book"].author,
+                                         1,
+                                         self.hegel["content"]["words"],
+                                         self.hegel["content"]["breaks"]
+                                        )
+        page.payload = payload
+        page.save()
+
+        query = {}
+        query["title"] = self.hegel["book"].title
+        query["author"] = self.hegel["book"].author
+        query["page"] = 1
+        query = json.dumps(query, ensure_ascii=False)
+
+        response = self.client.post(
+                                    '/api/v1/document_retrieval/page',
+                                    headers=self.get_headers(self.username, self.password),
+                                    data=query
+                                   )
+
+        self.assertEqual(response.status_code, HTTPStatus.OK.value)
+        self.assertEqual(response.mimetype, "application/json")
+        self.assertEqual(response.get_data(), payload)
+        json_response = json.loads(response.get_data(as_text=True))
+        self.assertEqual(json_response["title"], self.hegel["book"].title)
+        self.assertEqual(json_response["content"], self.hegel["content"])
+
     def test_list_docs(self):
         """
         Tests the list_docs service provided by document_retrieval.
@@ -163,8 +230,35 @@ class DocumentRetrievalTest(APITest):
         #Process response
         self.assertEqual(response.status_code, HTTPStatus.OK.value)
         json_response = json.loads(response.get_data(as_text=True))
-        self.assertIn(kant, json_response["works"])
-        self.assertIn(hegel, json_response["works"])
+        works = json_response["works"]
+        self.assertEqual([{key: work[key] for key in kant} for work in works], [kant, hegel])
+
+        #Add the sample pages, which predate the catalog, to it
+        summary = backfill_catalog()
+        self.assertEqual(summary["created"], 2)
+
+        response = self.client.get(
+                                   '/api/v1/document_retrieval/doc_list',
+                                   headers=self.get_headers(self.username, self.password)
+                                   )
+        self.assertEqual(response.status_code, HTTPStatus.OK.value)
+        json_response = json.loads(response.get_data(as_text=True))
+        works = json_response["works"]
+        self.assertEqual([{key: work[key] for key in kant} for work in works], [kant, hegel])
+        for work in works:
+            self.assertEqual(work["page_count"], 1)
+            self.assertGreater(work["byte_size"], 0)
+            self.assertIsNotNone(work["upload_time"])
+
+        #List the documents a page at a time
+        response = self.client.get(
+                                   '/api/v1/document_retrieval/doc_list?page=2&per_page=1',
+                                   headers=self.get_headers(self.username, self.password)
+                                   )
+        self.assertEqual(response.status_code, HTTPStatus.OK.value)
+        json_response = json.loads(response.get_data(as_text=True))
+        self.assertEqual(json_response["page"], 2)
+        self.assertEqual([work["title"] for work in json_response["works"]], [hegel["title"]])
             
     def test_no_page(self):
         """
@@ -205,6 +299,56 @@ class DocumentRetrievalTest(APITest):
         #Process response
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND.value)
     
+    def test_page_etag(self):
+        """
+        Tests that a page is only sent again when the client's
+        copy is out of date.
+        """
+        page = self.kant["page"]
+        page.content_hash = "kant-hash"
+        page.save()
+
+        query = {}
+        query["title"] = self.kant["book"].title
+        query["author"] = self.kant["book"].author
+        query["page"] = 1
+        query = json.dumps(query, ensure_ascii=False)
+
+        response = self.client.post(
+                                    '/api/v1/document_retrieval/page',
+                                    headers=self.get_headers(self.username, self.password),
+                                    data=query
+                                   )
+        self.assertEqual(response.status_code, HTTPStatus.OK.value)
+        self.assertEqual(response.headers["ETag"], '"kant-hash"')
+        self.assertIn("Cache-Control", response.headers)
+
+        #Revalidate the page the client holds
+        headers = self.get_headers(self.username, self.password)
+        headers["If-None-Match"] = response.headers["ETag"]
+        response = self.client.get(
+                                   '/api/v1/document_retrieval/page',
+                                   headers=headers,
+                                   query_string=json.loads(query)
+                                  )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED.value)
+        self.assertEqual(response.get_data(), b"")
+
+        #A matching tag on a POST is a failed precondition
+        response = self.client.post('/api/v1/document_retrieval/page', headers=headers, data=query)
+        self.assertEqual(response.status_code, HTTPStatus.PRECONDITION_FAILED.value)
+
+        #Revalidate a page that has since changed
+        headers["If-None-Match"] = '"old-hash"'
+        response = self.client.get(
+                                   '/api/v1/document_retrieval/page',
+                                   headers=headers,
+                                   query_string=json.loads(query)
+                                  )
+        self.assertEqual(response.status_code, HTTPStatus.OK.value)
+        json_response = json.loads(response.get_data(as_text=True))
+        self.assertEqual(json_response["content"], self.kant["content"])
+
     def test_page_range(self):
         """
         Tests the page range service provided by document_retrieval.
@@ -264,6 +408,77 @@ class DocumentRetrievalTest(APITest):
         self.assertEqual(json_response["content"][0], self.kant["content"])
         self.assertEqual(json_response["content"][1], new_dict)
 
+    def test_page_range_etag(self):
+        """
+        Tests that a page range is only sent again when the
+        document has changed since the client fetched it.
+        """
+        backfill_catalog()
+        query = {}
+        query["title"] = self.kant["book"].title
+        query["author"] = self.kant["book"].author
+        query["start"] = 1
+        query["end"] = 5
+
+        headers = self.get_headers(self.username, self.password)
+        response = self.client.get('/api/v1/document_retrieval/page_range', headers=headers, query_string=query)
+        self.assertEqual(response.status_code, HTTPStatus.OK.value)
+        self.assertIn("ETag", response.headers)
+
+        #Revalidate the range the client holds
+        headers["If-None-Match"] = response.headers["ETag"]
+        response = self.client.get('/api/v1/document_retrieval/page_range', headers=headers, query_string=query)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED.value)
+
+        #Revalidate the range after the document was changed in place
+        CatalogEntry.objects(
+                             email=self.username,
+                             title=self.kant["book"].title,
+                             author=self.kant["book"].author
+                            ).update_one(inc__revision=1)
+        response = self.client.get('/api/v1/document_retrieval/page_range', headers=headers, query_string=query)
+        self.assertEqual(response.status_code, HTTPStatus.OK.value)
+        json_response = json.loads(response.get_data(as_text=True))
+        self.assertEqual(json_response["content"], [self.kant["content"]])
+
+    def test_page_range_order(self):
+        """
+        Tests that a page range only holds the user's pages,
+        in page order.
+        """
+        #Save later pages first, along with another user's page
+        other = User(email="other@example.com")
+        other.save()
+        for page_number, email in [(3, self.username), (2, self.username), (2, other.email)]:
+            book = Book(
+                        title=self.kant["book"].title,
+                        author=self.kant["book"].author,
+                        language="german",
+                        page_number=page_number
+                       )
+            content = PageContent(words=[[email, str(page_number)]], breaks={})
+            Page(email=email, resource=book, content=content).save()
+
+        query = {}
+        query["title"] = self.kant["book"].title
+        query["author"] = self.kant["book"].author
+        query["start"] = 1
+        query["end"] = 3
+        query = json.dumps(query, ensure_ascii=False)
+
+        response = self.client.post(
+                                    '/api/v1/document_retrieval/page_range',
+                                    headers=self.get_headers(self.username, self.password),
+                                    data=query
+                                   )
+
+        self.assertEqual(response.status_code, HTTPStatus.OK.value)
+        json_response = json.loads(response.get_data(as_text=True))
+        self.assertEqual(len(json_response["content"]), 3)
+        self.assertEqual(json_response["content"][0], self.kant["content"])
+        self.assertEqual(json_response["content"][1]["words"], [[self.username, "2"]])
+        self.assertEqual(json_response["content"][2]["words"], [[self.username, "3"]])
+
 class APISecurityTest(APITest):
     """
     A collection of tests that validate the REST API security infrastructure.
@@ -451,6 +666,234 @@ class TranslationTest(APITest):
         #Process response
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND.value)
 
+    def test_cached_translation(self):
+        """
+        Test that repeating a lookup, even with different case and
+        spacing, is answered from the translation cache.
+        """
+        #Look up the same word twice
+        responses = []
+        for term in ["Häuser", " häuser "]:
+            query = {}
+            query["page"] = 1
+            query["query"] = term
+            query = json.dumps(query, ensure_ascii=False)
+            response = self.client.post(
+                                        '/api/v1/translation/german',
+                                        headers=self.get_headers(self.username, self.password),
+                                        data=query
+                                       )
+            responses.append(response)
+
+        #Process responses
+        self.assertEqual(responses[0].status_code, HTTPStatus.OK.value)
+        self.assertEqual(responses[0].get_data(), responses[1].get_data())
+
+        #Check the cache's counters
+        response = self.client.get(
+                                   '/api/v1/translation/cache',
+                                   headers=self.get_headers(self.username, self.password)
+                                  )
+        self.assertEqual(response.status_code, HTTPStatus.OK.value)
+        stats = json.loads(response.get_data(as_text=True))
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["hits"], 1)
+
+    def test_batch_translation(self):
+        """
+        Test that translating several words at once gives each word
+        the translations it would get on its own.
+        """
+        #Translate a word on its own
+        query = {}
+        query["page"] = 1
+        query["query"] = "Häuser"
+        query = json.dumps(query, ensure_ascii=False)
+        response = self.client.post(
+                                    '/api/v1/translation/german',
+                                    headers=self.get_headers(self.username, self.password),
+                                    data=query
+                                   )
+        self.assertEqual(response.status_code, HTTPStatus.OK.value)
+        single = json.loads(response.get_data(as_text=True))["translations"]
+
+        #Translate it along with other words
+        query = {}
+        query["queries"] = ["Häuser", "lieferbare Bücher", "fsdgdfsgdfgf"]
+        query = json.dumps(query, ensure_ascii=False)
+        response = self.client.post(
+                                    '/api/v1/translation/german/batch',
+                                    headers=self.get_headers(self.username, self.password),
+                                    data=query
+                                   )
+
+        #Process response
+        self.assertEqual(response.status_code, HTTPStatus.OK.value)
+        translations = json.loads(response.get_data(as_text=True))["translations"]
+        self.assertEqual(translations["Häuser"], single)
+        self.assertEqual(translations["lieferbare Bücher"][0]["definition"], "books in print")
+        self.assertEqual(translations["fsdgdfsgdfgf"], [])
+        self.assertEqual(json.loads(response.get_data(as_text=True))["failed"], [])
+
+    def test_failed_batch_translation(self):
+        """
+        Test that text whose lookup failed is reported apart
+        from text that has no translations.
+        """
+        dict_manager = self.app.config["DICTIONARY_MANAGER"]
+        self.addCleanup(setattr, dict_manager, "dictionaries", dict_manager.get_dictionaries())
+        backend = FailingBackend()
+        dict_manager.dictionaries = {"german": (lambda: GermanDictionary(backend))}
+
+        query = {}
+        query["queries"] = ["Häuser"]
+        response = self.client.post(
+                                    '/api/v1/translation/german/batch',
+                                    headers=self.get_headers(self.username, self.password),
+                                    data=json.dumps(query, ensure_ascii=False)
+                                   )
+        self.assertEqual(response.status_code, HTTPStatus.OK.value)
+        json_response = json.loads(response.get_data(as_text=True))
+        self.assertEqual(json_response["translations"], {})
+        self.assertEqual(json_response["failed"], ["Häuser"])
+
+        #A page that isn't a number is a bad request
+        query["page"] = "zwei"
+        response = self.client.post(
+                                    '/api/v1/translation/german/batch',
+                                    headers=self.get_headers(self.username, self.password),
+                                    data=json.dumps(query, ensure_ascii=False)
+                                   )
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST.value)
+
+    def test_failed_translation(self):
+        """
+        Test that a failed dictionary lookup is reported as an
+        error and isn't cached in place of the translations.
+        """
+        backend = FailingBackend()
+        dictionary = GermanDictionary(backend)
+        cache = TranslationCache(self.app)
+
+        #A failed lookup should be an error and be tried again
+        response = cache.get_translation("german", dictionary, "Häuser", 1, 10)
+        self.assertEqual(response[1], HTTPStatus.SERVICE_UNAVAILABLE.value)
+        responses = cache.get_translations("german", dictionary, ["Häuser"], 1, 10)
+        self.assertEqual(responses["häuser"][1], HTTPStatus.SERVICE_UNAVAILABLE.value)
+        self.assertEqual(backend.lookups, 2)
+
+        #A word with no translations should be cached
+        backend.failing = False
+        for i in range(2):
+            response = cache.get_translation("german", dictionary, "Häuser", 1, 10)
+            self.assertEqual(response[1], HTTPStatus.NOT_FOUND.value)
+        self.assertEqual(backend.lookups, 3)
+
+    def create_parity_dictionaries(self, entries):
+        """
+        Indexes dictionary entries in a new Elasticsearch index,
+        analyzed as the German index is, and builds a dictionary
+        file from the same entries.
+
+        Parameters
+        ----------
+        entries : list
+            The dictionary entries
+
+        Returns
+        -------
+        GermanDictionary
+            The dictionary backed by the Elasticsearch index
+        GermanDictionary
+            The dictionary backed by the dictionary file
+        """
+        route = self.app.config["DICTIONARY_MANAGER"].get_routes()["default"]
+        index_name = "german_parity_test"
+        DeleteDictionaryData().request(route + "/" + index_name)
+        self.addCleanup(DeleteDictionaryData().request, route + "/" + index_name)
+
+        #A single shard, so that every entry is scored against the same statistics
+        properties = {}
+        properties["base_form"] = {"type": "text", "analyzer": "german"}
+        properties["definitions"] = {"type": "text"}
+        properties["inflected_form"] = {"type": "text", "analyzer": "german"}
+        properties["pos"] = {"type": "text"}
+        properties["word_count"] = {"type": "short"}
+        index = {}
+        index["settings"] = {"number_of_shards": 1}
+        index["mappings"] = {"properties": properties}
+        params = {}
+        params["headers"] = {'Content-Type': 'application/json'}
+        params["data"] = json.dumps(index)
+        UpdateDictionaryData().request(route + "/" + index_name, params)
+
+        lines = []
+        for entry in entries:
+            lines.append(json.dumps({"index": {}}))
+            lines.append(json.dumps(entry, ensure_ascii=False))
+        params = {}
+        params["headers"] = {'Content-Type': 'application/x-ndjson'}
+        params["data"] = ("\n".join(lines) + "\n").encode('utf-8')
+        PostDictionaryData().request(route + "/" + index_name + "/_doc/_bulk?refresh=true", params)
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "german.sqlite")
+        writer = SQLiteDictionaryWriter(path, GermanAnalyzer())
+        writer.write(entries)
+        writer.close()
+
+        es_dictionary = GermanDictionary(ElasticsearchBackend(route, index_name))
+        sqlite_dictionary = GermanDictionary(SQLiteBackend(path, GermanAnalyzer()))
+        return es_dictionary, sqlite_dictionary
+
+    def test_sqlite_analyzer(self):
+        """
+        Test that dictionary files split text into the same
+        terms as Elasticsearch's german analyzer.
+        """
+        route = self.app.config["DICTIONARY_MANAGER"].get_routes()["default"]
+        texts = ["Häuser", "Haeuser", "Hauser", "Mitarbeiterinnen", "der und die"]
+        texts += ["lieferbare Bücher", "Weißbier", "Schildkröten", "Quelle", "z.B. 3,5 Kilo"]
+        texts += ["Tisch Tische Tischen", "geht's", "Straße", "Blauer", "Kunst-Ausstellung"]
+        analyzer = GermanAnalyzer()
+        for text in texts:
+            params = {}
+            params["headers"] = {'Content-Type': 'application/json'}
+            params["data"] = json.dumps({"analyzer": "german", "text": text})
+            response = GetDictionaryData().request(route + "/_analyze", params)
+            tokens = [token["token"] for token in json.loads(response.text)["tokens"]]
+            self.assertEqual(analyzer.analyze(text), tokens, text)
+
+    def test_sqlite_parity(self):
+        """
+        Test that a dictionary file answers exact and inflected
+        lookups exactly as the Elasticsearch index does.
+        """
+        forms = [("Haus", "Haus"), ("Häuser", "Haus"), ("Hauses", "Haus"), ("Haus und Hof", "Haus und Hof")]
+        forms += [("Tisch", "Tisch"), ("Tische", "Tisch"), ("Tischen", "Tisch"), ("der Tisch", "Tisch")]
+        forms += [("der", "der"), ("und", "und"), ("lieferbare Bücher", "lieferbare Bücher")]
+        forms += [("Buch", "Buch"), ("Bücher", "Buch"), ("Weißbier", "Weißbier"), ("Weissbier", "Weißbier")]
+        forms += [("Mitarbeiterin", "Mitarbeiterin"), ("Mitarbeiterinnen", "Mitarbeiterin")]
+        forms += [("Haus " + str(i), "Haus") for i in range(8)]
+        entries = []
+        for i, (inflected_form, base_form) in enumerate(forms):
+            entry = {}
+            entry["inflected_form"] = inflected_form
+            entry["base_form"] = base_form
+            entry["pos"] = "noun"
+            entry["definitions"] = ["definition " + str(i)]
+            entry["word_count"] = len(inflected_form.split())
+            entries.append(entry)
+        es_dictionary, sqlite_dictionary = self.create_parity_dictionaries(entries)
+
+        queries = [form[0] for form in forms] + ["Hauser", "Haeuser", "HÄUSER", "Tisches", "der und"]
+        queries += ["Bücher lieferbar", "Haus Tisch", "fsdgdfsgdfgf"]
+        for query in queries:
+            for page in [1, 2]:
+                expected = es_dictionary.get_translation(query, page, 5)
+                self.assertEqual(sqlite_dictionary.get_translation(query, page, 5), expected, query)
+
 class VocabularyAcquisitionTest(APITest):
     """
     A collection of tests for validating the vocab_acquisition service.
@@ -1,12 +1,103 @@
+import io
 import os
+import tarfile
+import tempfile
 import unittest
+import zipfile
 
 import yaml
 
+from werkzeug.datastructures import FileStorage
+
+from app.content_management.lib.bulk_import import BulkImporter
+from app.content_management.lib.encoding import COMPRESSED, PACKED, get_content
+from app.content_management.lib.jobs import UploadJobManager
+from app.content_management.lib.reflow import ReflowedDocument
 from app.content_management.lib.resources import create_book
-from app.content_management.lib.upload import DocumentUploader
-from app.models import Page
+from app.content_management.lib.token_stream import find_token_stream
+from app.content_management.lib.translation_table import find_translations
+from app.content_management.lib.upload import DocumentUploader, IncrementalDocumentUploader, PipelinedDocumentUploader
+from app.models import Book, CatalogEntry, CompressionDictionary, Page, PageContent, TranslationEntry
 from testing.test_base import BaseTest
+from text_processing.tokenizers.mapper import RegexLanguage
+from text_processing.tokenizers.standard import Tokenizer
+
+class GeneratedStream():
+    """
+    A file-like upload whose contents are generated as they are read,
+    including multi-byte characters and a line too long to keep whole.
+    """
+    def __init__(self, blocks):
+        """
+        Initializes the stream.
+
+        Parameters
+        ----------
+        blocks : int
+            The number of times the generated text is repeated
+        """
+        line = "Habe Mut, dich deines eigenen Verstandes zu bedienen. Größe über Straßen.\n"
+        block = line * 100 + "Aufklärung " * 3000 + "\n\n"
+        self.block = block.encode("utf-8")
+        self.offset = 0
+        self.remaining = blocks * len(self.block)
+
+    def read(self, size):
+        """
+        Reads the next bytes of the stream.
+
+        Parameters
+        ----------
+        size : int
+            The maximum number of bytes to read
+
+        Returns
+        -------
+        bytes
+            The bytes read, which are empty at the end of the stream
+        """
+        size = min(size, self.remaining)
+        chunk = self.block[self.offset:self.offset + size]
+        self.offset = (self.offset + len(chunk)) % len(self.block)
+        self.remaining -= len(chunk)
+        return chunk
+
+class StaticDictionary():
+    """
+    A dictionary that translates every word to itself and keeps
+    count of the words it was asked to translate, standing in for
+    both the dictionary manager and the dictionary it manages.
+    """
+    def __init__(self, failing=None):
+        """
+        Initializes the dictionary.
+
+        Parameters
+        ----------
+        failing : str
+            A word whose lookup fails, if any
+        """
+        self.lookups = []
+        self.failing = failing
+
+    def get_dictionary(self, language):
+        return self
+
+    def get_index_version(self):
+        return "1"
+
+    def get_translations(self, queries, page, size):
+        self.lookups += queries
+        responses = []
+        for query in queries:
+            if query == self.failing:
+                responses.append(('{"text": "The dictionary is unavailable"}', 503))
+            else:
+                responses.append(('{"translations": ["' + query + '"]}', 200))
+        return responses
+
+    def has_dictionary(self, language):
+        return True
 
 class DocumentManagementTest(BaseTest):
     """
@@ -16,6 +107,19 @@ class DocumentManagementTest(BaseTest):
     __test__ = True
     __language__ = "german"
 
+    def get_resident_memory(self):
+        """
+        Measures the memory of the test process held in RAM.
+
+        Returns
+        -------
+        int
+            The resident memory in bytes
+        """
+        with open("/proc/self/statm") as statm:
+            pages = int(statm.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE")
+
     def init_documents(self, language):
         """
         Sets up documents to be used in test suite.
@@ -60,6 +164,33 @@ class DocumentManagementTest(BaseTest):
                     print(e)
                     raise Exception("Couldn't load test document " + document)
         
+    def get_pages(self, document):
+        """
+        Fetches the pages of the published version of a document.
+
+        Parameters
+        ----------
+        document : dict
+            The uploaded document
+
+        Returns
+        -------
+        QuerySet
+            The document's pages, ordered by page number
+        """
+        entry = CatalogEntry.objects(
+                                     email=self.username,
+                                     title=document["title"],
+                                     author=document["author"]
+                                    ).first()
+        pages = Page.objects(
+                             email=self.username,
+                             resource__title=document["title"],
+                             resource__author=document["author"],
+                             version=entry.version
+                            )
+        return pages.order_by('resource__page_number')
+
     def init_uploader(self, language):
         """
         Sets up the DocumentUpload object to be tested
@@ -93,6 +224,108 @@ class DocumentManagementTest(BaseTest):
         self.init_documents(language)
         self.init_uploader(language)
     
+    def test_background_upload(self):
+        """
+        Tests that an upload job saves the document and
+        reports its progress.
+        """
+
+        #Submit document to the background workers
+        document = dict(self.doc[self.metadata["load_multi_page"]])
+        text = "".join(document["file"]).encode("utf-8")
+        document["file"] = FileStorage(stream=io.BytesIO(text))
+        upload_jobs = UploadJobManager(self.app)
+        self.addCleanup(upload_jobs.executor.shutdown)
+        job = upload_jobs.submit(self.doc_uploader, document)
+
+        #Wait for the upload to finish
+        upload_jobs.executor.shutdown(wait=True)
+
+        #The saved progress should be reported, and the caller's uploader left alone
+        self.assertNotIn("monitor", self.doc_uploader.params)
+        report = upload_jobs.get_job(job.job_id).report()
+        self.assertEqual(report["status"], "complete")
+        self.assertEqual(report["errors"], [])
+        self.assertEqual(report["pages_written"], 4)
+
+        pages = Page.objects(
+                             email=self.username,
+                             resource__title=document["title"],
+                             resource__author=document["author"]
+                            )
+        self.assertEqual(pages.count(), 4)
+
+    def test_bulk_import(self):
+        """
+        Tests that every document in an archive is imported
+        and reported on.
+        """
+
+        #Build an archive from the test documents
+        names = ["load_multi_page", "load_single_page"]
+        manifest = {}
+        archive_path = os.path.join(tempfile.mkdtemp(), "documents.zip")
+        with zipfile.ZipFile(archive_path, 'w') as archive:
+            for name in names:
+                document = self.doc[self.metadata[name]]
+                archive.writestr(name + ".txt", "".join(document["file"]))
+                manifest[name + ".txt"] = {"title": document["title"], "author": document["author"]}
+            manifest["missing.txt"] = {"title": "Missing", "author": "Nobody"}
+            archive.writestr("manifest.yaml", yaml.safe_dump(manifest))
+
+        #Import the archive
+        importer = BulkImporter(self.params, self.app.config["TOKENIZER"], 2)
+        report = importer.upload({"file": archive_path, "language": self.__language__})
+        os.remove(archive_path)
+
+        self.assertEqual(report["documents_total"], 3)
+        self.assertEqual(report["documents_complete"], 2)
+        self.assertEqual(report["documents_failed"], 1)
+
+        for name in names:
+            document = self.doc[self.metadata[name]]
+            pages = Page.objects(
+                                 email=self.username,
+                                 resource__title=document["title"],
+                                 resource__author=document["author"]
+                                )
+            self.assertGreater(pages.count(), 0)
+
+    def test_bulk_import_tar(self):
+        """
+        Tests that a tar archive whose file names start with "./",
+        as tar stores them when archiving a directory, is imported.
+        """
+
+        #Build an archive from the test documents
+        document = self.doc[self.metadata["load_single_page"]]
+        manifest = {"single.txt": {"title": document["title"], "author": document["author"]}}
+        files = {
+            "./single.txt": "".join(document["file"]),
+            "./manifest.yaml": yaml.safe_dump(manifest)
+        }
+        archive_path = os.path.join(tempfile.mkdtemp(), "documents.tar")
+        with tarfile.open(archive_path, 'w') as archive:
+            for name, text in files.items():
+                data = text.encode('utf-8')
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                archive.addfile(info, io.BytesIO(data))
+
+        #Import the archive
+        importer = BulkImporter(self.params, self.app.config["TOKENIZER"], 2)
+        report = importer.upload({"file": archive_path, "language": self.__language__})
+        os.remove(archive_path)
+
+        self.assertEqual(report["documents_total"], 1)
+        self.assertEqual(report["documents_complete"], 1)
+        pages = Page.objects(
+                             email=self.username,
+                             resource__title=document["title"],
+                             resource__author=document["author"]
+                            )
+        self.assertGreater(pages.count(), 0)
+
     def test_blank_line(self):
         """
         Tests that a document with a blank line
@@ -125,6 +358,24 @@ class DocumentManagementTest(BaseTest):
         last_line = ["zuwissen", " "]
         self.assertEqual(content.words[2][0:2], last_line)
 
+    def test_catalog_backfill(self):
+        """
+        Tests that the user's first upload adds the documents
+        they saved before the catalog to it.
+        """
+
+        #Save a document that predates the catalog
+        book = Book(title="Frühere Schrift", author="Unbekannt", language=self.__language__, page_number=1)
+        content = PageContent(words=[["Habe ", "Mut"]], breaks={})
+        Page(email=self.username, resource=book, content=content).save()
+
+        #Upload document
+        document = self.doc[self.metadata["load_single_page"]]
+        self.doc_uploader.upload(document)
+
+        titles = [entry.title for entry in CatalogEntry.objects(email=self.username).order_by('title')]
+        self.assertEqual(titles, sorted([book.title, document["title"]]))
+
     def test_cleanup(self):
         """
         Tests that a document can be successfully deleted.
@@ -161,6 +412,85 @@ class DocumentManagementTest(BaseTest):
         
         self.assertFalse(has_pages)
 
+    def test_compressed_storage(self):
+        """
+        Tests that pages compressed with a trained dictionary
+        decode to the same content as the standard format.
+        """
+
+        document = self.doc[self.metadata["load_multi_page"]]
+
+        #Upload document in the standard format
+        self.doc_uploader.upload(document)
+        pages = self.get_pages(document)
+        expected = [{"words": page.content.words, "breaks": page.content.breaks} for page in pages]
+
+        #Upload document in the compressed format
+        params = dict(self.params)
+        params["storage_format"] = COMPRESSED
+        params["compression"] = {"codec": "zlib", "level": 9, "train": 1}
+        DocumentUploader(params).upload(document)
+        pages = self.get_pages(document)
+        actual = []
+        for page in pages:
+            self.assertEqual(page.content.encoding, COMPRESSED)
+            self.assertTrue(page.content.dictionary)
+            actual.append(get_content(page.content, page.resource.page_number))
+
+        self.assertEqual(actual, expected)
+
+        #Re-uploading incrementally should keep the version's dictionary
+        IncrementalDocumentUploader(params).upload(document)
+        dictionaries = CompressionDictionary.objects(
+                                                     email=self.username,
+                                                     title=document["title"],
+                                                     author=document["author"],
+                                                     version=pages.first().version
+                                                    )
+        self.assertEqual(dictionaries.count(), 1)
+
+    def test_incremental_upload(self):
+        """
+        Tests that re-uploading a document only writes
+        the pages that changed.
+        """
+
+        #Upload document
+        document = self.doc[self.metadata["load_multi_page"]]
+        self.doc_uploader.upload(document)
+
+        #Re-upload unchanged document
+        incremental_uploader = IncrementalDocumentUploader(self.params)
+        summary = incremental_uploader.upload(document)
+        self.assertEqual(summary["unchanged"], 4)
+        self.assertEqual(summary["inserted"], 0)
+        self.assertEqual(summary["updated"], 0)
+        self.assertEqual(summary["deleted"], 0)
+
+        #Re-upload a document with a page stored twice
+        duplicate = self.get_pages(document).as_pymongo().first()
+        del duplicate["_id"]
+        Page._get_collection().insert_one(duplicate)
+        summary = incremental_uploader.upload(document)
+        self.assertEqual(summary["unchanged"], 4)
+        self.assertEqual(summary["deleted"], 1)
+        page_numbers = [page.resource.page_number for page in self.get_pages(document)]
+        self.assertEqual(page_numbers, [1, 2, 3, 4])
+
+        #Re-upload shortened document
+        shortened = dict(document)
+        shortened["file"] = document["file"][:1]
+        incremental_uploader.upload(shortened)
+
+        pages = self.get_pages(document)
+        actual = [page.content.to_mongo() for page in pages]
+
+        #Compare with a full upload of the shortened document
+        self.doc_uploader.upload(shortened)
+        pages = self.get_pages(document)
+        expected = [page.content.to_mongo() for page in pages]
+        self.assertEqual(actual, expected)
+
     def test_line_break(self):
         """
         Tests that a word which has to be split across
@@ -215,6 +545,16 @@ class DocumentManagementTest(BaseTest):
         has_correct_count = (count == 4)
         self.assertTrue(has_correct_count) 
 
+        #Check the catalog describes the document
+        entry = CatalogEntry.objects(
+                                     email=self.username,
+                                     title=document["title"],
+                                     author=document["author"]
+                                    ).first()
+        self.assertEqual(entry.page_count, 4)
+        self.assertEqual(entry.byte_size, len("".join(document["file"]).encode('utf-8')))
+        self.assertIsNotNone(entry.upload_time)
+
     def test_load_single_page(self):
         """
         Tests that a single page can be loaded properly.
@@ -310,6 +650,32 @@ class DocumentManagementTest(BaseTest):
         self.assertEqual(content.breaks["start"][1], 2)
         self.assertEqual(content.breaks["tokens"][2]["fulltext"], " ")
 
+    def test_packed_storage(self):
+        """
+        Tests that pages saved in the packed storage format
+        decode to the same content as the standard format.
+        """
+
+        for name in ["line_break", "load_multi_page", "page_boundaries"]:
+            document = self.doc[self.metadata[name]]
+
+            #Upload document in the standard format
+            self.doc_uploader.upload(document)
+            pages = self.get_pages(document)
+            expected = [{"words": page.content.words, "breaks": page.content.breaks} for page in pages]
+
+            #Upload document in the packed format
+            params = dict(self.params)
+            params["storage_format"] = PACKED
+            DocumentUploader(params).upload(document)
+            pages = self.get_pages(document)
+            actual = []
+            for page in pages:
+                self.assertEqual(page.content.encoding, PACKED)
+                actual.append(get_content(page.content, page.resource.page_number))
+
+            self.assertEqual(actual, expected)
+
     def test_page_content_multi_line(self):
         """
         Tests that a page with multiple lines
@@ -378,6 +744,59 @@ class DocumentManagementTest(BaseTest):
         self.assertLessEqual(3, len(content.words[0]))
         self.assertEqual(content.words[0][2], "Welt")
     
+    def test_parallel_upload(self):
+        """
+        Tests that tokenizing a document across worker processes
+        saves exactly the same pages as the serial upload.
+        """
+
+        for name in ["blank_line", "load_multi_page", "page_boundaries", "offset"]:
+            document = self.doc[self.metadata[name]]
+
+            #Upload document serially
+            self.doc_uploader.upload(document)
+            pages = self.get_pages(document)
+            expected = [page.to_mongo() for page in pages]
+            for page in expected:
+                del page["_id"]
+                del page["version"]
+
+            #Upload document with one line per chunk
+            params = dict(self.params)
+            params["processes"] = 2
+            params["chunk_size"] = 1
+            DocumentUploader(params).upload(document)
+            pages = self.get_pages(document)
+            actual = [page.to_mongo() for page in pages]
+            for page in actual:
+                del page["_id"]
+                del page["version"]
+
+            self.assertEqual(actual, expected)
+
+    def test_pipelined_upload(self):
+        """
+        Tests that uploading with writer threads saves the
+        same pages as the serial upload.
+        """
+
+        #Upload document serially
+        document = self.doc[self.metadata["load_multi_page"]]
+        self.doc_uploader.upload(document)
+
+        pages = self.get_pages(document)
+        expected = [page.content.to_mongo() for page in pages]
+
+        #Upload document with writer threads
+        params = dict(self.params)
+        params["writers"] = 2
+        params["queue_size"] = 1
+        PipelinedDocumentUploader(params).upload(document)
+
+        pages = self.get_pages(document)
+        actual = [page.content.to_mongo() for page in pages]
+        self.assertEqual(actual, expected)
+
     def test_prev_page_pointer(self):
         """
         Tests that the JSON representation of a page of text
@@ -420,6 +839,110 @@ class DocumentManagementTest(BaseTest):
         }
         self.assertEqual(page_boundaries["previous"], test_pointer)
     
+    def test_reflow_layout(self):
+        """
+        Tests that pages laid out from a stored token stream match
+        the pages of an upload with the same layout.
+        """
+
+        document = self.doc[self.metadata["load_multi_page"]]
+        line_size = int(self.params["line_size"]) + 7
+        page_limit = int(self.params["new_page"]) + 3
+
+        #Upload document with the other layout
+        params = dict(self.params)
+        params["line_size"] = line_size
+        params["new_page"] = page_limit
+        DocumentUploader(params).upload(document)
+        pages = self.get_pages(document)
+        expected = [{"words": page.content.words, "breaks": page.content.breaks} for page in pages]
+
+        #Upload document with its token stream and lay it out again
+        params = dict(self.params)
+        params["store_tokens"] = 1
+        DocumentUploader(params).upload(document)
+        entry = CatalogEntry.objects(
+                                     email=self.username,
+                                     title=document["title"],
+                                     author=document["author"]
+                                    ).first()
+        stream = find_token_stream(self.username, document["title"], document["author"], entry.version)
+        self.assertIsNotNone(stream)
+
+        reflowed = ReflowedDocument(stream, self.params["tokenizer"], line_size, page_limit)
+        actual = [content for page_num, content in reflowed.get_pages(1, len(expected) + 1)]
+        self.assertEqual(actual, expected)
+
+    @unittest.skipUnless(os.path.exists("/proc/self/statm"), "Resident memory can't be read")
+    def test_streaming_memory(self):
+        """
+        Tests that laying out a streamed upload keeps its memory
+        under a fixed ceiling however long the document is. The
+        document is 16MB rather than the 200MB of a very large upload
+        to keep the test quick, which is still twice the ceiling, so
+        holding on to its text, let alone its pages, fails the test.
+        """
+
+        #Lay out pages without saving them, once to warm up
+        params = dict(self.params)
+        params["tokenizer"] = Tokenizer(RegexLanguage(self.__language__))
+        params["line_size"] = 50
+        params["new_page"] = 30
+        params["batch_size"] = 10
+        doc_uploader = DocumentUploader(params)
+        document = {
+            "title": "Generated",
+            "author": "Generated",
+            "language": self.__language__,
+            "file": GeneratedStream(1)
+        }
+        for batch in doc_uploader.get_batches(document):
+            pass
+
+        #Measure the resident memory after each batch
+        size = 16 * 2**20
+        ceiling = 8 * 2**20
+        stream = GeneratedStream(size // len(GeneratedStream(1).block))
+        document["file"] = stream
+        start = self.get_resident_memory()
+        peak = start
+        for batch in doc_uploader.get_batches(document):
+            peak = max(peak, self.get_resident_memory())
+
+        self.assertEqual(stream.remaining, 0)
+        self.assertGreater(doc_uploader.stats["pages"], 10000)
+        self.assertLess(peak - start, ceiling)
+
+    def test_versioned_replacement(self):
+        """
+        Tests that re-uploading a document publishes the new
+        version and removes the old one.
+        """
+
+        #Upload document twice
+        document = self.doc[self.metadata["load_multi_page"]]
+        self.doc_uploader.upload(document)
+        first_version = self.get_pages(document).first().version
+        self.doc_uploader.upload(document)
+        self.doc_uploader.collector.join()
+
+        entry = CatalogEntry.objects(
+                                     email=self.username,
+                                     title=document["title"],
+                                     author=document["author"]
+                                    ).first()
+        self.assertNotEqual(entry.version, first_version)
+        self.assertEqual(entry.stale_versions, [])
+
+        #Only the published version should remain
+        pages = Page.objects(
+                             email=self.username,
+                             resource__title=document["title"],
+                             resource__author=document["author"]
+                            )
+        self.assertEqual(pages.count(), 4)
+        self.assertEqual(set(pages.distinct('version')), {entry.version})
+
     def test_token_offset(self):
         """
         Tests the tokenizer when starting from
@@ -449,4 +972,57 @@ class DocumentManagementTest(BaseTest):
             ['Habe', ' ', 'Mut', ' ', 'z-'],
             ['u', ' ', 'wissen', ' ']
         ]
-        self.assertEqual(content["words"], expected)
\ No newline at end of file
+        self.assertEqual(content["words"], expected)
+
+    def test_translation_table(self):
+        """
+        Tests that every distinct word of a document is translated
+        once at upload and saved in the document's translation table.
+        """
+        #Upload document with its words translated
+        document = self.doc[self.metadata["offset"]]
+        dictionary = StaticDictionary()
+        params = dict(self.params)
+        params["translate"] = 1
+        params["dictionaries"] = dictionary
+        params["translation_size"] = 5
+        params["translation_batch_size"] = 2
+        DocumentUploader(params).upload(document)
+
+        #Each word should have been looked up once
+        self.assertEqual(sorted(dictionary.lookups), sorted(set(dictionary.lookups)))
+        self.assertIn("habe", dictionary.lookups)
+
+        entry = CatalogEntry.objects(
+                                     email=self.username,
+                                     title=document["title"],
+                                     author=document["author"]
+                                    ).first()
+        table = find_translations(
+                                  self.username,
+                                  document["title"],
+                                  document["author"],
+                                  entry.version,
+                                  ["habe", "baum"],
+                                  5,
+                                  "1"
+                                 )
+        self.assertEqual(table, {"habe": ('{"translations": ["habe"]}', 200)})
+
+        #The table should be ignored once the dictionary is rebuilt
+        table = find_translations(
+                                  self.username,
+                                  document["title"],
+                                  document["author"],
+                                  entry.version,
+                                  ["habe"],
+                                  5,
+                                  "2"
+                                 )
+        self.assertEqual(table, {})
+
+        #A failed lookup should leave the document without a table
+        params["dictionaries"] = StaticDictionary(failing="habe")
+        DocumentUploader(params).upload(document)
+        entry.reload()
+        self.assertEqual(TranslationEntry.objects(version=entry.version).count(), 0)
@@ -0,0 +1,126 @@
+import gc
+import os
+
+from app.preload import preload
+from testing.test_base import BaseTest
+from text_processing.tokenizers.mapper import RegexLanguage, StandardLanguage, TokenizerMapper
+from text_processing.tokenizers.standard import Tokenizer
+
+class TokenizerTest(BaseTest):
+    """
+    Verifies that the regex tokenizer engine splits
+    text exactly like NLTK.
+    """
+    __test__ = True
+    __language__ = "german"
+
+    #Lines covering the cases that NLTK treats specially
+    __lines__ = [
+        "Habe Mut, dich deines eigenen Verstandes zu bedienen!\n",
+        "Er kam z.B. am 3. Januar, ca. um 10.30 Uhr.\n",
+        "„Was ist Aufklärung?“ fragte er – und schwieg.\n",
+        "Sie sagte: \"Ich gehe\", dann ging sie... Ende.\n",
+        "I cannot go, it's late and we're gonna leave.\n",
+        "Die Donau-Dampfschifffahrt (gegründet 1829) fährt [heute] noch.\n",
+        "Preis: 50% von $3,50 & mehr * Sterne; E-Mail @home #1\n",
+        "Dr. Müller wohnt in der St. Georgstraße usw. Dann kam J. S. Bach.\n",
+        "Ende. Anfang! Mitte? Schluss.\n",
+        "Sie wohnt im Haus.\t) Er nicht.\xa0Ja. Gut.\n",
+        "Er ging hinaus. \u201c\n",
+        "Er ging hinaus. \xab\n",
+        "\n"
+    ]
+
+    def compare(self, language, lines):
+        """
+        Checks that both engines produce the same tokens.
+
+        Parameters
+        ----------
+        language : str
+            The language of the text
+        lines : iterable
+            The lines to be tokenized
+        """
+        standard = StandardLanguage(language)
+        regex = RegexLanguage(language)
+        for line in lines:
+            self.assertEqual(regex.tokenize(line), standard.tokenize(line), line)
+
+    def test_block_tokenization(self):
+        """
+        Tests that tokenizing lines in blocks lays them out
+        the same as tokenizing them one at a time.
+        """
+        tokenizer = Tokenizer(RegexLanguage(self.__language__))
+        lines = self.__lines__ * 20
+
+        expected = []
+        offset = 0
+        for line in lines:
+            if line == "\n":
+                offset = 0
+                expected.append(None)
+                continue
+            tokens, offset = tokenizer.layout(tokenizer.convert(line), 30, offset, 5)
+            expected.append(tokens)
+
+        for block_size in [1, 100, 100000]:
+            tokenized = tokenizer.tokenize_lines(lines, 30, padding=5, block_size=block_size)
+            self.assertEqual(list(tokenized), expected)
+
+    def test_document_equivalence(self):
+        """
+        Tests that the engines agree on the test documents.
+        """
+        doc_dir = self.app.config["TEST_DOCUMENT_UPLOAD"]["doc_location"]
+        for document in os.scandir(doc_dir):
+            if document.name.endswith(".txt"):
+                with open(document.path, 'r') as d:
+                    self.compare(self.__language__, d.readlines())
+
+    def test_lazy_initialization(self):
+        """
+        Tests that the mapper only builds its tokenizers
+        once one is selected.
+        """
+        mapper = TokenizerMapper()
+        self.assertIsNone(mapper.tokenizers)
+
+        tokenizer = mapper.select(self.__language__)
+        self.assertIs(mapper.select(self.__language__), tokenizer)
+
+    def test_line_equivalence(self):
+        """
+        Tests that the engines agree on lines with quotes,
+        abbreviations, numbers and contractions.
+        """
+        for language in ["english", "german"]:
+            self.compare(language, self.__lines__)
+
+    def test_preload(self):
+        """
+        Tests that preloading builds the tokenizers
+        and reports the memory used.
+        """
+        try:
+            report = preload(self.app)
+        finally:
+            gc.unfreeze()
+
+        self.assertIsNotNone(self.app.config["TOKENIZER"].tokenizers)
+        self.assertIn("rss_kb", report["before"])
+        self.assertIn("rss_kb", report["after"])
+        self.assertIs(self.app.extensions["preload"], report)
+
+    def test_select_engine(self):
+        """
+        Tests that the mapper builds tokenizers for
+        the chosen engine.
+        """
+        mapper = TokenizerMapper("regex")
+        tokenizer = mapper.select(self.__language__)
+        self.assertIsInstance(tokenizer.language, RegexLanguage)
+
+        with self.assertRaises(ValueError):
+            TokenizerMapper("unknown")
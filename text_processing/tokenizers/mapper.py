@@ -1,9 +1,57 @@
-from abc import ABC
+import re
 
-from nltk.tokenize import word_tokenize
+from abc import ABC
+from threading import Lock
 
 from .standard import Tokenizer
 
+#Lines made only of these tokens are split the same way by NLTK,
+#so they can skip its sentence splitting and regex cascade. NLTK
+#keeps a period on its word when other whitespace than spaces is
+#followed by punctuation, when a non-ASCII space follows it, or
+#when an opening quote not followed by a word comes after it.
+SIMPLE_TOKEN = re.compile(r"""
+    (?P<space>\s+)
+    |
+    (?P<word>\w+(?:-\w+)*)(?P<period>\.(?=[ \t\r\f\v]*$|[ ]+(?![\u201c\xab](?!\w))\S|[ \t\n\r\f\v]+\w))?
+    |
+    (?P<punct>[;!?()\[\]{}<>&%$#@*\u2012-\u2015\u201e\u201c\u201d\xab\xbb]|[,:](?=\s|$))
+    |
+    (?P<other>.)
+""", re.UNICODE | re.VERBOSE | re.DOTALL)
+
+#Sentence-final words that are neither initials nor numbers
+PLAIN_WORD = re.compile(r"[^\W\d_]+(?:-[^\W\d_]+)*")
+
+#Contractions that NLTK splits apart in any language
+CONTRACTIONS = re.compile(r"\b(?:cannot|gimme|gonna|gotta|lemme|wanna)\b", re.IGNORECASE)
+
+#Text tokenized to load everything a language needs
+PRELOAD_TEXT = "Habe Mut, dich deines eigenen Verstandes zu bedienen! Dr. Kant, 1784.\n"
+
+def load_sentence_model(language):
+    """
+    Loads the Punkt sentence splitting model that NLTK
+    uses to tokenize the language.
+
+    Parameters
+    ----------
+    language : str
+        The language of the model
+
+    Returns
+    -------
+    PunktParameters
+        The abbreviations and collocations learned for the language
+    """
+    import nltk.tokenize
+
+    if hasattr(nltk.tokenize, "_get_punkt_tokenizer"):
+        sentence_tokenizer = nltk.tokenize._get_punkt_tokenizer(language)
+    else:
+        sentence_tokenizer = nltk.data.load("tokenizers/punkt/" + language + ".pickle")
+    return sentence_tokenizer._params
+
 class Language(ABC):
     """
     Representation of a language with tokenization capabilities.
@@ -18,7 +66,7 @@ class Language(ABC):
             The language to be tokenized
         """
         self.language = language
-        self.tokenizer = (lambda s: word_tokenize(s, self.language))
+        self.tokenizer = self.word_tokenize
     
     def is_punctuation(self, token):
         """
@@ -36,6 +84,15 @@ class Language(ABC):
         """
         pass
 
+    def preload(self):
+        """
+        Loads NLTK's data for the language and compiles the regular
+        expressions used to tokenize it, so that processes forked
+        afterwards share them instead of loading their own.
+        """
+        self.word_tokenize(PRELOAD_TEXT)
+        self.tokenize(PRELOAD_TEXT)
+
     def separator(self):
         """
         Punctuation for separating text across lines.
@@ -53,12 +110,48 @@ class Language(ABC):
         """
         pass
 
+    def tokenize_block(self, lines):
+        """
+        Tokenizes a block of consecutive lines of text.
+
+        Parameters
+        ----------
+        lines : list
+            The lines to be tokenized
+
+        Returns
+        -------
+        list
+            The words in each line
+        """
+        return [self.tokenize(line) for line in lines]
+
     def whitespace(self):
         """
         Character(s) for separating two words.
         """
         pass
 
+    def word_tokenize(self, line):
+        """
+        Splits a line of text into words with NLTK. Unlike a lambda,
+        this bound method lets the language be sent to worker processes.
+
+        Parameters
+        ----------
+        line : str
+            The text to be tokenized
+
+        Returns
+        -------
+        list
+            The words in the text
+        """
+        #NLTK is slow to import, so it's only loaded once text is tokenized
+        from nltk.tokenize import word_tokenize
+
+        return word_tokenize(line, self.language)
+
 class StandardLanguage(Language):
     """
     Representation of a standard western European language.
@@ -130,24 +223,158 @@ class StandardLanguage(Language):
         """
         return ' '
 
+class RegexLanguage(StandardLanguage):
+    """
+    Representation of a standard western European language that splits
+    plain lines with a single compiled regular expression. Lines with
+    quotes, abbreviations, numbers before a period or other cases that
+    NLTK treats specially are still tokenized by NLTK, so the tokens are
+    always the same as those of StandardLanguage.
+    """
+
+    def __init__(self, language):
+        """
+        Initializes the language representation.
+
+        Parameters
+        ----------
+        language : str
+            The language to be tokenized
+        """
+        super().__init__(language)
+        self.tokenizer = self.regex_tokenize
+        self.abbreviations = None
+        self.collocations = None
+
+    def init_sentence_model(self):
+        """
+        Loads the words that NLTK won't end a sentence after.
+        """
+        params = load_sentence_model(self.language)
+        self.collocations = set(collocation[0] for collocation in params.collocations)
+        self.abbreviations = set(params.abbrev_types)
+
+    def ends_sentence(self, word):
+        """
+        Determines if NLTK would end a sentence at the period after a word.
+
+        Parameters
+        ----------
+        word : str
+            The word preceding the period
+
+        Returns
+        -------
+        bool
+            True if the period certainly ends a sentence, False if
+            NLTK has to decide
+        """
+        if len(word) < 2 or not PLAIN_WORD.fullmatch(word):
+            return False
+
+        word = word.lower()
+        if word in self.abbreviations or word.split("-")[-1] in self.abbreviations:
+            return False
+        return word not in self.collocations
+
+    def regex_tokenize(self, line):
+        """
+        Splits a line of text into words, falling back on NLTK
+        for anything beyond plain words and punctuation.
+
+        Parameters
+        ----------
+        line : str
+            The text to be tokenized
+
+        Returns
+        -------
+        list
+            The words in the text
+        """
+        if self.abbreviations is None:
+            self.init_sentence_model()
+
+        if CONTRACTIONS.search(line):
+            return self.word_tokenize(line)
+
+        tokens = []
+        for match in SIMPLE_TOKEN.finditer(line):
+            kind = match.lastgroup
+            if kind == "space":
+                continue
+            if kind == "other":
+                return self.word_tokenize(line)
+            if kind == "punct":
+                tokens.append(match.group())
+                continue
+
+            word = match.group("word")
+            tokens.append(word)
+            if match.group("period"):
+                if not self.ends_sentence(word):
+                    return self.word_tokenize(line)
+                tokens.append(".")
+        return tokens
+
+LANGUAGE_ENGINES = {
+    "nltk": StandardLanguage,
+    "regex": RegexLanguage
+}
+
 class TokenizerMapper():
     """
-    Mediator for choosing the correct tokenizer.
+    Mediator for choosing the correct tokenizer. The tokenizers
+    are built the first time one is selected.
     """
-    def __init__(self):
+    def __init__(self, engine="nltk"):
         """
         Initializes the mapper.
+
+        Parameters
+        ----------
+        engine : str
+            The tokenizer engine: nltk, or regex for the faster
+            regular expression engine
         """
-        self.init_tokenizers()
-    
+        if engine not in LANGUAGE_ENGINES:
+            raise ValueError("Unknown tokenizer engine " + str(engine))
+        self.engine = engine
+        self.tokenizers = None
+        self.lock = Lock()
+
+    def get_tokenizers(self):
+        """
+        Fetches the tokenizers, building them on first use.
+
+        Returns
+        -------
+        dict
+            The tokenizer for each supported language
+        """
+        if self.tokenizers is None:
+            with self.lock:
+                if self.tokenizers is None:
+                    self.init_tokenizers()
+        return self.tokenizers
+
+    def preload(self):
+        """
+        Builds every tokenizer and loads what its language needs.
+        """
+        for tokenizer in self.get_tokenizers().values():
+            tokenizer.language.preload()
+
     def init_tokenizers(self):
         """
         Initializes the tokenizers.
         """
-        self.tokenizers = {}
-        self.tokenizers["english"] = Tokenizer(StandardLanguage("english"))
-        self.tokenizers["german"] = Tokenizer(StandardLanguage("german"))
+        language = LANGUAGE_ENGINES[self.engine]
+        tokenizers = {}
+        tokenizers["english"] = Tokenizer(language("english"))
+        tokenizers["german"] = Tokenizer(language("german"))
         #Add more languages as they become available
+        self.tokenizers = tokenizers
     
     def select(self, language):
         """
@@ -164,11 +391,13 @@ class TokenizerMapper():
         Tokenizer
             A tokenizer for the user-specified language
         """
+        tokenizers = self.get_tokenizers()
+
         #Search for desired tokenizer
-        if language in self.tokenizers:
-            tokenizer = self.tokenizers[language]
+        if language in tokenizers:
+            tokenizer = tokenizers[language]
             return tokenizer
         
         #Default to English
-        tokenizer = self.tokenizers["english"]
+        tokenizer = tokenizers["english"]
         return tokenizer
\ No newline at end of file
@@ -1,9 +1,16 @@
-from collections import deque
+#Characters of text split into words together by split_lines
+BLOCK_SIZE = 8192
 
 class Tokenizer():
     """
     Tokenizes text from a user-specified language so 
     that it will render properly in a browser.
+
+    Tokens are (text, size, fulltext) tuples, where fulltext is the
+    whole word when the token is part of a word split across lines,
+    and None otherwise. Tuples are far cheaper to build than dicts,
+    which matters since every word and space of a document becomes
+    a token.
     """
     def __init__(self, language):
         """
@@ -31,16 +38,32 @@ class Tokenizer():
         list
             A collection of tokens
         """
-        tokens = self.language.tokenize(line)
+        return self.convert_words(self.language.tokenize(line))
+
+    def convert_words(self, words):
+        """
+        Transforms the words of a line into corresponding
+        tokens with intermediate whitespace.
+
+        Parameters
+        ----------
+        words : list
+            The words of the line
+
+        Returns
+        -------
+        list
+            A collection of tokens
+        """
+        is_punctuation = self.language.is_punctuation
         whitespace = self.language.whitespace()
-        whitespace = {"text": whitespace, "size": len(whitespace)}
-        new_tokens = deque([])
-        for token in tokens:
-            token = {"text": token, "size": len(token)}
-            new_tokens.append(token)
-            if not self.language.is_punctuation(token["text"]):
-                new_tokens.append(whitespace)
-        return new_tokens
+        whitespace = (whitespace, len(whitespace), None)
+        tokens = []
+        for word in words:
+            tokens.append((word, len(word), None))
+            if not is_punctuation(word):
+                tokens.append(whitespace)
+        return tokens
 
     def split_token(self, token, pos):
         """
@@ -48,7 +71,7 @@ class Tokenizer():
 
         Parameters
         ----------
-        token : Token
+        token : tuple
             The token to be separated
         pos: int
             The character position at which to perform the separation
@@ -58,34 +81,29 @@ class Tokenizer():
         list
             A collection of the two separated tokens
         """
-        text = token["text"]
+        text, size, fulltext = token
         t1 = text[0:pos]
         t2 = text[pos:]
         separator = self.language.separator()
-        
-        tokens = []
-        if "break" in token:
-            t1 = {"text": t1 + separator, "size": len(t1), "break": token["break"]}
-            tokens.append(t1)
-            t2 = {"text": t2, "size": len(t2), "break": token["break"]}
-            tokens.append(t2)
-        else:
-            t1 = {"text": t1 + separator, "size": len(t1), "break": text}
-            tokens.append(t1)
-            t2 = {"text": t2, "size": len(t2), "break": text}
-            tokens.append(t2)
-        
+
+        if fulltext is None:
+            fulltext = text
+
+        tokens = [
+            (t1 + separator, len(t1), fulltext),
+            (t2, len(t2), fulltext)
+        ]
         return tokens
 
-    def tokenize(self, line, line_size, offset=0, padding=0):
+    def layout(self, tokens, line_size, offset=0, padding=0):
         """
-        Tokenizes text according to the user-specified
-        line length.
+        Splits and pads the tokens of a line according to
+        the user-specified line length.
 
         Parameters
         ----------
-        line : str
-            The text to be tokenized
+        tokens : list
+            The tokens of the line
         line_size : int
             The character position at which to insert a line break
         offset : int
@@ -94,22 +112,208 @@ class Tokenizer():
             The maximum difference between line_size and the number
             of counted characters before a new line could be inserted
             earlier than normal
+
+        Returns
+        -------
+        tuple
+            The laid out tokens and the position at which
+            the next line starts counting characters
         """
-        tokens = self.convert(line)
+        laid_out = []
+        if not tokens:
+            return laid_out, offset
+
+        append = laid_out.append
+        whitespace = self.language.whitespace()
+        whitespace_size = len(whitespace)
         char_count = offset
-        while tokens:
-            token = tokens.popleft()
-            if char_count + token["size"] > line_size:
+        #A padded line is full, so the next line starts from
+        #zero even though char_count carries on within the line
+        next_offset = offset
+        for token in tokens:
+            #Padding a space widens every later space in the line
+            is_space = token[0] == whitespace
+            if is_space and token[1] != whitespace_size:
+                token = (whitespace, whitespace_size, None)
+
+            #Split the token until the rest of it fits on a line
+            while char_count + token[1] > line_size:
                 cutoff = line_size - char_count
                 new_tokens = self.split_token(token, cutoff)
-                tokens.appendleft(new_tokens[1])
+                token = new_tokens[1]
+                is_space = False
                 char_count = 0
-                yield new_tokens[0]
+                size = new_tokens[0][1]
+                if size + next_offset >= line_size:
+                    next_offset = 0
+                else:
+                    next_offset += size
+                append(new_tokens[0])
+
+            char_count = char_count + token[1]
+            diff = line_size - char_count
+            if diff < padding:
+                token = (token[0], token[1] + diff, token[2])
+                if is_space:
+                    whitespace_size = token[1]
+            if diff == 0:
+                char_count = 0
+            if token[1] + next_offset >= line_size:
+                next_offset = 0
             else:
-                char_count = char_count + token["size"]
-                diff = line_size - char_count
-                if diff < padding:
-                    token["size"] = token["size"] + diff   
-                if diff == 0:
-                    char_count = 0 
-                yield token
\ No newline at end of file
+                next_offset += token[1]
+            append(token)
+        return laid_out, next_offset
+
+    def tokenize(self, line, line_size, offset=0, padding=0):
+        """
+        Tokenizes text according to the user-specified
+        line length.
+
+        Parameters
+        ----------
+        line : str
+            The text to be tokenized
+        line_size : int
+            The character position at which to insert a line break
+        offset : int
+            The position at which to start counting characters
+        padding: int
+            The maximum difference between line_size and the number
+            of counted characters before a new line could be inserted
+            earlier than normal
+
+        Returns
+        -------
+        list
+            The laid out tokens
+        """
+        return self.layout(self.convert(line), line_size, offset, padding)[0]
+
+    def split_block(self, lines):
+        """
+        Splits a block of consecutive lines into words. The
+        language splits the whole block at once.
+
+        Parameters
+        ----------
+        lines : list
+            The lines to be split
+
+        Returns
+        -------
+        list
+            The words of each line, with None standing in for each blank line
+        """
+        words = self.language.tokenize_block([line for line in lines if line != "\n"])
+        words = iter(words)
+        return [None if line == "\n" else next(words) for line in lines]
+
+    def split_lines(self, lines, block_size=BLOCK_SIZE):
+        """
+        Splits a sequence of lines into words. Lines are buffered into
+        blocks of roughly block_size characters, which spares short
+        lines most of the per-line overhead while keeping memory
+        use bounded.
+
+        Parameters
+        ----------
+        lines : iterable
+            The lines to be split
+        block_size : int
+            The number of characters split at a time
+
+        Returns
+        -------
+        generator
+            The words of each line, with None standing in for each blank line
+        """
+        block = []
+        block_chars = 0
+        for line in lines:
+            block.append(line)
+            block_chars += len(line)
+            if block_chars >= block_size:
+                yield from self.split_block(block)
+                block = []
+                block_chars = 0
+
+        if block:
+            yield from self.split_block(block)
+
+    def layout_lines(self, word_lines, line_size, offset=0, padding=0):
+        """
+        Lays out the words of a sequence of lines according to the
+        user-specified line length, carrying the character count
+        from one line to the next. The words only depend on the
+        text, so they can be split once and laid out again for
+        any line length.
+
+        Parameters
+        ----------
+        word_lines : iterable
+            The words of each line, with None standing in for each blank line
+        line_size : int
+            The character position at which to insert a line break
+        offset : int
+            The position at which the first line starts counting characters
+        padding: int
+            The maximum difference between line_size and the number
+            of counted characters before a new line could be inserted
+            earlier than normal
+
+        Returns
+        -------
+        generator
+            The tokens of each line, with None standing in for each blank line
+        """
+        #Look up what every line needs once for all the lines
+        is_punctuation = self.language.is_punctuation
+        whitespace = self.language.whitespace()
+        whitespace = (whitespace, len(whitespace), None)
+        layout = self.layout
+
+        for words in word_lines:
+            #Blank new line
+            if words is None:
+                offset = 0
+                yield None
+                continue
+
+            tokens = []
+            append = tokens.append
+            for word in words:
+                append((word, len(word), None))
+                if not is_punctuation(word):
+                    append(whitespace)
+            tokens, offset = layout(tokens, line_size, offset, padding)
+            yield tokens
+
+    def tokenize_lines(self, lines, line_size, offset=0, padding=0, block_size=BLOCK_SIZE):
+        """
+        Tokenizes a sequence of lines according to the user-specified
+        line length, carrying the character count from one line to the
+        next. Lines are split into words a block at a time.
+
+        Parameters
+        ----------
+        lines : iterable
+            The lines to be tokenized
+        line_size : int
+            The character position at which to insert a line break
+        offset : int
+            The position at which the first line starts counting characters
+        padding: int
+            The maximum difference between line_size and the number
+            of counted characters before a new line could be inserted
+            earlier than normal
+        block_size : int
+            The number of characters split into words at a time
+
+        Returns
+        -------
+        generator
+            The tokens of each line, with None standing in for each blank line
+        """
+        word_lines = self.split_lines(lines, block_size)
+        return self.layout_lines(word_lines, line_size, offset, padding)
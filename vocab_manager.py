@@ -1,5 +1,83 @@
 import os
+
+import click
+
 from app import create_app
 
 config = os.getenv('FLASK_CONFIG') or 'default'
 app = create_app(config)
+
+@app.cli.command("migrate_pages")
+@click.option("--storage-format", default=None,
+              help="Storage format to convert pages to (standard, packed or compressed)")
+@click.option("--batch-size", default=100, help="Pages updated per database request")
+def migrate_pages(storage_format, batch_size):
+    """
+    Rewrites every stored page in the configured storage format.
+    """
+    from app.content_management.lib.migration import migrate_pages as migrate
+
+    upload_config = app.config["DOCUMENT_UPLOAD"]
+    storage_format = storage_format or upload_config["STORAGE_FORMAT"]
+    compression = {
+        "codec": upload_config["COMPRESSION_CODEC"],
+        "level": upload_config["COMPRESSION_LEVEL"],
+        "train": upload_config["COMPRESSION_DICTIONARY"]
+    }
+    summary = migrate(storage_format, compression, batch_size)
+    click.echo("Converted " + str(summary["pages"]) + " pages in " +
+               str(summary["documents"]) + " documents to " + storage_format)
+
+@app.cli.command("backfill_catalog")
+def backfill_catalog():
+    """
+    Adds the size and upload time of documents saved before
+    the catalog described them.
+    """
+    from app.content_management.lib.migration import backfill_catalog as backfill
+
+    summary = backfill()
+    click.echo("Created " + str(summary["created"]) + " and updated " +
+               str(summary["updated"]) + " catalog entries")
+
+@app.cli.command("import_documents")
+@click.argument("archive", type=click.Path(exists=True, dir_okay=False))
+@click.option("--email", required=True, help="Email of the user who will own the documents")
+@click.option("--language", default="german", help="Language of documents whose manifest entry doesn't name one")
+@click.option("--workers", default=None, type=int, help="Documents uploaded at the same time")
+@click.option("--report", default=None, type=click.Path(dir_okay=False),
+              help="File to save the JSON import report to")
+def import_documents(archive, email, language, workers, report):
+    """
+    Uploads every document in a zip or tar archive along with its manifest.
+    """
+    import json
+
+    from app.content_management.lib.bulk_import import BulkImporter
+    from app.content_management.views import get_upload_params
+    from app.models import User
+
+    if not User.objects(email=email).first():
+        raise click.BadParameter("No user with email " + email, param_hint="--email")
+
+    params = get_upload_params(email, language)
+    workers = workers or app.config["DOCUMENT_UPLOAD"]["IMPORT_WORKERS"]
+    importer = BulkImporter(params, app.config["TOKENIZER"], workers)
+    summary = importer.upload({"file": archive, "language": language})
+
+    for document in summary["documents"]:
+        line = document["status"] + ": " + document["title"] + " by " + document["author"]
+        line += " (" + str(document["pages_written"]) + " pages)"
+        if document["errors"]:
+            line += " " + "; ".join(document["errors"])
+        click.echo(line)
+
+    click.echo("Imported " + str(summary["documents_complete"]) + " of " +
+               str(summary["documents_total"]) + " documents (" +
+               str(summary["pages_written"]) + " pages) in " + str(summary["elapsed"]) +
+               " seconds: " + str(summary["documents_per_second"]) + " documents/sec, " +
+               str(summary["pages_per_second"]) + " pages/sec")
+
+    if report:
+        with open(report, 'w') as output:
+            json.dump(summary, output, indent=2)